@@ -1,9 +1,16 @@
 import requests
 import urllib.parse
-from utils import clean_name
+from requests.adapters import HTTPAdapter
+from normalize import clean_name, normalize_titles
+from suggest_index import suggestions
+from coalesce import SingleFlight
+from breakers import get_breaker, is_upstream_error, UpstreamUnavailable
+from cache_policy import urls_expire_after, expires_for, is_negative, CACHEABLE_STATUS_CODES
+from requests_cache.policy.expiration import utcnow
 import requests_cache
 import os
 import tempfile
+import threading
 from dotenv import load_dotenv
 
 # Load variables from .env
@@ -21,21 +28,250 @@ if not os.access('.', os.W_OK):
     # If not (e.g. on Vercel), use temp folder
     cache_path = os.path.join(tempfile.gettempdir(), 'q_cache')
 
+# TTLs per endpoint come from cache_policy (CACHE_EXPIRE_AFTER is the fallback).
+# Stale-while-revalidate: an expired response is still returned at once
+# (and refreshed in the background) until it is CACHE_MAX_STALE seconds past expiry.
+CACHE_EXPIRE_AFTER = 86400
+CACHE_MAX_STALE = int(os.getenv("CACHE_MAX_STALE", 7 * 86400))
+CACHE_SETTINGS = {
+    'expire_after': CACHE_EXPIRE_AFTER,
+    'urls_expire_after': urls_expire_after(),
+    'allowable_codes': CACHEABLE_STATUS_CODES,
+    'stale_while_revalidate': CACHE_MAX_STALE,
+}
+
 try:
-    requests_cache.install_cache(cache_name=cache_path, backend=backend, expire_after=86400)
+    requests_cache.install_cache(cache_name=cache_path, backend=backend, **CACHE_SETTINGS)
 except Exception:
     # If everything is bad (e.g. no disk access) — use memory
-    requests_cache.install_cache(backend='memory', expire_after=86400)
+    requests_cache.install_cache(backend='memory', **CACHE_SETTINGS)
 
 LASTFM_API_KEY = os.getenv("LASTFM_API_KEY")
 LASTFM_URL = "http://ws.audioscrobbler.com/2.0/"
 
+# Connection pooling
+# One long-lived session per upstream, so repeated calls reuse the same
+# keep-alive connections instead of paying a new TCP+TLS handshake each time.
+# Pool size should cover the ThreadPoolExecutor fan-out in the blueprints.
+UPSTREAM_POOL_SIZE = int(os.getenv("UPSTREAM_POOL_SIZE", 10))
+UPSTREAMS = ('itunes', 'deezer', 'lastfm')
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+def get_session(upstream):
+    """Returns the shared session for an upstream ('itunes', 'deezer' or 'lastfm')."""
+    session = _sessions.get(upstream)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(upstream)
+            if session is None:
+                # install_cache() above patched requests.Session, so this is a
+                # CachedSession using the same cache backend and expiration
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=UPSTREAM_POOL_SIZE)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _sessions[upstream] = session
+    return session
+
+# Identical concurrent calls (e.g. many users opening a trending artist) share one request.
+# Callers get the same Response object, but .json() parses a fresh copy for each of them.
+_inflight = SingleFlight()
+
+def _get(upstream, url, timeout):
+    return _inflight.do(url, _guarded_get, upstream, url, timeout)
+
+def get_cached_response(upstream, url):
+    """Returns the cached response for url, even if it has expired, or None."""
+    cache = get_session(upstream).cache
+    return cache.get_response(cache.create_key(requests.Request('GET', url).prepare()))
+
+def _serve_cached(upstream, url):
+    # Breaker open or upstream saturated: fail fast, but any cached copy beats the fallback
+    cached = get_cached_response(upstream, url)
+    if cached is None:
+        raise UpstreamUnavailable(upstream)
+    return cached
+
+def _guarded_get(upstream, url, timeout):
+    """GET through the upstream's circuit breaker and concurrency limit."""
+    breaker = get_breaker(upstream, UPSTREAM_POOL_SIZE)
+    if not breaker.allow():
+        return _serve_cached(upstream, url)
+    if not breaker.acquire_slot():
+        breaker.release_probe()
+        return _serve_cached(upstream, url)
+
+    try:
+        response = get_session(upstream).get(url, timeout=timeout)
+    except requests.RequestException:
+        breaker.record_failure()
+        raise
+    except BaseException:
+        # Cache backend error or a bug, no verdict on the upstream: just free the probe
+        breaker.release_probe()
+        raise
+    finally:
+        breaker.release_slot()
+
+    if getattr(response, 'from_cache', False):
+        breaker.release_probe()
+    elif is_upstream_error(response.status_code):
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+        _apply_negative_ttl(upstream, response)
+    return response
+
+def _apply_negative_ttl(upstream, response):
+    # requests_cache saved the response with the endpoint's normal TTL;
+    # empty and error results are saved again with the short negative TTL
+    cache_key = getattr(response, 'cache_key', None)
+    if cache_key and response.status_code in CACHEABLE_STATUS_CODES and is_negative(response):
+        get_session(upstream).cache.save_response(response, cache_key, expires_for(response, utcnow()))
+
+# URL builders and response parsers are shared with async_clients,
+# so the sync and async clients hit the same cache keys and return the same data.
+
+def itunes_search_url(query, entity, limit):
+    return f"https://itunes.apple.com/search?term={urllib.parse.quote(query)}&entity={entity}&limit={limit}"
+
+def itunes_lookup_url(id, entity=None, limit=None):
+    url = f"https://itunes.apple.com/lookup?id={id}"
+    if entity: url += f"&entity={entity}"
+    if limit: url += f"&limit={limit}"
+    return url
+
+def deezer_artist_search_url(query, limit):
+    return f"https://api.deezer.com/search/artist?q={urllib.parse.quote(query)}&limit={limit}"
+
+def lastfm_artist_info_url(artist_name):
+    clean = clean_name(artist_name)
+    return f"{LASTFM_URL}?method=artist.getinfo&artist={urllib.parse.quote(clean)}&api_key={LASTFM_API_KEY}&format=json"
+
+def lastfm_album_info_url(artist_name, album_name):
+    clean_art = clean_name(artist_name)
+    clean_alb = clean_name(album_name)
+    return f"{LASTFM_URL}?method=album.getinfo&api_key={LASTFM_API_KEY}&artist={urllib.parse.quote(clean_art)}&album={urllib.parse.quote(clean_alb)}&format=json"
+
+def lastfm_similar_url(artist_name, limit):
+    clean = clean_name(artist_name)
+    return f"{LASTFM_URL}?method=artist.getsimilar&artist={urllib.parse.quote(clean)}&api_key={LASTFM_API_KEY}&format=json&limit={limit}"
+
+def lastfm_top_tracks_url(artist_name, limit):
+    clean = clean_name(artist_name)
+    return f"{LASTFM_URL}?method=artist.gettoptracks&artist={urllib.parse.quote(clean)}&api_key={LASTFM_API_KEY}&format=json&limit={limit}"
+
+def parse_deezer_artists(data):
+    """Transforms a Deezer artist search response to our format (similar to iTunes)"""
+    results = []
+    for item in data.get('data', []):
+        # Format fan count
+        fans = item.get('nb_fan', 0)
+        stats = ""
+        if fans > 1000000:
+            stats = f"👥 {fans/1000000:.1f}M Deezer fans"
+        elif fans > 1000:
+            stats = f"👥 {fans/1000:.0f}K Deezer fans"
+        elif fans > 0:
+            stats = f"👥 {fans} Deezer fans"
+
+        results.append({
+            'artistId': item['id'], # This is Deezer ID, but works for image lookup
+            'artistName': item['name'],
+            'image': item.get('picture_xl') or item.get('picture_big') or item.get('picture_medium'),
+            'primaryGenreName': 'Music',
+            'source': 'deezer', # Label that this is Deezer
+            'stats': stats
+        })
+    return results
+
+def pick_artist_image(results):
+    """Picks an artist image from iTunes album lookup results"""
+    for item in results:
+        if item.get('collectionType') == 'Album' and item.get('artworkUrl100'):
+            # Filter for Kanye West: skip Donda album (black cover)
+            cname = item.get('collectionName', '').lower()
+            if 'donda' in cname or 'vultures' in cname: continue
+            return item['artworkUrl100'].replace('100x100bb', '400x400bb')
+    return None
+
+def parse_lastfm_artist(data):
+    result = {'stats': '', 'bio': '', 'tags': []}
+    
+    if 'artist' in data:
+        art = data['artist']
+        
+        # 1. Stats (ADD "Last.fm")
+        if 'stats' in art:
+            listeners = int(art['stats'].get('listeners', 0))
+            if listeners > 1000000: 
+                result['stats'] = f"👥 {listeners/1000000:.1f}M Last.fm listeners"
+            elif listeners > 1000: 
+                result['stats'] = f"👥 {listeners/1000:.0f}K Last.fm listeners"
+            else: 
+                result['stats'] = f"👥 {listeners} Last.fm listeners"
+        
+        # 2. Bio
+        if 'bio' in art and 'summary' in art['bio']:
+            summary = art['bio']['summary']
+            summary = summary.split('<a href')[0]
+            result['bio'] = summary.strip()
+            
+        # 3. Tags
+        if 'tags' in art and 'tag' in art['tags']:
+            tags = art['tags']['tag']
+            if isinstance(tags, list):
+                result['tags'] = [t['name'] for t in tags[:4]]
+            elif isinstance(tags, dict):
+                 result['tags'] = [tags['name']]
+                 
+    return result
+
+def parse_lastfm_album_stats(data):
+    if 'album' in data:
+        playcount = int(data['album'].get('playcount', 0))
+        if playcount > 1000000: return f"🔥 {playcount/1000000:.1f}M plays"
+        elif playcount > 1000: return f"🔥 {playcount/1000:.0f}K plays"
+        else: return f"🔥 {playcount} plays"
+    return None
+
+def parse_similar_artists(data):
+    if 'similarartists' in data and 'artist' in data['similarartists']:
+        return data['similarartists']['artist']
+    return []
+
+def parse_lastfm_top_tracks(data):
+    """Play counts from artist.gettoptracks, keyed by normalize_title of the track name"""
+    playcounts = {}
+    tracks = data.get('toptracks', {}).get('track', [])
+    for track, key in zip(tracks, normalize_titles([track.get('name', '') for track in tracks])):
+        if key and key not in playcounts:
+            playcounts[key] = int(track.get('playcount', 0))
+    return playcounts
+
+# wrapperType of a lookup result -> the ID field it was looked up by
+_LOOKUP_ID_KEYS = {'track': 'trackId', 'collection': 'collectionId', 'artist': 'artistId'}
+
+def index_lookup_results(results, ids):
+    """Maps each requested ID to its item of a multi-ID iTunes lookup (IDs not found are left out)."""
+    wanted = {str(i) for i in ids}
+    by_id = {}
+    for item in results:
+        key = _LOOKUP_ID_KEYS.get(item.get('wrapperType'))
+        value = str(item.get(key)) if key else None
+        if value in wanted and value not in by_id:
+            by_id[value] = item
+    return by_id
+
 def search_itunes(query, entity, limit):
     try:
-        url = f"https://itunes.apple.com/search?term={urllib.parse.quote(query)}&entity={entity}&limit={limit}"
-        response = requests.get(url, timeout=5)
+        response = _get('itunes', itunes_search_url(query, entity, limit), timeout=5)
         response.raise_for_status()
-        return response.json().get('results', [])
+        results = response.json().get('results', [])
+        suggestions.observe(results)
+        return results
     except Exception as e:
         print(f"Error searching iTunes: {e}")
         return []
@@ -43,43 +279,18 @@ def search_itunes(query, entity, limit):
 # NEW FUNCTION: Search via Deezer (gives images!)
 def search_deezer_artists(query, limit):
     try:
-        url = f"https://api.deezer.com/search/artist?q={urllib.parse.quote(query)}&limit={limit}"
-        response = requests.get(url, timeout=5)
-        data = response.json().get('data', [])
-        
-        # Transform Deezer format to our format (similar to iTunes)
-        results = []
-        for item in data:
-            # Format fan count
-            fans = item.get('nb_fan', 0)
-            stats = ""
-            if fans > 1000000:
-                stats = f"👥 {fans/1000000:.1f}M Deezer fans"
-            elif fans > 1000:
-                stats = f"👥 {fans/1000:.0f}K Deezer fans"
-            elif fans > 0:
-                stats = f"👥 {fans} Deezer fans"
-
-            results.append({
-                'artistId': item['id'], # This is Deezer ID, but works for image lookup
-                'artistName': item['name'],
-                'image': item.get('picture_xl') or item.get('picture_big') or item.get('picture_medium'),
-                'primaryGenreName': 'Music',
-                'source': 'deezer', # Label that this is Deezer
-                'stats': stats
-            })
-        return results
+        response = _get('deezer', deezer_artist_search_url(query, limit), timeout=5)
+        return parse_deezer_artists(response.json())
     except Exception as e:
         print(f"Error searching Deezer: {e}")
         return []
 
 def lookup_itunes(id, entity=None, limit=None):
     try:
-        url = f"https://itunes.apple.com/lookup?id={id}"
-        if entity: url += f"&entity={entity}"
-        if limit: url += f"&limit={limit}"
-        response = requests.get(url, timeout=5)
-        return response.json().get('results', [])
+        response = _get('itunes', itunes_lookup_url(id, entity, limit), timeout=5)
+        results = response.json().get('results', [])
+        suggestions.observe(results)
+        return results
     except: return []
 
 def get_true_artist_image(artist_id):
@@ -87,13 +298,7 @@ def get_true_artist_image(artist_id):
     try:
         if not artist_id: return None
         # Search more albums (60) to skip "black square" covers (Donda, Vultures)
-        results = lookup_itunes(artist_id, 'album', 60)
-        for item in results:
-            if item.get('collectionType') == 'Album' and item.get('artworkUrl100'):
-                # Filter for Kanye West: skip Donda album (black cover)
-                cname = item.get('collectionName', '').lower()
-                if 'donda' in cname or 'vultures' in cname: continue
-                return item['artworkUrl100'].replace('100x100bb', '400x400bb')
+        return pick_artist_image(lookup_itunes(artist_id, 'album', 60))
     except: pass
     return None
 
@@ -108,40 +313,8 @@ def get_lastfm_artist_data(artist_name):
     """
     try:
         if not artist_name: return None
-        clean = clean_name(artist_name)
-        url = f"{LASTFM_URL}?method=artist.getinfo&artist={urllib.parse.quote(clean)}&api_key={LASTFM_API_KEY}&format=json"
-        data = requests.get(url, timeout=2).json()
-        
-        result = {'stats': '', 'bio': '', 'tags': []}
-        
-        if 'artist' in data:
-            art = data['artist']
-            
-            # 1. Stats (ADD "Last.fm")
-            if 'stats' in art:
-                listeners = int(art['stats'].get('listeners', 0))
-                if listeners > 1000000: 
-                    result['stats'] = f"👥 {listeners/1000000:.1f}M Last.fm listeners"
-                elif listeners > 1000: 
-                    result['stats'] = f"👥 {listeners/1000:.0f}K Last.fm listeners"
-                else: 
-                    result['stats'] = f"👥 {listeners} Last.fm listeners"
-            
-            # 2. Bio
-            if 'bio' in art and 'summary' in art['bio']:
-                summary = art['bio']['summary']
-                summary = summary.split('<a href')[0]
-                result['bio'] = summary.strip()
-                
-            # 3. Tags
-            if 'tags' in art and 'tag' in art['tags']:
-                tags = art['tags']['tag']
-                if isinstance(tags, list):
-                    result['tags'] = [t['name'] for t in tags[:4]]
-                elif isinstance(tags, dict):
-                     result['tags'] = [tags['name']]
-                     
-        return result
+        data = _get('lastfm', lastfm_artist_info_url(artist_name), timeout=2).json()
+        return parse_lastfm_artist(data)
     except Exception as e:
         print(f"LastFM Error: {e}")
         return None
@@ -150,33 +323,22 @@ def get_lastfm_artist_data(artist_name):
 def get_lastfm_album_stats(artist_name, album_name):
     try:
         if not artist_name or not album_name: return None
-        clean_art = clean_name(artist_name)
-        clean_alb = clean_name(album_name)
-        url = f"{LASTFM_URL}?method=album.getinfo&api_key={LASTFM_API_KEY}&artist={urllib.parse.quote(clean_art)}&album={urllib.parse.quote(clean_alb)}&format=json"
-        data = requests.get(url, timeout=2).json()
-        if 'album' in data:
-            playcount = int(data['album'].get('playcount', 0))
-            if playcount > 1000000: return f"🔥 {playcount/1000000:.1f}M plays"
-            elif playcount > 1000: return f"🔥 {playcount/1000:.0f}K plays"
-            else: return f"🔥 {playcount} plays"
+        data = _get('lastfm', lastfm_album_info_url(artist_name, album_name), timeout=2).json()
+        return parse_lastfm_album_stats(data)
     except: return None
 
 def get_similar_artists(artist_name, limit=5):
     try:
         if not artist_name: return []
-        clean = clean_name(artist_name)
-        url = f"{LASTFM_URL}?method=artist.getsimilar&artist={urllib.parse.quote(clean)}&api_key={LASTFM_API_KEY}&format=json&limit={limit}"
-        data = requests.get(url, timeout=3).json()
-        if 'similarartists' in data and 'artist' in data['similarartists']:
-            return data['similarartists']['artist']
+        data = _get('lastfm', lastfm_similar_url(artist_name, limit), timeout=3).json()
+        return parse_similar_artists(data)
     except: return []
-    return []
 
 def get_tag_info(tag):
     """Gets genre description"""
     try:
         url = f"{LASTFM_URL}?method=tag.getinfo&tag={urllib.parse.quote(tag)}&api_key={LASTFM_API_KEY}&format=json"
-        data = requests.get(url, timeout=2).json()
+        data = _get('lastfm', url, timeout=2).json()
         if 'tag' in data and 'wiki' in data['tag']:
             return data['tag']['wiki'].get('summary', '').split('<a href')[0].strip()
     except: return ""
@@ -186,7 +348,7 @@ def get_tag_artists(tag, page=1, limit=30):
     """Gets top artists of a genre"""
     try:
         url = f"{LASTFM_URL}?method=tag.gettopartists&tag={urllib.parse.quote(tag)}&api_key={LASTFM_API_KEY}&format=json&page={page}&limit={limit}"
-        response = requests.get(url, timeout=3)
+        response = _get('lastfm', url, timeout=3)
         data = response.json()
         
         # DEBUG: If you see 0 again, check console (terminal) for printed data
@@ -1,6 +1,8 @@
 from flask import Flask
 from flask_login import LoginManager
 from flask_caching import Cache
+from compression import init_compression
+from assets import init_assets
 from config import Config
 from models import db, User
 from blueprints.search import search_bp
@@ -21,6 +23,8 @@ if not os.path.exists(app.instance_path):
 db.init_app(app)
 cache = Cache(app)
 app.cache = cache
+init_compression(app)
+init_assets(app)
 login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = 'auth.login'
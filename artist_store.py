@@ -0,0 +1,208 @@
+"""
+Normalized artist entity store.
+
+One merged record per iTunes artistId, shared by the search results, the
+artist page and the artist-image APIs, so an artist is enriched once instead
+of once per view. Every field has its own freshness stamp and only the
+sources behind stale or missing fields are queried again:
+
+    itunes   -> name
+    artwork  -> artwork (iTunes album cover, used as fallback image)
+    deezer   -> deezer_id, deezer_image, deezer_stats
+    lastfm   -> lastfm_stats, bio, tags
+
+Views get a merged record: image is the Deezer photo (else the artwork) and
+stats are Last.fm listeners (else Deezer fans).
+"""
+import asyncio
+import os
+import time
+from lru import LRUCache
+from coalesce import AsyncSingleFlight
+from async_clients import run, async_lookup_itunes, async_search_deezer_artists, async_get_lastfm_artist_data
+from api_clients import pick_artist_image
+from cache_policy import CACHE_POLICY
+
+DAY = 86400
+
+FIELD_TTL = {
+    'name': 30 * DAY,
+    'artwork': 7 * DAY,
+    'deezer_id': 30 * DAY,
+    'deezer_image': 7 * DAY,
+    'deezer_stats': DAY,
+    'lastfm_stats': DAY,
+    'bio': 7 * DAY,
+    'tags': 7 * DAY,
+}
+
+# A source that answered with nothing (no match) is asked again after its negative TTL
+NEGATIVE_TTL = {
+    'artwork': CACHE_POLICY[('itunes', 'lookup')].negative_ttl,
+    'deezer': CACHE_POLICY[('deezer', 'search/artist')].negative_ttl,
+    'lastfm': CACHE_POLICY[('lastfm', 'artist.getinfo')].negative_ttl,
+}
+
+SOURCE_FIELDS = {
+    'itunes': ('name',),
+    'artwork': ('artwork',),
+    'deezer': ('deezer_id', 'deezer_image', 'deezer_stats'),
+    'lastfm': ('lastfm_stats', 'bio', 'tags'),
+}
+
+# Merged field -> primary source (image falls back to artwork, stats to Deezer)
+FIELD_SOURCE = {
+    'name': 'itunes',
+    'image': 'deezer',
+    'artwork': 'artwork',
+    'stats': 'lastfm',
+    'bio': 'lastfm',
+    'tags': 'lastfm',
+    'deezer_id': 'deezer',
+}
+
+ARTIST_STORE_SIZE = int(os.getenv("ARTIST_STORE_SIZE", 5000))
+
+_records = LRUCache(maxsize=ARTIST_STORE_SIZE)
+_names = LRUCache(maxsize=ARTIST_STORE_SIZE)  # lowercased name -> artistId
+_inflight = AsyncSingleFlight()
+
+async def _fetch_itunes(artist_id, name):
+    data = await async_lookup_itunes(artist_id)
+    return {'name': data[0].get('artistName')} if data else None
+
+# Fetchers return None on errors (nothing is stamped, retried next time) and
+# empty fields when the upstream has no match (stamped for the negative TTL)
+
+async def _fetch_artwork(artist_id, name):
+    albums = await async_lookup_itunes(artist_id, 'album', 60)
+    if albums is None:  # Error or open breaker
+        return None
+    return {'artwork': pick_artist_image(albums)}
+
+async def _fetch_deezer(artist_id, name):
+    dz = await async_search_deezer_artists(name, 1)
+    if dz is None:  # Error or open breaker
+        return None
+    if not dz:
+        return {'deezer_id': None, 'deezer_image': None, 'deezer_stats': None}
+    return {'deezer_id': dz[0]['artistId'], 'deezer_image': dz[0]['image'], 'deezer_stats': dz[0].get('stats')}
+
+async def _fetch_lastfm(artist_id, name):
+    lf = await async_get_lastfm_artist_data(name)
+    if lf is None:  # Error or open breaker: keep old values, retry next time
+        return None
+    return {'lastfm_stats': lf.get('stats'), 'bio': lf.get('bio', ''), 'tags': lf.get('tags', [])}
+
+_FETCHERS = {
+    'itunes': _fetch_itunes,
+    'artwork': _fetch_artwork,
+    'deezer': _fetch_deezer,
+    'lastfm': _fetch_lastfm,
+}
+
+def _get_record(artist_id):
+    return _records.get(artist_id) or {'artistId': artist_id, 'stamps': {}}
+
+def _save_fields(artist_id, fields, negative=False):
+    # Only called on the upstream event loop, so read-modify-write needs no lock
+    record = dict(_get_record(artist_id))
+    record['stamps'] = dict(record['stamps'])
+    record['negative'] = set(record.get('negative', ()))
+    now = time.time()
+    for key, value in fields.items():
+        record[key] = value
+        record['stamps'][key] = now
+        if negative:
+            record['negative'].add(key)
+        else:
+            record['negative'].discard(key)
+    _records.set(artist_id, record)
+    if record.get('name'):
+        _names.set(record['name'].lower(), artist_id)
+
+def _is_stale(record, source, now):
+    negative = record.get('negative', ())
+    for field in SOURCE_FIELDS[source]:
+        stamp = record['stamps'].get(field)
+        ttl = NEGATIVE_TTL[source] if field in negative else FIELD_TTL[field]
+        if stamp is None or now - stamp >= ttl:
+            return True
+    return False
+
+async def _refresh(artist_id, sources, name):
+    async def refresh_source(source):
+        fields = await _FETCHERS[source](artist_id, name)
+        if fields is not None:
+            _save_fields(artist_id, fields, negative=not any(fields.values()))
+
+    # Coalesced per (artist, source): concurrent views share one upstream call
+    await asyncio.gather(*(_inflight.do((artist_id, source), refresh_source, source) for source in sources))
+
+def _merged(record):
+    return {
+        'artistId': record['artistId'],
+        'name': record.get('name'),
+        'image': record.get('deezer_image') or record.get('artwork'),
+        'artwork': record.get('artwork'),
+        'stats': record.get('lastfm_stats') or record.get('deezer_stats'),
+        'bio': record.get('bio') or '',
+        'tags': list(record.get('tags') or []),
+        'deezer_id': record.get('deezer_id'),
+    }
+
+async def async_get_artist(artist_id, name=None, want=('image', 'stats')):
+    """
+    Returns the merged record for an iTunes artistId, first refreshing the
+    sources behind any stale or missing field in want.
+    """
+    artist_id = str(artist_id)
+    record = _get_record(artist_id)
+    if name and record.get('name') != name:
+        _save_fields(artist_id, {'name': name})
+    elif not record.get('name') or _is_stale(record, 'itunes', time.time()):
+        await _refresh(artist_id, ['itunes'], None)
+    record = _get_record(artist_id)
+    name = record.get('name')
+
+    # Deezer and Last.fm are searched by name
+    usable = {'itunes', 'artwork'} if not name else set(_FETCHERS)
+
+    # 1. Primary sources, all at once
+    now = time.time()
+    primary = {FIELD_SOURCE[field] for field in want} & usable
+    await _refresh(artist_id, [s for s in primary if _is_stale(record, s, now)], name)
+
+    # 2. Fallbacks for fields the primary source could not fill
+    merged = _get_record(artist_id)
+    fallback = set()
+    if 'image' in want and not merged.get('deezer_image'):
+        fallback.add('artwork')
+    if 'stats' in want and not merged.get('lastfm_stats'):
+        fallback.add('deezer')
+    await _refresh(artist_id, [s for s in fallback & usable if _is_stale(merged, s, now)], name)
+
+    return _merged(_get_record(artist_id))
+
+def get_artist(artist_id, name=None, want=('image', 'stats')):
+    """Sync wrapper around async_get_artist for plain Flask views."""
+    return run(async_get_artist(artist_id, name, want))
+
+def remember_artist(artist_id, **fields):
+    """
+    Stores fields a view already got from its own upstream responses (e.g.
+    name and artwork from an album lookup), so the store does not fetch them
+    again. Call from coroutines on the upstream loop, like the store itself.
+    """
+    _save_fields(str(artist_id), fields)
+
+def peek_artist(artist_id):
+    """Returns the merged record if the artist is already in the store, without fetching anything."""
+    record = _records.get(str(artist_id))
+    return _merged(record) if record else None
+
+def find_artist_id(name):
+    """Returns the iTunes artistId of an artist already in the store, by name."""
+    if not name:
+        return None
+    return _names.get(name.lower())
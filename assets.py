@@ -0,0 +1,181 @@
+"""
+Fingerprinted static assets.
+
+build(static_dir) minifies the top-level .css/.js files of static/ and writes
+them to static/dist/ under content-hashed names (style.<hash>.css), with
+static/dist/manifest.json mapping each source name to its hashed one. It runs
+as part of `python build_static.py`; files of earlier builds are kept so pages
+cached by clients keep loading.
+
+Templates link assets with asset_url('style.css'). With a manifest it points
+to the hashed file, served with Cache-Control: public, max-age=1 year,
+immutable, so repeat visits don't revalidate anything. Without one (no build
+yet) it falls back to the plain file, versioned by its mtime.
+"""
+import hashlib
+import json
+import os
+import re
+import tempfile
+from flask import request, url_for
+
+ASSET_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+ASSET_EXTENSIONS = ('.css', '.js')
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+# Characters after which a '/' starts a regex literal rather than a division
+_REGEX_PRECEDERS = set('(,=:[!&|?{};+-*%<>~^')
+_CSS_PUNCTUATION_RE = re.compile(r'\s*([{};,>])\s*')
+
+def _scan(text, js):
+    """Splits source into (kind, text) chunks: 'code', 'string', 'regex' (JS) and 'comment'."""
+    chunks, code, i, n = [], [], 0, len(text)
+    prev = ''  # Last significant character, to tell a regex from a division
+
+    def flush():
+        if code:
+            chunks.append(('code', ''.join(code)))
+            code.clear()
+
+    while i < n:
+        ch = text[i]
+        nxt = text[i + 1] if i + 1 < n else ''
+        if ch == '/' and nxt == '*':
+            end = text.find('*/', i + 2)
+            end = n if end < 0 else end + 2
+            flush()
+            chunks.append(('comment', text[i:end]))
+            i = end
+        elif js and ch == '/' and nxt == '/':
+            end = text.find('\n', i)
+            end = n if end < 0 else end
+            flush()
+            chunks.append(('comment', text[i:end]))
+            i = end
+        elif ch in '\'"' or (js and ch == '`'):
+            j = i + 1
+            while j < n and text[j] != ch:
+                j += 2 if text[j] == '\\' else 1
+            flush()
+            chunks.append(('string', text[i:j + 1]))
+            prev = ch
+            i = j + 1
+        elif js and ch == '/' and (not prev or prev in _REGEX_PRECEDERS or ''.join(code).rstrip().endswith('return')):
+            j, in_class = i + 1, False
+            while j < n and (in_class or text[j] != '/') and text[j] != '\n':
+                if text[j] == '\\':
+                    j += 1
+                elif text[j] == '[':
+                    in_class = True
+                elif text[j] == ']':
+                    in_class = False
+                j += 1
+            j += 1
+            while j < n and text[j].isalpha():  # Flags
+                j += 1
+            flush()
+            chunks.append(('regex', text[i:j]))
+            prev = 'r'
+            i = j
+        else:
+            code.append(ch)
+            if not ch.isspace():
+                prev = ch
+            i += 1
+    flush()
+    return chunks
+
+def _minify(text, js, minify_code, comment=''):
+    """Runs minify_code over the code between strings and regexes, comments replaced by comment."""
+    out, code = [], []
+    for kind, chunk in _scan(text, js):
+        if kind in ('code', 'comment'):
+            code.append(chunk if kind == 'code' else comment)
+            continue
+        out.append(minify_code(''.join(code)))
+        out.append(chunk)
+        code.clear()
+    out.append(minify_code(''.join(code)))
+    return ''.join(out).strip()
+
+def _minify_css_code(code):
+    code = _CSS_PUNCTUATION_RE.sub(r'\1', re.sub(r'\s+', ' ', code))
+    return code.replace(': ', ':').replace(';}', '}')
+
+def _minify_js_code(code):
+    return re.sub(r'\s*\n\s*', '\n', re.sub(r'[ \t]+', ' ', code))
+
+def minify_css(text):
+    """Drops comments and whitespace that CSS doesn't need (strings are kept as is)."""
+    return _minify(text, False, _minify_css_code)
+
+def minify_js(text):
+    """Drops comments, indentation and blank lines. Line breaks are kept, so
+    automatic semicolon insertion works as in the source."""
+    return _minify(text, True, _minify_js_code, comment=' ') + '\n'
+
+def minify(filename, text):
+    return minify_css(text) if filename.endswith('.css') else minify_js(text)
+
+def write_atomic(path, data):
+    """Writes a file through a temp file renamed into place, so readers never see it half-written."""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+def build(static_dir):
+    """Writes minified, hashed copies of the static assets and the manifest; returns the manifest."""
+    out_dir = os.path.join(static_dir, ASSET_DIR)
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = {}
+    for filename in sorted(os.listdir(static_dir)):
+        if not filename.endswith(ASSET_EXTENSIONS):
+            continue
+        with open(os.path.join(static_dir, filename), encoding='utf-8') as f:
+            data = minify(filename, f.read()).encode('utf-8')
+        stem, ext = os.path.splitext(filename)
+        hashed = f"{stem}.{hashlib.md5(data).hexdigest()[:10]}{ext}"
+        if not os.path.exists(os.path.join(out_dir, hashed)):
+            write_atomic(os.path.join(out_dir, hashed), data)
+        manifest[filename] = f"{ASSET_DIR}/{hashed}"
+    write_atomic(os.path.join(out_dir, MANIFEST_NAME), json.dumps(manifest, indent=2, sort_keys=True).encode())
+    return manifest
+
+def load_manifest(static_dir):
+    try:
+        with open(os.path.join(static_dir, ASSET_DIR, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        print(f"Asset manifest load error: {e}")
+        return {}
+
+def init_assets(app):
+    """Adds asset_url() to the templates and immutable caching of hashed assets."""
+    manifest = load_manifest(app.static_folder)
+    hashed = set(manifest.values())
+
+    def asset_url(filename):
+        if filename in manifest:
+            return url_for('static', filename=manifest[filename])
+        try:
+            version = int(os.stat(os.path.join(app.static_folder, filename)).st_mtime)
+        except OSError:
+            return url_for('static', filename=filename)
+        return url_for('static', filename=filename, v=version)
+
+    def immutable_assets(response):
+        if request.endpoint == 'static' and response.status_code in (200, 304) \
+                and (request.view_args or {}).get('filename') in hashed:
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = IMMUTABLE_MAX_AGE
+            response.cache_control.immutable = True
+        return response
+
+    app.jinja_env.globals['asset_url'] = asset_url
+    app.after_request(immutable_assets)
+    return manifest
@@ -0,0 +1,290 @@
+"""
+Asyncio versions of the api_clients functions.
+
+All calls run on one background event loop per process, with a pooled
+httpx.AsyncClient and a concurrency limit per upstream (the slots of its
+breaker, shared with the sync clients). A view can gather
+every upstream call of a page in one pass instead of blocking a thread per call:
+
+    lf, albums = gather(async_get_lastfm_artist_data(name), async_lookup_itunes(artist_id, 'album', 200))
+
+Responses are read from and written to the same requests_cache backend as
+the sync clients, so both paths share one cache. That cache I/O blocks (SQLite),
+so it runs in worker threads (asyncio.to_thread), never on the loop itself.
+"""
+import asyncio
+import os
+from datetime import timedelta
+import threading
+import httpx
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests_cache import CachedResponse
+from requests_cache.models.request import CachedRequest
+from requests_cache.policy.expiration import utcnow
+from coalesce import AsyncSingleFlight
+from breakers import get_breaker, is_upstream_error, UpstreamUnavailable
+from cache_policy import expires_for, CACHE_POLICY, CACHEABLE_STATUS_CODES
+from lru import LRUCache
+from suggest_index import suggestions
+from api_clients import (
+    get_session, UPSTREAM_POOL_SIZE, CACHE_MAX_STALE,
+    itunes_search_url, itunes_lookup_url, deezer_artist_search_url,
+    lastfm_artist_info_url, lastfm_album_info_url, lastfm_similar_url, lastfm_top_tracks_url,
+    parse_deezer_artists, pick_artist_image, parse_lastfm_artist,
+    parse_lastfm_album_stats, parse_similar_artists, parse_lastfm_top_tracks, index_lookup_results,
+)
+
+# IDs per request of a batched iTunes lookup
+ITUNES_LOOKUP_CHUNK = int(os.getenv("ITUNES_LOOKUP_CHUNK", 50))
+
+_loop = None
+_loop_pid = None
+_loop_lock = threading.Lock()
+
+# Created lazily on the loop thread (httpx clients are bound to their loop)
+_clients = {}
+_inflight = AsyncSingleFlight()
+# Keeps background refresh tasks referenced until they finish
+_refreshes = set()
+# Per-ID results of batched lookups, so overlapping batches only fetch new IDs
+_lookup_entities = LRUCache(maxsize=int(os.getenv("ITUNES_LOOKUP_CACHE_SIZE", 10000)))
+_MISSING = object()
+
+def _get_loop():
+    global _loop, _loop_pid, _inflight
+    with _loop_lock:
+        # New loop after fork (gunicorn workers must not share the parent's loop thread)
+        if _loop is None or _loop_pid != os.getpid():
+            _loop = asyncio.new_event_loop()
+            _loop_pid = os.getpid()
+            _clients.clear()
+            _inflight = AsyncSingleFlight()
+            threading.Thread(target=_loop.run_forever, name='upstream-loop', daemon=True).start()
+    return _loop
+
+def submit(coro):
+    """Schedules a coroutine on the upstream event loop without waiting (returns a concurrent Future)."""
+    return asyncio.run_coroutine_threadsafe(coro, _get_loop())
+
+def run(coro, timeout=None):
+    """Runs a coroutine on the upstream event loop and waits for its result."""
+    return submit(coro).result(timeout)
+
+def gather(*aws):
+    """Runs coroutines concurrently on the upstream event loop, returns their results in order."""
+    async def _gather():
+        return await asyncio.gather(*aws)
+    return run(_gather())
+
+def _get_client(upstream):
+    client = _clients.get(upstream)
+    if client is None:
+        limits = httpx.Limits(max_connections=UPSTREAM_POOL_SIZE, max_keepalive_connections=UPSTREAM_POOL_SIZE)
+        client = httpx.AsyncClient(limits=limits, follow_redirects=True)
+        _clients[upstream] = client
+    return client
+
+def _serve_cached(upstream, cached):
+    # Breaker open or upstream saturated: fail fast, but an expired copy beats the fallback
+    if cached is None:
+        raise UpstreamUnavailable(upstream)
+    return cached
+
+def _to_cached_response(response, request):
+    cached = CachedResponse(
+        status_code=response.status_code,
+        url=str(response.url),
+        headers=CaseInsensitiveDict(response.headers),
+        reason=response.reason_phrase,
+        encoding=response.encoding,
+        request=CachedRequest.from_request(request),
+    )
+    cached._content = response.content
+    return cached
+
+async def _aget(upstream, url, timeout):
+    """Async counterpart of api_clients._get. Returns a requests-compatible response."""
+    cache = get_session(upstream).cache
+    request = requests.Request('GET', url).prepare()
+    cache_key = cache.create_key(request)
+    cached = await asyncio.to_thread(cache.get_response, cache_key)
+    if cached is not None and not cached.is_expired:
+        return cached
+
+    # Identical concurrent calls share one request
+    fetch = _inflight.do(cache_key, _fetch, upstream, url, timeout, request, cache_key, cached)
+    if cached is not None and _within_max_stale(cached):
+        # Stale-while-revalidate: serve the expired copy now, refresh in the background
+        task = asyncio.ensure_future(fetch)
+        _refreshes.add(task)
+        task.add_done_callback(_refresh_done)
+        return cached
+    return await fetch
+
+def _within_max_stale(cached):
+    return cached.expires is not None and utcnow() < cached.expires + timedelta(seconds=CACHE_MAX_STALE)
+
+def _refresh_done(task):
+    _refreshes.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        print(f"Background refresh failed: {task.exception()}")
+
+async def _fetch(upstream, url, timeout, request, cache_key, cached):
+    breaker = get_breaker(upstream, UPSTREAM_POOL_SIZE)
+    if not breaker.allow():
+        return _serve_cached(upstream, cached)
+
+    try:
+        acquired = await breaker.acquire_slot_async()
+    except BaseException:  # Cancelled while queued
+        breaker.release_probe()
+        raise
+    if not acquired:
+        breaker.release_probe()
+        return _serve_cached(upstream, cached)
+
+    try:
+        response = await _get_client(upstream).get(url, timeout=timeout)
+    except httpx.TransportError:
+        breaker.record_failure()
+        raise
+    except BaseException:
+        # Cancelled or a bug, no verdict on the upstream: just free the probe
+        breaker.release_probe()
+        raise
+    finally:
+        breaker.release_slot()
+
+    if is_upstream_error(response.status_code):
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+
+    result = _to_cached_response(response, request)
+    if response.status_code in CACHEABLE_STATUS_CODES:
+        await asyncio.to_thread(get_session(upstream).cache.save_response, result, cache_key, expires_for(result, utcnow()))
+    return result
+
+async def async_search_itunes(query, entity, limit):
+    try:
+        response = await _aget('itunes', itunes_search_url(query, entity, limit), timeout=5)
+        response.raise_for_status()
+        results = response.json().get('results', [])
+        suggestions.observe(results)
+        return results
+    except Exception as e:
+        print(f"Error searching iTunes: {e}")
+        return []
+
+async def async_search_deezer_artists(query, limit):
+    """Deezer artists matching query ([] if none), or None on errors."""
+    try:
+        response = await _aget('deezer', deezer_artist_search_url(query, limit), timeout=5)
+        if is_upstream_error(response.status_code):
+            response.raise_for_status()
+        data = response.json()
+        if 'error' in data:  # Quota and other errors come with a 200 status
+            raise ValueError(data['error'])
+        return parse_deezer_artists(data)
+    except Exception as e:
+        print(f"Error searching Deezer: {e}")
+        return None
+
+async def async_lookup_itunes(id, entity=None, limit=None):
+    """iTunes lookup results ([] if not found), or None on errors."""
+    try:
+        response = await _aget('itunes', itunes_lookup_url(id, entity, limit), timeout=5)
+        if is_upstream_error(response.status_code):
+            response.raise_for_status()
+        results = response.json().get('results', [])
+        suggestions.observe(results)
+        return results
+    except Exception as e:
+        print(f"Error looking up iTunes: {e}")
+        return None
+
+async def _lookup_chunk(chunk):
+    try:
+        response = await _aget('itunes', itunes_lookup_url(','.join(chunk)), timeout=5)
+        if response.status_code != 200:
+            raise ValueError(f"status {response.status_code}")
+        results = response.json().get('results', [])
+        suggestions.observe(results)
+        by_id = index_lookup_results(results, chunk)
+    except Exception as e:
+        print(f"Error looking up iTunes IDs: {e}")
+        return {}  # Not cached, retried on the next call
+    policy = CACHE_POLICY[('itunes', 'lookup')]
+    for i in chunk:
+        # IDs iTunes did not return are remembered for the negative TTL only
+        _lookup_entities.set(i, by_id.get(i), ttl=policy.ttl if i in by_id else policy.negative_ttl)
+    return by_id
+
+async def async_lookup_itunes_many(ids):
+    """
+    Looks up many iTunes IDs (artists, albums or tracks) in chunks of
+    ITUNES_LOOKUP_CHUNK per request, fetched concurrently. Returns
+    {id: result or None}, keyed by the IDs as strings.
+    """
+    results, missing = {}, []
+    for i in dict.fromkeys(str(i) for i in ids if i):
+        cached = _lookup_entities.get(i, _MISSING)
+        if cached is _MISSING:
+            missing.append(i)
+        else:
+            results[i] = cached
+    chunks = [missing[n:n + ITUNES_LOOKUP_CHUNK] for n in range(0, len(missing), ITUNES_LOOKUP_CHUNK)]
+    for by_id in await asyncio.gather(*(_lookup_chunk(chunk) for chunk in chunks)):
+        results.update(by_id)
+    for i in missing:
+        results.setdefault(i, None)
+    return results
+
+def lookup_itunes_many(ids):
+    """Sync wrapper around async_lookup_itunes_many."""
+    return run(async_lookup_itunes_many(ids))
+
+async def async_get_true_artist_image(artist_id):
+    try:
+        if not artist_id: return None
+        return pick_artist_image(await async_lookup_itunes(artist_id, 'album', 60) or [])
+    except: return None
+
+async def async_get_lastfm_artist_data(artist_name):
+    try:
+        if not artist_name: return None
+        response = await _aget('lastfm', lastfm_artist_info_url(artist_name), timeout=2)
+        return parse_lastfm_artist(response.json())
+    except Exception as e:
+        print(f"LastFM Error: {e}")
+        return None
+
+async def async_get_lastfm_album_stats(artist_name, album_name):
+    try:
+        if not artist_name or not album_name: return None
+        response = await _aget('lastfm', lastfm_album_info_url(artist_name, album_name), timeout=2)
+        return parse_lastfm_album_stats(response.json())
+    except: return None
+
+async def async_get_similar_artists(artist_name, limit=5):
+    try:
+        if not artist_name: return []
+        response = await _aget('lastfm', lastfm_similar_url(artist_name, limit), timeout=3)
+        return parse_similar_artists(response.json())
+    except: return []
+
+async def async_get_lastfm_top_tracks(artist_name, limit=200):
+    """Play counts by normalized title ({} if Last.fm has none), or None on errors."""
+    try:
+        if not artist_name: return {}
+        response = await _aget('lastfm', lastfm_top_tracks_url(artist_name, limit), timeout=3)
+        if is_upstream_error(response.status_code):
+            response.raise_for_status()
+        data = response.json()
+        if data.get('error') not in (None, 6):  # 6: artist not found, anything else is a failure
+            raise ValueError(data.get('message', data['error']))
+        return parse_lastfm_top_tracks(data)
+    except Exception as e:
+        print(f"LastFM top tracks error: {e}")
+        return None
@@ -1,14 +1,26 @@
 from flask import Blueprint, render_template
 from api_clients import lookup_itunes, get_lastfm_album_stats
+from page_cache import get_or_stream_view, render_view, fill_slot
+from http_cache import conditional
 from utils import generate_spotify_link, generate_youtube_link
 
 album_bp = Blueprint('album', __name__)
 
 @album_bp.route('/album/<collection_id>')
+@conditional('public')
 def album_page(collection_id):
+    # Album body cached once for all users (concurrent misses share one render or stream),
+    # streamed when it is not cached at all
+    rendered = get_or_stream_view(f"album_body_{collection_id}", 'album_detail', lambda: _build_album_page(collection_id),
+                                  lambda: _stream_album_page(collection_id), timeout=3600)  # Cache for 1 hour
+    if not rendered: return "Album not found"
+    return rendered
+
+def _lookup_album(collection_id):
+    """Template context of the album view without the Last.fm stats, or None if the album is not found."""
     # Increase limit to 200 as box sets can have many tracks
     data = lookup_itunes(collection_id, 'song', 200)
-    if not data: return "Album not found"
+    if not data: return None
     
     album_info = data[0]
     album_info['artworkUrl100'] = album_info.get('artworkUrl100', '').replace('100x100bb', '600x600bb')
@@ -16,7 +28,6 @@ def album_page(collection_id):
     date = album_info.get('releaseDate', '')
     album_info['year'] = date[:4] if date else ''
     
-    album_stats = get_lastfm_album_stats(album_info.get('artistName'), album_info.get('collectionName'))
     spotify_link = generate_spotify_link(f"{album_info.get('artistName')} {album_info.get('collectionName')}")
     youtube_link = generate_youtube_link(f"{album_info.get('artistName')} {album_info.get('collectionName')}")
     
@@ -24,4 +35,32 @@ def album_page(collection_id):
     songs = data
     songs.sort(key=lambda x: (x.get('discNumber', 1), x.get('trackNumber', 1)))
             
-    return render_template('index.html', view='album_detail', album=album_info, songs=songs, spotify_link=spotify_link, youtube_link=youtube_link, album_stats=album_stats)
\ No newline at end of file
+    return dict(album=album_info, songs=songs, spotify_link=spotify_link, youtube_link=youtube_link)
+
+def _album_stats(album_info):
+    return get_lastfm_album_stats(album_info.get('artistName'), album_info.get('collectionName'))
+
+def _build_album_page(collection_id):
+    """Template context of the album view, or None if the album is not found."""
+    context = _lookup_album(collection_id)
+    if not context: return None
+    context['album_stats'] = _album_stats(context['album'])
+    return context
+
+def _stream_album_page(collection_id):
+    """Chunks of the album view for page_cache.stream_page, or None if the album is not found."""
+    context = _lookup_album(collection_id)
+    if not context: return None
+    return _album_chunks(context)
+
+def _album_chunks(context):
+    # Tracklist at once, the Last.fm stats when they arrive
+    yield render_view('album_detail', streaming=True, **context)
+    try:
+        context['album_stats'] = _album_stats(context['album'])
+    except Exception as e:
+        print(f"Streamed album stats failed: {e}")
+        return None
+    yield fill_slot('album-stats', render_template('views/album/stats.html', **context))
+    # Whole body (no slots) for the cache
+    return render_view('album_detail', **context)
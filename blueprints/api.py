@@ -1,129 +1,192 @@
-from flask import Blueprint, jsonify, request
-from api_clients import search_itunes, lookup_itunes, search_deezer_artists, get_true_artist_image
+from flask import Blueprint, jsonify, request, send_file, abort
+from async_clients import run, submit, async_search_itunes, async_search_deezer_artists, async_get_true_artist_image
+from artist_store import async_get_artist, find_artist_id
+from image_store import images, cached_image_url, IMAGE_CACHE_URL
+from suggest_index import suggestions
+from result_sets import normalize_query
+from cache_policy import CACHE_POLICY
+from lru import LRUCache
 from utils import generate_spotify_link
-import hashlib
+import asyncio
 import os
-import requests
+import threading
 
 api_bp = Blueprint('api', __name__)
 
-# Image caching function
-def get_cached_image(url, cache_dir='static/cache'):
-    if not url:
-        return url
-    
-    # Create cache filename from URL hash
-    url_hash = hashlib.md5(url.encode()).hexdigest()
-    ext = url.split('.')[-1].split('?')[0]  # Get extension
-    if ext not in ['jpg', 'jpeg', 'png', 'gif']:
-        ext = 'jpg'
-    cache_path = f"{cache_dir}/{url_hash}.{ext}"
-    
-    # Check if cached
-    if os.path.exists(cache_path):
-        return f"/{cache_path}"
-    
-    # Download and cache
-    try:
-        response = requests.get(url, timeout=5)
-        if response.status_code == 200:
-            with open(cache_path, 'wb') as f:
-                f.write(response.content)
-            return f"/{cache_path}"
-    except:
-        pass
-    
-    return url  # Fallback to original URL
+# Max IDs (and max names) resolved per /api/artist-images call
+ARTIST_IMAGES_BATCH_LIMIT = 50
+SUGGESTIONS_LIMIT = 8
+# Fewer local suggestions than this: fill the index from iTunes in the background
+SUGGEST_MIN_LOCAL = int(os.getenv("SUGGEST_MIN_LOCAL", 3))
+# No local suggestion at all: wait this long (seconds) for the fill before answering
+SUGGEST_FILL_WAIT = float(os.getenv("SUGGEST_FILL_WAIT", 0.4))
+# Cached images and variants never change for a given URL
+IMAGE_CACHE_MAX_AGE = 365 * 24 * 3600
+# An original served in place of a variant, until the variant can be made
+IMAGE_FALLBACK_MAX_AGE = int(os.getenv("IMAGE_FALLBACK_MAX_AGE", 600))
+
+# Queries already sent to iTunes for suggestions
+_filled = LRUCache(maxsize=10000, ttl=CACHE_POLICY[('itunes', 'search')].ttl)
+# Queries with a fill in flight
+_filling = set()
+_filling_lock = threading.Lock()
+
+def _immutable(response):
+    # File names are derived from the origin URL, so a URL never changes content
+    response.cache_control.public = True
+    response.cache_control.max_age = IMAGE_CACHE_MAX_AGE
+    response.cache_control.immutable = True
+    return response
+
+@api_bp.route(f'{IMAGE_CACHE_URL}/<name>')
+def cached_image(name):
+    path = images.path_for(name)
+    if not path:
+        abort(404)
+    return _immutable(send_file(path))
+
+@api_bp.route(f'{IMAGE_CACHE_URL}/<variant>/<name>')
+def cached_image_variant(variant, name):
+    fmt = 'webp' if 'image/webp' in request.headers.get('Accept', '') else 'jpeg'
+    path = images.variant_path(name, variant, fmt)
+    if path:
+        response = _immutable(send_file(path))
+    else:
+        # Original file if the variant cannot be made (no Pillow, undecodable
+        # image), not cached for long: the same URL serves the variant later
+        path = images.path_for(name)
+        if not path:
+            abort(404)
+        response = send_file(path)
+        response.cache_control.public = True
+        response.cache_control.max_age = IMAGE_FALLBACK_MAX_AGE
+    response.vary.add('Accept')
+    return response
+
+@api_bp.app_template_filter('image_variant')
+def image_variant(url, variant):
+    """Jinja filter: {{ url|image_variant('card') }} -> local resized copy once cached, else url."""
+    return cached_image_url(url, variant)
+
+async def _fill_suggestions(query):
+    """True if iTunes returned anything for the (normalized) query."""
+    # Same requests as the search page (which also searches the normalized query), so either one warms the other's cache
+    artists, albums = await asyncio.gather(async_search_itunes(query, 'musicArtist', 25), async_search_itunes(query, 'album', 15))
+    return bool(artists or albums)
+
+def _start_fill(query):
+    """Queries iTunes in the background for a query (once per search TTL); the results land in the index."""
+    key = normalize_query(query)
+    with _filling_lock:
+        if _filled.get(key) or key in _filling:
+            return None
+        _filling.add(key)
+
+    async def fill():
+        try:
+            # A failed fill (breaker open, timeout) is not remembered, so the next keystroke retries it
+            if await _fill_suggestions(key):
+                _filled.set(key, True)
+        finally:
+            with _filling_lock:
+                _filling.discard(key)
+
+    return submit(fill())
 
 @api_bp.route('/api/search-suggestions')
 def api_search_suggestions():
     query = request.args.get('q', '').strip()
     if not query or len(query) < 2:
         return jsonify([])
-    
-    # Get suggestions from iTunes API
-    suggestions = []
-    try:
-        # Search for artists
-        artists = search_itunes(query, 'musicArtist', 5)
-        for artist in artists:
-            name = artist.get('artistName', '')
-            if name and query.lower() in name.lower():
-                suggestions.append({'text': name, 'type': 'artist', 'id': artist.get('artistId')})
-        
-        # Search for albums
-        albums = search_itunes(query, 'album', 5)
-        for album in albums:
-            name = album.get('collectionName', '')
-            if name and query.lower() in name.lower():
-                suggestions.append({'text': f"{name} - {album.get('artistName', '')}", 'type': 'album', 'id': album.get('collectionId')})
-        
-        # Limit to 8 suggestions
-        suggestions = suggestions[:8]
-        
-    except Exception as e:
-        print(f"Suggestions error: {e}")
-    
-    return jsonify(suggestions)
+
+    results = suggestions.search(query, SUGGESTIONS_LIMIT)
+    if len(results) < SUGGEST_MIN_LOCAL:
+        fill = _start_fill(query)
+        if not results and fill is not None:
+            # Nothing known locally yet: give the fill a short head start
+            try:
+                fill.result(SUGGEST_FILL_WAIT)
+            except Exception:
+                pass
+            results = suggestions.search(query, SUGGESTIONS_LIMIT)
+    return jsonify(results)
+
+async def _image_for_id(artist_id):
+    # Deezer photo, else iTunes artwork (shared artist store, same record as search and artist page)
+    record = await async_get_artist(artist_id, want=('image',))
+    return cached_image_url(record['image'], 'card')
+
+async def _image_for_name(name):
+    # 0. Artist already known to the store (seen in search or on an artist page)
+    artist_id = find_artist_id(name)
+    if artist_id:
+        record = await async_get_artist(artist_id, name, want=('image',))
+        if record['image']:
+            return cached_image_url(record['image'], 'card')
+
+    # 1. First try Deezer (faster and prettier)
+    dz = await async_search_deezer_artists(name, 1)
+    if dz:
+        return cached_image_url(dz[0]['image'], 'card')
+
+    # 2. If not, search in iTunes (via Artist ID -> Album)
+    results = await async_search_itunes(name, 'musicArtist', 1)
+    if results:
+        img = await async_get_true_artist_image(results[0].get('artistId'))
+        if img:
+            return cached_image_url(img, 'card')
+
+    # 3. Fallback: If no artist photo, take the cover of the first available album
+    albums = await async_search_itunes(name, 'album', 60)
+    for alb in albums:
+        if alb.get('artworkUrl100'):
+            # Skip Donda and Vultures (often dark/empty covers)
+            cname = alb.get('collectionName', '').lower()
+            if 'donda' in cname or 'vultures' in cname: continue
+            img_url = alb.get('artworkUrl100').replace('100x100bb', '300x300bb')
+            return cached_image_url(img_url, 'card')
+    return None
+
+async def _images_for(ids, names):
+    results = await asyncio.gather(
+        *(_image_for_id(artist_id) for artist_id in ids),
+        *(_image_for_name(name) for name in names),
+        return_exceptions=True,
+    )
+    images = [None if isinstance(r, Exception) else r for r in results]
+    return dict(zip(ids, images[:len(ids)])), dict(zip(names, images[len(ids):]))
 
 @api_bp.route('/api/get-artist-image/<artist_id>')
 def api_get_artist_image(artist_id):
-    # 1. First try Deezer (artist name required)
     try:
-        data = lookup_itunes(artist_id)
-        if data:
-            name = data[0].get('artistName')
-            if name:
-                dz = search_deezer_artists(name, 1)
-                if dz: 
-                    cached_image = get_cached_image(dz[0]['image'])
-                    return jsonify({'image': cached_image})
-    except: pass
-
-    # 2. If it fails — take from iTunes artwork
-    image_url = get_true_artist_image(artist_id)
-    if image_url:
-        cached_image = get_cached_image(image_url)
-        return jsonify({'image': cached_image})
+        return jsonify({'image': run(_image_for_id(artist_id))})
+    except Exception as e:
+        print(f"Artist image error: {e}")
     return jsonify({'image': None})
 
 @api_bp.route('/api/get-artist-image-by-name')
 def api_get_artist_image_by_name():
     name = request.args.get('name')
     if not name: return jsonify({'image': None})
-    
-    # 1. First try Deezer (faster and prettier)
-    try:
-        dz = search_deezer_artists(name, 1)
-        if dz: 
-            cached_image = get_cached_image(dz[0]['image'])
-            return jsonify({'image': cached_image})
-    except: pass
-    
-    # 2. If not, search in iTunes (via Artist ID -> Album)
     try:
-        results = search_itunes(name, 'musicArtist', 1)
-        if results:
-            artist_id = results[0].get('artistId')
-            img = get_true_artist_image(artist_id)
-            if img: 
-                cached_image = get_cached_image(img)
-                return jsonify({'image': cached_image})
-    except:
-        pass
+        return jsonify({'image': run(_image_for_name(name))})
+    except Exception as e:
+        print(f"Artist image error: {e}")
+    return jsonify({'image': None})
 
-    # 3. Fallback: If no artist photo, take the cover of the first available album
-    try:
-        albums = search_itunes(name, 'album', 60)
-        for alb in albums:
-            if alb.get('artworkUrl100'):
-                # Skip Donda and Vultures (often dark/empty covers)
-                cname = alb.get('collectionName', '').lower()
-                if 'donda' in cname or 'vultures' in cname: continue
-                img_url = alb.get('artworkUrl100').replace('100x100bb', '300x300bb')
-                cached_image = get_cached_image(img_url)
-                return jsonify({'image': cached_image})
-    except:
-        pass
-    
-    return jsonify({'image': None})
\ No newline at end of file
+@api_bp.route('/api/artist-images', methods=['POST'])
+def api_artist_images():
+    """
+    Batch version of the two endpoints above, for all visible cards at once:
+    {"ids": [...], "names": [...]} -> {"ids": {id: image}, "names": {name: image}}
+    """
+    data = request.get_json(silent=True)
+    if data is None:
+        data = {}
+    if not isinstance(data, dict) or not all(isinstance(data.get(key) or [], list) for key in ('ids', 'names')):
+        return jsonify({'error': 'Expected {"ids": [...], "names": [...]}'}), 400
+    # Dedupe, keep order, cap the batch size
+    ids = list(dict.fromkeys(str(i) for i in data.get('ids') or [] if i))[:ARTIST_IMAGES_BATCH_LIMIT]
+    names = list(dict.fromkeys(n for n in data.get('names') or [] if n and isinstance(n, str)))[:ARTIST_IMAGES_BATCH_LIMIT]
+    by_id, by_name = run(_images_for(ids, names))
+    return jsonify({'ids': by_id, 'names': by_name})
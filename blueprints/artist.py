@@ -1,127 +1,155 @@
+from concurrent.futures import as_completed
 from flask import Blueprint, render_template, request, redirect, url_for
-from api_clients import lookup_itunes, get_lastfm_artist_data, get_similar_artists, search_deezer_artists, get_true_artist_image, search_itunes
+from api_clients import lookup_itunes, get_similar_artists, search_itunes, pick_artist_image
+from async_clients import run, submit, async_get_similar_artists, async_lookup_itunes
+from artist_store import async_get_artist, peek_artist, remember_artist
+from top_songs import async_get_top_songs, get_top_songs
+from page_cache import get_or_stream_view, render_view, fill_slot
+from http_cache import conditional
+from discography import get_discography, discography_page
 from utils import sort_albums
-from concurrent.futures import ThreadPoolExecutor
+import asyncio
 
 artist_bp = Blueprint('artist', __name__)
 
 @artist_bp.route('/artist/<artist_id>')
+@conditional('public')
 def artist_page(artist_id):
-    # Cache artist page
-    from flask import current_app
-    cache = current_app.cache
-    cache_key = f"artist_{artist_id}"
-    cached_result = cache.get(cache_key)
-    if cached_result:
-        return cached_result
-    
-    # First get basic info (fast, 1 request)
-    data = lookup_itunes(artist_id)
-    if not data: return "Artist not found"
-    
-    artist = data[0]
-    artist_name = artist.get('artistName', '')
-    
-    # PARALLEL LOADING (ThreadPoolExecutor)
-    # Start 5 heavy requests simultaneously
-    with ThreadPoolExecutor() as executor:
-        # 1. Last.fm Info
-        future_lf = executor.submit(get_lastfm_artist_data, artist_name)
-        # 2. Similar Artists
-        future_sim = executor.submit(get_similar_artists, artist_name)
-        # 3. Deezer Info
-        future_dz = executor.submit(search_deezer_artists, artist_name, 1)
-        # 4. Artist Image
-        future_img = executor.submit(get_true_artist_image, artist_id)
-        # 5. Get all discography (separate request)
-        future_albums = executor.submit(lookup_itunes, artist_id, 'album', 200)
-        
-        lf = future_lf.result()
-        similar = future_sim.result()
-        dz = future_dz.result()
-        artist_image = future_img.result()
-        albums_data = future_albums.result()
-    
-    # Process Last.fm data
-    if lf:
-        artist['bio'] = lf.get('bio', '')
-        artist['stats'] = lf.get('stats')
-        artist['tags'] = lf.get('tags', [])
-    
-    # Process Deezer data
-    deezer_data = dz[0] if dz else None
-    if deezer_data:
-        # If no Last.fm bio, use Deezer
-        if not artist.get('bio') and deezer_data.get('bio'):
-            artist['bio'] = deezer_data['bio']
-        # If no image, use Deezer
-        if not artist_image and deezer_data.get('image'):
-            artist_image = deezer_data['image']
-    
-    # If Last.fm didn't provide stats, try Deezer
-    if not artist.get('stats') and deezer_data:
-        artist['stats'] = deezer_data.get('stats')
-    
-    # 2. Process Top Songs
-    top_songs = []
-    seen_titles = set()
-    target_id = int(artist_id)
-    target_name_lower = artist_name.lower()
-    
-    # Get songs from iTunes (limit 200 for box sets)
-    songs_data = lookup_itunes(artist_id, 'song', 200)
-    if songs_data:
-        for song in songs_data:
-            if song.get('artistId') == target_id or song.get('artistName', '').lower() == target_name_lower:
-                title = song.get('trackName', '')
-                if title and title not in seen_titles:
-                    seen_titles.add(title)
-                    song['spotify_link'] = f"https://open.spotify.com/search/{artist_name} {title}".replace(' ', '%20')
-                    song['youtube_link'] = f"https://www.youtube.com/results?search_query={artist_name} {title}".replace(' ', '+')
-                    top_songs.append(song)
-                    if len(top_songs) >= 10: break
-    
-    # 3. Process Discography (from separate albums request)
-    raw_albums = [x for x in albums_data if x.get('collectionType') == 'Album'] if albums_data else []
-    discography = sort_albums(raw_albums)
-    
-    rendered = render_template('index.html', view='artist_detail', artist=artist, discography=discography, artist_image=artist_image, similar=similar, top_songs=top_songs)
-    cache.set(cache_key, rendered, timeout=3600)  # Cache for 1 hour
+    # Artist body cached once for all users (concurrent misses share one render or stream),
+    # streamed when it is not cached at all
+    rendered = get_or_stream_view(f"artist_body_{artist_id}", 'artist_detail', lambda: _build_artist_page(artist_id),
+                                  lambda: _stream_artist_page(artist_id), timeout=3600)  # Cache for 1 hour
+    if not rendered: return "Artist not found"
     return rendered
 
+async def _artist_details(artist_id, name):
+    # Artwork comes from the album lookup, so the store is not asked for it
+    return await asyncio.gather(
+        async_get_artist(artist_id, name, want=('image', 'stats', 'bio', 'tags')),
+        async_get_similar_artists(name),
+    )
+
+async def _details_after_albums(artist_id, known_name, albums, early_details):
+    albums_data = await asyncio.wrap_future(albums)
+    if not albums_data:
+        return None
+    name = albums_data[0].get('artistName', '')
+    remember_artist(artist_id, name=name, artwork=pick_artist_image(albums_data))
+    # Renamed artist (or unknown name): the early calls used the wrong name
+    if name == known_name:
+        return await asyncio.wrap_future(early_details)
+    return await _artist_details(artist_id, name)
+
+def _start_artist_page(artist_id):
+    """
+    Starts everything the artist page needs in one concurrent wave: the album
+    lookup (its first row is the artist, the albums give the artwork), the
+    shared top-songs index, and the name-based calls (store + similar
+    artists). The name-based calls start at once when the store already
+    knows the name, otherwise as soon as the album lookup returns it.
+    Returns futures of the albums, the top-songs index and (record, similar).
+    """
+    known = peek_artist(artist_id)
+    known_name = known['name'] if known else None
+    albums = submit(async_lookup_itunes(artist_id, 'album', 200))
+    # Shared top-songs index (iTunes songs, limit 200 for box sets)
+    songs = submit(async_get_top_songs(artist_id, known_name))
+    early_details = submit(_artist_details(artist_id, known_name)) if known_name else None
+    details = submit(_details_after_albums(artist_id, known_name, albums, early_details))
+    return albums, songs, details
+
+async def _load_artist_page(artist_id):
+    """Everything the artist page needs: (albums, top-songs index, record, similar), or None."""
+    albums_data, songs_index, details = await asyncio.gather(*map(asyncio.wrap_future, _start_artist_page(artist_id)))
+    if not albums_data:
+        return None
+    record, similar = details
+    return albums_data, songs_index, record, similar
+
+def _hero_context(albums_data):
+    """Artist view context from the album lookup alone (hero and discography)."""
+    # Same albums response for the discography
+    raw_albums = [x for x in albums_data if x.get('collectionType') == 'Album']
+    return dict(artist=albums_data[0], artist_image=pick_artist_image(albums_data), discography=sort_albums(raw_albums))
+
+def _add_details(context, record, similar):
+    artist = context['artist']
+    artist['bio'] = record['bio']
+    artist['stats'] = record['stats']
+    artist['tags'] = record['tags']
+    # Album artwork first, Deezer photo if there is none
+    context['artist_image'] = context['artist_image'] or record['image']
+    context['similar'] = similar
+
+def _add_top_songs(context, songs_index):
+    # First entries of the shared index
+    context['top_songs'] = songs_index[1][:10] if songs_index else []
+
+def _build_artist_page(artist_id):
+    """Template context of the artist view, or None if the artist is not found."""
+    data = run(_load_artist_page(artist_id))
+    if not data: return None
+    albums_data, songs_index, record, similar = data
+    context = _hero_context(albums_data)
+    _add_details(context, record, similar)
+    _add_top_songs(context, songs_index)
+    return context
+
+def _stream_artist_page(artist_id):
+    """Chunks of the artist view for page_cache.stream_page, or None if the artist is not found."""
+    albums, songs, details = _start_artist_page(artist_id)
+    albums_data = albums.result()
+    if not albums_data: return None
+    return _artist_chunks(albums_data, songs, details)
+
+def _artist_chunks(albums_data, songs, details):
+    context = _hero_context(albums_data)
+    if not context['artist_image']:
+        # No album artwork: the hero waits for the Deezer photo
+        try:
+            _add_details(context, *details.result())
+        except Exception:
+            pass  # Reported with the sections below
+    # Hero and discography at once, the other sections as their calls complete
+    yield render_view('artist_detail', streaming=True, **context)
+    complete = True
+    for future in as_completed((songs, details)):
+        try:
+            result = future.result()
+        except Exception as e:
+            print(f"Streamed artist section failed: {e}")
+            complete = False
+            continue
+        if future is songs:
+            _add_top_songs(context, result)
+            yield fill_slot('top-songs', render_template('views/artist/top_songs.html', **context))
+        else:
+            _add_details(context, *result)
+            yield fill_slot('meta', render_template('views/artist/meta.html', **context))
+            yield fill_slot('bio', render_template('views/artist/bio.html', **context))
+            yield fill_slot('similar', render_template('views/artist/similar.html', **context))
+    # Whole body (no slots) for the cache
+    return render_view('artist_detail', **context) if complete else None
+
 @artist_bp.route('/artist/<artist_id>/discography/<category>')
+@conditional('public')
 def artist_discography(artist_id, category):
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 20, type=int)
     sort_by = request.args.get('sort', 'year')
     
-    data = lookup_itunes(artist_id, 'album', 200)
-    if not data:
+    # Processed once per album lookup, pages are slices of it
+    discography = get_discography(artist_id)
+    if not discography:
         return "Artist not found", 404
 
-    artist = data[0]
-    raw_albums = [x for x in data if x.get('collectionType') == 'Album']
-    discography = sort_albums(raw_albums)
-
-    if category not in discography:
+    artist = discography['artist']
+    if category not in discography['categories']:
         return "Category not found", 404
 
-    results = discography[category]
-    
-    # Apply sorting
-    if sort_by == 'name':
-        results.sort(key=lambda x: x.get('collectionName', '').lower())
-    elif sort_by == 'year':
-        results.sort(key=lambda x: x.get('releaseDate', '')[:4], reverse=True)
-    # Default 'year' for discography
+    paginated_results, total_results = discography_page(discography, category, sort_by, page, per_page)
     
-    # Apply pagination
-    total_results = len(results)
-    start = (page - 1) * per_page
-    end = start + per_page
-    paginated_results = results[start:end]
-    
-    has_next = end < total_results
+    has_next = page * per_page < total_results
     has_prev = page > 1
     
     return render_template('index.html', view='artist_discography', results=paginated_results, type=category, query=artist.get('artistName', ''), artist=artist,
@@ -145,6 +173,7 @@ def redirect_artist():
     return redirect(url_for('artist.artist_page', artist_id=artist_id))
 
 @artist_bp.route('/artist/<artist_id>/similar')
+@conditional('public')
 def similar_artists(artist_id):
     """Show all similar artists for a given artist."""
     from flask import current_app
@@ -175,45 +204,25 @@ def similar_artists(artist_id):
                           page=page, per_page=per_page, has_next=has_next, has_prev=has_prev, total=total_results)
 
 @artist_bp.route('/artist/<artist_id>/top-songs')
+@conditional('public')
 def artist_top_songs(artist_id):
     """Show all top songs for a given artist."""
     from flask import current_app
     
-    # Get artist name
-    data = lookup_itunes(artist_id)
-    if not data:
+    # Shared top-songs index (same as the artist page)
+    index = get_top_songs(artist_id)
+    if not index:
         return "Artist not found", 404
     
-    artist_name = data[0].get('artistName', '')
-    
-    # Get all songs
-    top_songs = []
-    seen_titles = set()
-    target_id = int(artist_id)
-    target_name_lower = artist_name.lower()
-    
-    songs_data = lookup_itunes(artist_id, 'song', 200)
-    if songs_data:
-        for song in songs_data:
-            if song.get('artistId') == target_id or song.get('artistName', '').lower() == target_name_lower:
-                title = song.get('trackName', '')
-                if title and title not in seen_titles:
-                    seen_titles.add(title)
-                    song['spotify_link'] = f"https://open.spotify.com/search/{artist_name} {title}".replace(' ', '%20')
-                    song['youtube_link'] = f"https://www.youtube.com/results?search_query={artist_name} {title}".replace(' ', '+')
-                    top_songs.append(song)
+    artist_name, top_songs = index
     
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 20, type=int)
     sort_by = request.args.get('sort', 'popularity')
     
-    # Apply sorting
+    # Apply sorting (the index itself is in popularity order)
     if sort_by == 'name':
-        top_songs.sort(key=lambda x: x.get('trackName', '').lower())
-    elif sort_by == 'popularity':
-        # Keep original order (iTunes returns by popularity)
-        pass
-    # Default is popularity
+        top_songs = sorted(top_songs, key=lambda x: x.get('trackName', '').lower())
     
     # Apply pagination
     total_results = len(top_songs)
@@ -2,8 +2,7 @@ from flask import Blueprint, render_template, redirect, url_for, flash, request,
 from flask_login import login_user, logout_user, login_required, current_user
 from models import db, User, Favorite, Playlist, PlaylistItem
 from api_clients import search_itunes
-import requests
-from urllib.parse import quote
+from http_cache import conditional
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -61,6 +60,7 @@ def logout():
     return redirect(url_for('search.index'))
 
 @auth_bp.route('/profile')
+@conditional('private')
 @login_required
 def profile():
     # Load favorites and playlists
@@ -76,6 +76,7 @@ def profile():
                            playlists=playlists)
 
 @auth_bp.route('/favorites')
+@conditional('private')
 @login_required
 def favorites():
     # Load favorites and playlists
@@ -91,12 +92,14 @@ def favorites():
                            playlists=playlists)
 
 @auth_bp.route('/playlists')
+@conditional('private')
 @login_required
 def playlists():
     user_playlists = Playlist.query.filter_by(user_id=current_user.id).order_by(Playlist.created_at.desc()).all()
     return render_template('index.html', view='playlists', playlists=user_playlists)
 
 @auth_bp.route('/playlist/<int:playlist_id>')
+@conditional('private')
 @login_required
 def playlist_detail(playlist_id):
     playlist = Playlist.query.get_or_404(playlist_id)
@@ -142,6 +145,7 @@ def toggle_favorite():
         return jsonify({'status': 'added'})
 
 @auth_bp.route('/api/check_favorites')
+@conditional('private')
 @login_required
 def check_favorites():
     favs = Favorite.query.filter_by(user_id=current_user.id).all()
@@ -173,6 +177,7 @@ def create_playlist():
     })
 
 @auth_bp.route('/api/playlists/recommendations/<int:playlist_id>')
+@conditional('private')
 @login_required
 def get_playlist_recommendations(playlist_id):
     playlist = Playlist.query.get_or_404(playlist_id)
@@ -188,13 +193,12 @@ def get_playlist_recommendations(playlist_id):
     base_artist = artists[0]
     
     # Search similar tracks via iTunes
-    url = f"https://itunes.apple.com/search?term={quote(base_artist)}&entity=song&limit=10"
     try:
-        res = requests.get(url, timeout=5).json()
+        res = search_itunes(base_artist, 'song', 10)
         tracks = []
         existing_ids = set([i.track_id.split('|')[-1] for i in playlist.items])
         
-        for r in res.get('results', []):
+        for r in res:
             tid = str(r.get('trackId'))
             if tid not in existing_ids:
                 tracks.append({
@@ -300,6 +304,7 @@ def reorder_playlist():
     return jsonify({'status': 'success'})
 
 @auth_bp.route('/api/playlists/list')
+@conditional('private')
 @login_required
 def list_playlists_api():
     user_playlists = Playlist.query.filter_by(user_id=current_user.id).all()
@@ -1,108 +1,90 @@
-from flask import Blueprint, render_template, request
-from flask_login import current_user
-from api_clients import search_itunes
+from flask import Blueprint, render_template, request, jsonify
+from async_clients import run, async_search_itunes
+from artist_store import async_get_artist, peek_artist
+from page_cache import get_or_render_view
+from http_cache import conditional
+from result_sets import normalize_query, get_result_set, encode_cursor, decode_cursor, SEE_ALL_ENTITIES
 from utils import generate_spotify_link, generate_youtube_link, filter_and_process_artists, filter_and_process_albums, filter_and_process_songs
-from concurrent.futures import ThreadPoolExecutor
+import asyncio
 import re
 
 search_bp = Blueprint('search', __name__)
 
+async def _enrich_artist(art):
+    """Adds image and stats to an artist card from the shared artist store"""
+    record = await async_get_artist(art.get('artistId'), art.get('artistName', ''), want=('image', 'stats'))
+    art['image'] = record['image']
+    art['stats'] = record['stats']
+    return art
+
+async def _load_search_results(query):
+    """Gathers all upstream calls of the search page in one event-loop pass"""
+    ql = query.lower()
+    artists_data, albums_data, songs_data = await asyncio.gather(
+        async_search_itunes(query, 'musicArtist', 25),
+        async_search_itunes(query, 'album', 15),
+        async_search_itunes(query, 'song', 15),
+    )
+    
+    # 1. Artists (Main: take top 8, filter duplicates), enriched in parallel
+    candidates = filter_and_process_artists(artists_data, ql, limit=8)
+    artists = await asyncio.gather(*(_enrich_artist(art) for art in candidates))
+    
+    return {
+        'artists': list(artists)[:6],
+        # 2. Albums (use extracted function)
+        'albums': filter_and_process_albums(albums_data, ql, limit=6),
+        # 3. Songs (use extracted function)
+        'songs': filter_and_process_songs(songs_data, ql, limit=6),
+    }
+
 @search_bp.route('/')
+@conditional('public')
 def index():
     query = request.args.get('q')
     if not query:
         return render_template('index.html', view='home')
     
-    # Cache the search results
-    from flask import current_app
-    cache = current_app.cache
-    cache_key = f"search_{query}_{current_user.id if current_user.is_authenticated else 'anon'}"
-    cached_result = cache.get(cache_key)
-    if cached_result:
-        return cached_result
-    
-    results = {'artists': [], 'albums': [], 'songs': []}
-    ql = query.lower()
+    # The results body is cached once per normalized query for all users (concurrent misses share one render)
+    normalized = normalize_query(query)
 
-    # 1. Artists (Main: take top 8, filter duplicates)
-    candidates = filter_and_process_artists(search_itunes(query, 'musicArtist', 25), ql, limit=8)
-    
-    # Now enrich data PARALLELY (Deezer + Last.fm)
-    def enrich_artist(art):
-        from api_clients import search_deezer_artists, get_lastfm_artist_data
-        name = art.get('artistName', '')
-        aid = art.get('artistId')
-        
-        # 1. Image and Stats (Deezer)
-        dz = search_deezer_artists(name, 1)
-        deezer_stats = None
-        if dz:
-            art['image'] = dz[0]['image']
-            deezer_stats = dz[0].get('stats')
-        else:
-            from api_clients import get_true_artist_image
-            art['image'] = get_true_artist_image(aid)
-            
-        # 2. Last.fm stats
-        lf = get_lastfm_artist_data(name)
-        art['stats'] = lf.get('stats') if lf and lf.get('stats') else deezer_stats
-        return art
+    def build():
+        return {'data': run(_load_search_results(normalized)), 'query': normalized}
 
-    with ThreadPoolExecutor() as executor:
-        results['artists'] = list(executor.map(enrich_artist, candidates))[:6]
-    
-    # 2. Albums (use extracted function)
-    results['albums'] = filter_and_process_albums(search_itunes(query, 'album', 15), ql, limit=6)
-    
-    # 3. Songs (use extracted function)
-    results['songs'] = filter_and_process_songs(search_itunes(query, 'song', 15), ql, limit=6)
-        
-    rendered = render_template('index.html', view='results', data=results, query=query)
-    cache.set(cache_key, rendered, timeout=1800)  # Cache for 30 minutes
-    return rendered
+    return get_or_render_view(f"search_body_{normalized}", 'results', build, timeout=1800, query=query)  # Cache for 30 minutes
+
+# Max items per /api/see-all call
+SEE_ALL_JSON_LIMIT = 100
+
+def _with_images(items, type):
+    # Images already resolved (search results, artist pages) go straight into the HTML
+    if type != 'artists':
+        return items
+    results = []
+    for item in items:
+        known = peek_artist(item['artistId'])
+        results.append(dict(item, image=known['image'] if known else None))
+    return results
 
 @search_bp.route('/see-all/<type>')
+@conditional('public')
 def see_all(type):
     query = request.args.get('q')
     if not query: return "No query provided", 400
+    if type not in SEE_ALL_ENTITIES: return "Unknown type", 404
     
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 20, type=int)
     sort_by = request.args.get('sort', 'relevance')
     
-    ql = query.lower()
-    
-    entity_map = {'artists': 'musicArtist', 'albums': 'album', 'songs': 'song'}
-    entity = entity_map.get(type, 'album')
-    
-    # Large limit for "See All" list
-    data = search_itunes(query, entity, 200)
-    
-    # Use extracted filter functions
-    if type == 'artists':
-        results = filter_and_process_artists(data, ql)
-    elif type == 'albums':
-        results = filter_and_process_albums(data, ql)
-    else:  # songs
-        results = filter_and_process_songs(data, ql)
-
-    # Apply sorting
-    if sort_by == 'name':
-        if type == 'artists':
-            results.sort(key=lambda x: x.get('artistName', '').lower())
-        elif type == 'albums':
-            results.sort(key=lambda x: x.get('collectionName', '').lower())
-        elif type == 'songs':
-            results.sort(key=lambda x: x.get('trackName', '').lower())
-    elif sort_by == 'year' and type in ['albums', 'songs']:
-        results.sort(key=lambda x: x.get('releaseDate', '')[:4], reverse=True)
-    # Default 'relevance' - no sorting, keep original order
+    # Filtered and sorted once per (query, type), pages are slices of it
+    results = get_result_set(query, type, sort_by)
 
     # Apply pagination
     total_results = len(results)
-    start = (page - 1) * per_page
+    start = max(page - 1, 0) * per_page
     end = start + per_page
-    paginated_results = results[start:end]
+    paginated_results = _with_images(results[start:end], type)
     
     has_next = end < total_results
     has_prev = page > 1
@@ -110,8 +92,29 @@ def see_all(type):
     return render_template('index.html', view='see_all', results=paginated_results, type=type, query=query, 
                           page=page, per_page=per_page, has_next=has_next, has_prev=has_prev, total=total_results, sort_by=sort_by)
 
+@search_bp.route('/api/see-all/<type>')
+@conditional('public')
+def see_all_json(type):
+    """JSON pages of the see-all results for infinite scroll: ?q=&sort=&cursor=&limit="""
+    query = request.args.get('q')
+    if not query: return jsonify({'error': 'No query provided'}), 400
+    if type not in SEE_ALL_ENTITIES: return jsonify({'error': 'Unknown type'}), 404
+    
+    sort_by = request.args.get('sort', 'relevance')
+    limit = min(max(request.args.get('limit', 20, type=int), 1), SEE_ALL_JSON_LIMIT)
+    start = decode_cursor(request.args.get('cursor'))
+    
+    results = get_result_set(query, type, sort_by)
+    end = start + limit
+    return jsonify({
+        'results': _with_images(results[start:end], type),
+        'next_cursor': encode_cursor(end) if end < len(results) else None,
+        'total': len(results),
+    })
+
 
 @search_bp.route('/tag/<encoded_tag>')
+@conditional('public')
 def tag_page(encoded_tag):
     from urllib.parse import unquote
     from api_clients import get_tag_info, get_tag_artists
@@ -0,0 +1,114 @@
+"""
+Per-upstream circuit breakers and concurrency limits.
+
+A breaker counts consecutive timeouts/errors for one upstream (iTunes, Deezer,
+Last.fm). After failure_threshold of them it opens and calls fail fast with
+UpstreamUnavailable, which the api_clients functions turn into their usual
+fallbacks (None / []). After reset_timeout seconds it goes half-open and lets
+a single probe call through: success closes it, failure opens it again.
+
+Its concurrency slots are shared by the sync clients (acquire_slot) and the
+async ones (acquire_slot_async), so both together stay within max_concurrent.
+"""
+import asyncio
+import os
+import threading
+import time
+
+class UpstreamUnavailable(Exception):
+    """Raised instead of calling an upstream whose breaker is open or that is at its concurrency limit."""
+
+class CircuitBreaker:
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30, max_concurrent=10, queue_timeout=0.5):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_concurrent = max_concurrent
+        # How long a sync caller waits for a free slot before failing fast
+        self.queue_timeout = queue_timeout
+
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0
+        self._probe_in_flight = False
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state
+
+    def allow(self):
+        """Returns True if a call may go to the upstream now (takes the probe slot when half-open)."""
+        with self._lock:
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                self._state = self.HALF_OPEN
+            if self._state == self.HALF_OPEN:
+                if self._probe_in_flight:
+                    return False
+                self._probe_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+    def release_probe(self):
+        """Gives back the half-open probe slot without a verdict (e.g. the call was served from cache)."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def acquire_slot(self):
+        return self._slots.acquire(timeout=self.queue_timeout)
+
+    async def acquire_slot_async(self):
+        """acquire_slot for coroutines: waits on the event loop instead of blocking it."""
+        deadline = time.monotonic() + self.queue_timeout
+        while not self._slots.acquire(blocking=False):
+            if time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(0.01)
+        return True
+
+    def release_slot(self):
+        self._slots.release()
+
+def is_upstream_error(status_code):
+    """Statuses that count against the breaker (client errors like 404 do not)."""
+    return status_code >= 500 or status_code == 429
+
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", 5))
+BREAKER_RESET_TIMEOUT = float(os.getenv("BREAKER_RESET_TIMEOUT", 30))
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+def get_breaker(upstream, max_concurrent=10):
+    """Returns the shared breaker for an upstream ('itunes', 'deezer' or 'lastfm')."""
+    with _breakers_lock:
+        breaker = _breakers.get(upstream)
+        if breaker is None:
+            breaker = _breakers[upstream] = CircuitBreaker(
+                upstream,
+                failure_threshold=BREAKER_FAILURE_THRESHOLD,
+                reset_timeout=BREAKER_RESET_TIMEOUT,
+                max_concurrent=max_concurrent,
+            )
+        return breaker
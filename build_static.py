@@ -0,0 +1,44 @@
+"""
+Builds static/ for production: minified, fingerprinted copies of the CSS and
+JS with their manifest (see assets.py), then precompressed .gz (and .br, with
+Brotli installed) siblings of the text files, served by the static route (see
+compression.py).
+
+    python build_static.py [--force]
+
+Run it as part of the deploy, after the static files change. Files whose
+siblings are newer than them are skipped unless --force is given.
+"""
+import os
+import sys
+import assets
+from assets import write_atomic
+from compression import available_encodings, compress, STATIC_EXTENSIONS, STATIC_SUFFIXES
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+
+def build(static_dir=STATIC_DIR, force=False):
+    """Compresses every static text file; returns [(path, encoding, size, compressed size)]."""
+    written = []
+    for root, dirs, files in os.walk(static_dir):
+        dirs[:] = [d for d in dirs if d != 'cache']  # Image cache
+        for filename in files:
+            if not filename.endswith(STATIC_EXTENSIONS):
+                continue
+            source = os.path.join(root, filename)
+            with open(source, 'rb') as f:
+                data = f.read()
+            for encoding in available_encodings():
+                path = source + STATIC_SUFFIXES[encoding]
+                if not force and os.path.exists(path) and os.stat(path).st_mtime >= os.stat(source).st_mtime:
+                    continue
+                compressed = compress(data, encoding, static=True)
+                write_atomic(path, compressed)
+                written.append((path, encoding, len(data), len(compressed)))
+    return written
+
+if __name__ == '__main__':
+    for source, hashed in assets.build(STATIC_DIR).items():
+        print(f"{source:30s} -> {hashed}")
+    for path, encoding, size, compressed in build(force='--force' in sys.argv):
+        print(f"{os.path.relpath(path, STATIC_DIR):30s} {size:8d} -> {compressed:7d} bytes ({encoding})")
@@ -0,0 +1,74 @@
+"""
+Cache TTL policy per upstream endpoint.
+
+Each (upstream, method) entry has a URL pattern (glob, matched without the
+scheme, same rules as requests_cache's urls_expire_after), a TTL for normal
+responses and a short negative TTL for empty or error results (no artist
+found on Deezer, Last.fm "Album not found", 404s...), so misses are not
+retried on every page view but are not stuck for days either.
+"""
+from collections import namedtuple
+from datetime import timedelta
+from fnmatch import fnmatch
+
+CachePolicy = namedtuple('CachePolicy', ['pattern', 'ttl', 'negative_ttl'])
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+CACHE_POLICY = {
+    ('itunes', 'lookup'): CachePolicy('itunes.apple.com/lookup', DAY, HOUR),
+    ('itunes', 'search'): CachePolicy('itunes.apple.com/search', 6 * HOUR, 15 * 60),
+    ('deezer', 'search/artist'): CachePolicy('api.deezer.com/search/artist', 3 * DAY, HOUR),
+    ('lastfm', 'artist.getinfo'): CachePolicy('ws.audioscrobbler.com/2.0/?method=artist.getinfo', 7 * DAY, HOUR),
+    ('lastfm', 'artist.getsimilar'): CachePolicy('ws.audioscrobbler.com/2.0/?method=artist.getsimilar', 7 * DAY, HOUR),
+    ('lastfm', 'artist.gettoptracks'): CachePolicy('ws.audioscrobbler.com/2.0/?method=artist.gettoptracks', DAY, HOUR),
+    ('lastfm', 'album.getinfo'): CachePolicy('ws.audioscrobbler.com/2.0/?method=album.getinfo', 7 * DAY, 6 * HOUR),
+    ('lastfm', 'tag.getinfo'): CachePolicy('ws.audioscrobbler.com/2.0/?method=tag.getinfo', 30 * DAY, DAY),
+    ('lastfm', 'tag.gettopartists'): CachePolicy('ws.audioscrobbler.com/2.0/?method=tag.gettopartists', DAY, HOUR),
+}
+
+DEFAULT_POLICY = CachePolicy('*', DAY, HOUR)
+
+# Error statuses are cached too (with the negative TTL); 5xx are left to the circuit breakers
+CACHEABLE_STATUS_CODES = (200, 400, 404)
+
+def _url_match(url, pattern):
+    return fnmatch(url.split('://')[-1], pattern.rstrip('*') + '**')
+
+def policy_for_url(url):
+    for policy in CACHE_POLICY.values():
+        if _url_match(url, policy.pattern):
+            return policy
+    return DEFAULT_POLICY
+
+def urls_expire_after():
+    """Positive TTLs in the format of requests_cache's urls_expire_after setting."""
+    return {policy.pattern: policy.ttl for policy in CACHE_POLICY.values()}
+
+def is_negative(response):
+    """True for error statuses and for JSON responses that carry no results."""
+    if response.status_code != 200:
+        return True
+    if response.headers.get('Content-Type', '').startswith('image/'):
+        return False
+    try:
+        data = response.json()
+    except ValueError:
+        return False
+    if not isinstance(data, dict):
+        return False
+    # Last.fm and Deezer report errors in the body with a 200 status
+    if 'error' in data:
+        return True
+    # iTunes 'results' and Deezer 'data' lists
+    for key in ('results', 'data'):
+        if key in data and not data[key]:
+            return True
+    return False
+
+def expires_for(response, now):
+    """Absolute expiration time for a freshly fetched response."""
+    policy = policy_for_url(response.url)
+    ttl = policy.negative_ttl if is_negative(response) else policy.ttl
+    return now + timedelta(seconds=ttl)
@@ -0,0 +1,62 @@
+"""
+Single-flight request coalescing.
+
+When several callers ask for the same key at the same time, only the first
+one (the leader) does the work; the others wait and get the leader's result
+(or its exception). Nothing is kept once the call finishes, so this only
+removes duplicate in-flight work and is not a cache by itself.
+"""
+import asyncio
+import threading
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """Thread-based coalescing, for sync clients and page renders."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+class AsyncSingleFlight:
+    """Coroutine-based coalescing for a single event loop (see async_clients)."""
+
+    def __init__(self):
+        self._tasks = {}
+
+    async def do(self, key, coro_fn, *args, **kwargs):
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(coro_fn(*args, **kwargs))
+            self._tasks[key] = task
+            task.add_done_callback(lambda _: self._tasks.pop(key, None))
+        # shield: one cancelled waiter must not cancel the call for the others
+        return await asyncio.shield(task)
@@ -0,0 +1,130 @@
+"""
+Response compression (gzip, and brotli when the Brotli package is installed).
+
+init_compression(app) adds:
+    - an after_request hook compressing text responses (HTML, CSS, JS, JSON,
+      SVG) of at least COMPRESS_MIN_BYTES for clients that accept it. Public
+      pages with an ETag (see http_cache.py) keep their compressed bytes in
+      app.cache under that ETag, so the same page is compressed once, and
+      page_cache.get_or_render_view serves them without rendering at all.
+      Pages for a logged-in user (private, their ETag includes the user) are
+      compressed per request: a cached copy would only ever serve that user.
+    - a static route that serves the .br/.gz siblings written by
+      `python build_static.py` when they are up to date.
+"""
+import gzip
+import mimetypes
+import os
+from flask import current_app, request, send_from_directory
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # Optional: gzip only
+    brotli = None
+
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", 500))
+COMPRESS_MIMETYPES = {'text/html', 'text/css', 'text/plain', 'text/javascript', 'application/javascript', 'application/json', 'image/svg+xml'}
+# Compressed pages kept in app.cache (keyed by encoding and ETag) for this long
+COMPRESSED_CACHE_TIMEOUT = int(os.getenv("COMPRESSED_CACHE_TIMEOUT", 3600))
+
+# Levels for responses (compressed per request) and static files (compressed once at build time)
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+STATIC_GZIP_LEVEL = 9
+STATIC_BROTLI_QUALITY = 11
+
+STATIC_EXTENSIONS = ('.css', '.js', '.svg', '.html', '.json', '.txt')
+# Encoding -> file suffix of precompressed static files
+STATIC_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+def available_encodings():
+    return ('br', 'gzip') if brotli else ('gzip',)
+
+def negotiate(accept_encodings):
+    """Best encoding the client accepts (request.accept_encodings), or None."""
+    for encoding in available_encodings():
+        if accept_encodings[encoding]:
+            return encoding
+    return None
+
+def compress(data, encoding, static=False):
+    if encoding == 'br':
+        return brotli.compress(data, quality=STATIC_BROTLI_QUALITY if static else BROTLI_QUALITY)
+    return gzip.compress(data, STATIC_GZIP_LEVEL if static else GZIP_LEVEL, mtime=0)
+
+def _cache_key(encoding, etag):
+    return f"compressed_{encoding}_{etag}"
+
+def cached_compressed(etag, mimetype='text/html'):
+    """Response with the cached compressed page for this ETag, if the client accepts it and it is cached."""
+    encoding = negotiate(request.accept_encodings)
+    if not encoding or request.method != 'GET':
+        return None
+    data = current_app.cache.get(_cache_key(encoding, etag))
+    if data is None:
+        return None
+    response = current_app.response_class(data, mimetype=mimetype)
+    response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.set_etag(etag, weak=True)
+    return response
+
+def compress_response(response):
+    """after_request hook: compresses eligible responses for the negotiated encoding."""
+    if (response.status_code != 200 or request.method != 'GET' or response.direct_passthrough
+            or response.is_streamed or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESS_MIMETYPES):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate(request.accept_encodings)
+    if not encoding or (response.content_length or 0) < COMPRESS_MIN_BYTES:
+        return response
+
+    etag, weak = response.get_etag()
+    shared = etag and response.cache_control.public
+    data = current_app.cache.get(_cache_key(encoding, etag)) if shared else None
+    if data is None:
+        data = compress(response.get_data(), encoding)
+        if shared:
+            current_app.cache.set(_cache_key(encoding, etag), data, timeout=COMPRESSED_CACHE_TIMEOUT)
+    response.set_data(data)
+    response.headers['Content-Encoding'] = encoding
+    if etag and not weak:
+        # Same content, different bytes: only a weak validator still holds
+        response.set_etag(etag, weak=True)
+    return response
+
+def precompressed_path(folder, filename, encoding):
+    """Path of an up-to-date precompressed sibling of a static file, or None."""
+    source = safe_join(folder, filename)
+    if not source or not os.path.isfile(source):
+        return None
+    path = source + STATIC_SUFFIXES[encoding]
+    try:
+        if os.stat(path).st_mtime >= os.stat(source).st_mtime:
+            return path
+    except OSError:
+        pass
+    return None
+
+def init_compression(app):
+    app.after_request(compress_response)
+    original_static = app.view_functions.get('static')
+    if original_static is None:
+        return
+
+    def static(filename):
+        if filename.endswith(STATIC_EXTENSIONS):
+            for encoding in available_encodings():
+                if request.accept_encodings[encoding] and precompressed_path(app.static_folder, filename, encoding):
+                    response = send_from_directory(app.static_folder, filename + STATIC_SUFFIXES[encoding],
+                                                   mimetype=mimetypes.guess_type(filename)[0])
+                    response.headers['Content-Encoding'] = encoding
+                    response.vary.add('Accept-Encoding')
+                    return response
+        response = original_static(filename=filename)
+        response.vary.add('Accept-Encoding')
+        return response
+
+    app.view_functions['static'] = static
@@ -26,6 +26,21 @@ class Config:
     SESSION_COOKIE_HTTPONLY = True
     SESSION_COOKIE_SAMESITE = 'Lax'
     
-    # Cache
-    CACHE_TYPE = 'simple'
-    CACHE_DEFAULT_TIMEOUT = 3600
\ No newline at end of file
+    # Cache: per-process L1 (byte budget) over an L2 shared by all workers (see tiered_cache.py)
+    CACHE_TYPE = 'tiered_cache.TieredCache'
+    CACHE_DEFAULT_TIMEOUT = 3600
+    # sqlite:///path, redis://[:password@]host:port/db, or empty (default) for L1 only.
+    # Set it in production so workers share pages; never point tests at it
+    CACHE_L2_URL = os.environ.get('CACHE_L2_URL', '')
+    CACHE_L1_MAX_BYTES = int(os.environ.get('CACHE_L1_MAX_BYTES', 32 * 1024 * 1024))
+    CACHE_L1_TTL = int(os.environ.get('CACHE_L1_TTL', 60))
+    CACHE_COMPRESS_MIN_BYTES = int(os.environ.get('CACHE_COMPRESS_MIN_BYTES', 1024))
+    CACHE_KEY_PREFIX = 'qx:'
+    # After an L2 error, L2 is skipped (L1 only) for this many seconds
+    CACHE_L2_RETRY_AFTER = int(os.environ.get('CACHE_L2_RETRY_AFTER', 10))
+    # Expired rendered pages are still served (and re-rendered in the background) for this long
+    PAGE_CACHE_MAX_STALE = int(os.environ.get('PAGE_CACHE_MAX_STALE', 86400))
+    # Pages not cached at all are streamed as their upstream calls complete (see page_cache.py)
+    STREAM_UNCACHED_PAGES = os.environ.get('STREAM_UNCACHED_PAGES', '1') != '0'
+    # Concurrent requests for a page being streamed wait this long for its body
+    STREAM_LEADER_WAIT = int(os.environ.get('STREAM_LEADER_WAIT', 30))
@@ -0,0 +1,67 @@
+"""
+Processed discography cache for the paginated discography views.
+
+sort_albums output is kept per artist with every category in every sort
+order, so paging only slices lists. An entry is tied to the cached iTunes
+album lookup it was built from (its created_at): when the client refreshes
+that response, the next request rebuilds the entry.
+"""
+import os
+from api_clients import lookup_itunes, get_cached_response, itunes_lookup_url
+from lru import LRUCache
+from utils import sort_albums
+
+DISCOGRAPHY_CACHE_SIZE = int(os.getenv("DISCOGRAPHY_CACHE_SIZE", 500))
+
+# Sort orders of the discography views (anything else: 'year')
+DISCOGRAPHY_SORTS = {
+    'year': (lambda x: x.get('releaseDate', '')[:4], True),
+    'name': (lambda x: x.get('collectionName', '').lower(), False),
+}
+
+_discographies = LRUCache(maxsize=DISCOGRAPHY_CACHE_SIZE)
+
+def build_discography(data):
+    """Artist row plus {category: {sort: albums}} from an album lookup."""
+    raw_albums = [x for x in data if x.get('collectionType') == 'Album']
+    categories = sort_albums(raw_albums)
+    return {
+        'artist': data[0],
+        'categories': {
+            category: {sort: sorted(albums, key=key, reverse=reverse) for sort, (key, reverse) in DISCOGRAPHY_SORTS.items()}
+            for category, albums in categories.items()
+        },
+    }
+
+def get_discography(artist_id):
+    """
+    Returns the processed discography of an artist (see build_discography),
+    or None if the artist is not found.
+    """
+    url = itunes_lookup_url(artist_id, 'album', 200)
+    data = None
+    cached = get_cached_response('itunes', url)
+    if cached is None or cached.is_expired:
+        # Let the client fetch (or revalidate) the lookup first
+        data = lookup_itunes(artist_id, 'album', 200)
+        cached = get_cached_response('itunes', url)
+    created_at = cached.created_at if cached is not None else None
+
+    entry = _discographies.get(str(artist_id))
+    if entry and created_at and entry[0] == created_at:
+        return entry[1]
+
+    if data is None:
+        data = lookup_itunes(artist_id, 'album', 200)
+    if not data:
+        return None
+    discography = build_discography(data)
+    _discographies.set(str(artist_id), (created_at, discography))
+    return discography
+
+def discography_page(discography, category, sort_by, page, per_page):
+    """Slice of one category: (results, total)."""
+    sorts = discography['categories'][category]
+    results = sorts.get(sort_by, sorts['year'])
+    start = (page - 1) * per_page
+    return results[start:start + per_page], len(results)
@@ -0,0 +1,79 @@
+"""
+HTTP validators and Cache-Control policies for the views.
+
+Every response of a view wrapped in @conditional(policy) gets a weak ETag
+(a hash of its content, unless the view already set one) and is answered with
+304 Not Modified when the request's If-None-Match has it. Pages built by
+page_cache.get_or_render_view know their ETag before the page is rendered
+(cached body hash + the per-request parts), so a revalidation costs neither
+an upstream call nor a template render.
+
+Policies:
+    public   catalogue pages (search, artist, album, tag...): shared caches
+             may keep them for PUBLIC_MAX_AGE seconds when nobody is logged
+             in; with a session they fall back to 'private'. Vary: Cookie.
+    private  user views and user JSON: browsers only, revalidated every time.
+"""
+import functools
+import hashlib
+import os
+from flask import make_response, request
+from flask_login import current_user
+
+PUBLIC_MAX_AGE = int(os.getenv("PUBLIC_MAX_AGE", 300))
+
+_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+@functools.lru_cache(maxsize=1)
+def shell_version():
+    """Stamp of the templates and static files (changes with every deploy that touches them)."""
+    mtimes = [0]
+    for folder in ('templates', 'static'):
+        for root, dirs, files in os.walk(os.path.join(_ROOT, folder)):
+            dirs[:] = [d for d in dirs if d != 'cache']  # Image cache, not part of the page
+            mtimes.extend(os.stat(os.path.join(root, f)).st_mtime_ns for f in files)
+    return str(max(mtimes))
+
+def make_etag(*parts):
+    """ETag value from strings (or bytes)."""
+    digest = hashlib.md5()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode())
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+def apply_policy(response, policy):
+    response.vary.add('Cookie')
+    if policy == 'public' and not current_user.is_authenticated:
+        response.cache_control.public = True
+        response.cache_control.max_age = PUBLIC_MAX_AGE
+    else:
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+    return response
+
+def not_modified(etag):
+    """A 304 response if the request already has this ETag, else None."""
+    if request.method not in ('GET', 'HEAD') or not request.if_none_match.contains_weak(etag):
+        return None
+    response = make_response('', 304)
+    response.set_etag(etag, weak=True)
+    return response
+
+def conditional(policy):
+    """View decorator: ETag, Cache-Control for the policy ('public' or 'private') and 304s."""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 304:
+                return apply_policy(response, policy)
+            if response.status_code != 200 or request.method not in ('GET', 'HEAD'):
+                return response
+            if response.is_streamed:
+                return apply_policy(response, policy)
+            if not response.get_etag()[0]:
+                response.set_etag(make_etag(response.get_data()), weak=True)
+            return apply_policy(response, policy).make_conditional(request)
+        return wrapper
+    return decorator
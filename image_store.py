@@ -0,0 +1,287 @@
+"""
+Local cache for artist photos and artwork.
+
+Files are named after the hash of their origin URL (same names as the old
+static/cache files, so those stay valid) and the directory is kept under a
+byte budget, evicting the least recently served files first. Downloads run in
+a small background pool: until a file is ready the origin URL is returned, so
+no request waits for an image download. Each download streams into a temp file
+in the same directory and is renamed into place, so a half-written file is
+never served. Concurrent requests for the same URL share one download. If the
+cache directory is not writable (read-only deploys) the store moves to a
+directory under the system temp dir.
+
+Several worker processes can share the directory, each with its own index: a
+file another worker already downloaded is picked up from the disk instead of
+fetched again, temp files are only cleaned up once they are older than
+IMAGE_TMP_MAX_AGE (another worker may still be writing them), and eviction
+leaves alone a file another worker rewrote since it was indexed. The budget
+(IMAGE_CACHE_MAX_BYTES) is per worker, so with N workers the directory can
+hold up to about N times that.
+
+Resized variants (card, detail, hero) are made from the cached original on
+first use, in WebP or JPEG, and kept in the same store under
+<variant>/<name>.<format>. Pillow is optional: without it the original file
+is served for every variant.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from requests_cache.session import OriginalSession
+from coalesce import SingleFlight
+
+try:
+    from PIL import Image
+except ImportError:  # Optional: originals are served instead of variants
+    Image = None
+
+IMAGE_CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "cache"))
+IMAGE_CACHE_FALLBACK_DIR = os.path.join(tempfile.gettempdir(), "q-explorer-images")
+IMAGE_CACHE_MAX_BYTES = int(os.getenv("IMAGE_CACHE_MAX_BYTES", 200 * 1024 * 1024))
+IMAGE_MAX_BYTES = int(os.getenv("IMAGE_MAX_BYTES", 5 * 1024 * 1024))
+IMAGE_FETCH_WORKERS = int(os.getenv("IMAGE_FETCH_WORKERS", 4))
+IMAGE_FETCH_TIMEOUT = 5
+# Temp files older than this (seconds) are leftovers of interrupted downloads
+IMAGE_TMP_MAX_AGE = int(os.getenv("IMAGE_TMP_MAX_AGE", 300))
+
+# URL prefix of the route that serves the cached files (see blueprints/api.py)
+IMAGE_CACHE_URL = "/image-cache"
+
+_EXTENSIONS = ('jpg', 'jpeg', 'png', 'gif')
+
+# View -> longest side in pixels (about 2x the CSS size, for high-DPI screens)
+IMAGE_VARIANTS = {'card': 320, 'detail': 640, 'hero': 1200}
+# Variant format -> (Pillow format, mimetype)
+VARIANT_FORMATS = {'webp': ('WEBP', 'image/webp'), 'jpeg': ('JPEG', 'image/jpeg')}
+VARIANT_QUALITY = 80
+
+def image_name(url):
+    """File name for an origin URL: md5 of the URL plus its image extension."""
+    url_hash = hashlib.md5(url.encode()).hexdigest()
+    ext = url.split('.')[-1].split('?')[0]  # Get extension
+    if ext not in _EXTENSIONS:
+        ext = 'jpg'
+    return f"{url_hash}.{ext}"
+
+def _is_writable(directory):
+    try:
+        os.makedirs(directory, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=directory):
+            pass
+        return True
+    except OSError:
+        return False
+
+def _save_variant(img, target, fmt):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            img.save(f, VARIANT_FORMATS[fmt][0], quality=VARIANT_QUALITY)
+        os.replace(tmp_path, target)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+class ImageStore:
+    def __init__(self, directory, max_bytes, fallback_directory=None, workers=4):
+        self.max_bytes = max_bytes
+        self.workers = workers
+        self.directory = directory
+        if not _is_writable(directory) and fallback_directory:
+            print(f"Image cache: {directory} is not writable, using {fallback_directory}")
+            self.directory = fallback_directory
+            os.makedirs(fallback_directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._files = OrderedDict()  # name -> (size in bytes, mtime), least recently used first
+        self._total = 0
+        self._downloading = set()
+        self._executor = None
+        self._executor_pid = None
+        self._variants = SingleFlight()
+        self._load_index()
+
+    def _load_index(self):
+        entries = []
+        now = time.time()
+        for root, _, files in os.walk(self.directory):
+            for filename in files:
+                name = os.path.relpath(os.path.join(root, filename), self.directory).replace(os.sep, '/')
+                try:
+                    stat = os.stat(os.path.join(root, filename))
+                except OSError:  # Removed or renamed by another worker meanwhile
+                    continue
+                if filename.endswith('.tmp'):
+                    # Leftover of an interrupted download, unless another worker is still writing it
+                    if now - stat.st_mtime > IMAGE_TMP_MAX_AGE:
+                        self._remove(name)
+                    continue
+                entries.append((stat.st_mtime, name, stat.st_size))
+        for mtime, name, size in sorted(entries):
+            self._files[name] = (size, mtime)
+            self._total += size
+        self._evict()
+
+    def _get_executor(self):
+        # New pool after fork (threads do not survive it)
+        if self._executor is None or self._executor_pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='image-fetch')
+            self._executor_pid = os.getpid()
+            self._downloading.clear()
+        return self._executor
+
+    def url_for(self, url, variant=None):
+        """
+        Returns the local URL of a cached image (of one of its IMAGE_VARIANTS
+        if given). If the image is not cached yet, starts a background
+        download and returns the origin URL.
+        """
+        if not url:
+            return url
+        name = image_name(url)
+        with self._lock:
+            indexed = name in self._files
+            if indexed:
+                self._files.move_to_end(name)
+            elif name in self._downloading:
+                return url
+        if indexed or self._adopt(name):
+            if variant in IMAGE_VARIANTS:
+                return f"{IMAGE_CACHE_URL}/{variant}/{name}"
+            return f"{IMAGE_CACHE_URL}/{name}"
+        with self._lock:
+            if name in self._downloading:
+                return url
+            executor = self._get_executor()
+            self._downloading.add(name)
+        executor.submit(self._download, url, name)
+        return url
+
+    def path_for(self, name):
+        """Local path of a cached file, or None if it is not in the store."""
+        with self._lock:
+            indexed = name in self._files
+            if indexed:
+                self._files.move_to_end(name)
+        if not indexed and not self._adopt(name):
+            return None
+        return os.path.join(self.directory, name)
+
+    def _adopt(self, name):
+        """Indexes a file another worker has written to the shared directory; False if there is none."""
+        path = os.path.join(self.directory, name)
+        if name.endswith('.tmp') or not os.path.isfile(path):
+            return False
+        try:
+            self._add(name, os.path.getsize(path))
+        except OSError:  # Evicted by that worker meanwhile
+            return False
+        return True
+
+    def variant_path(self, name, variant, fmt):
+        """
+        Local path of a resized copy of a cached image, made on first use
+        (once, even for concurrent requests). None if the original is not
+        cached, Pillow is missing or the image cannot be decoded.
+        """
+        if Image is None or variant not in IMAGE_VARIANTS or fmt not in VARIANT_FORMATS:
+            return None
+        source = self.path_for(name)
+        if not source:
+            return None
+        variant_name = f"{variant}/{os.path.splitext(name)[0]}.{fmt}"
+        path = self.path_for(variant_name)
+        if path:
+            return path
+        try:
+            return self._variants.do(variant_name, self._make_variant, source, variant_name, IMAGE_VARIANTS[variant], fmt)
+        except Exception as e:
+            print(f"Image variant failed for {variant_name}: {e}")
+            return None
+
+    def _make_variant(self, source, variant_name, size, fmt):
+        # The previous leader may have made it just before we got here
+        path = self.path_for(variant_name)
+        if path:
+            return path
+        target = os.path.join(self.directory, variant_name)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with Image.open(source) as img:
+            img.thumbnail((size, size))  # Only ever shrinks
+            mode = 'RGBA' if fmt == 'webp' and img.mode in ('RGBA', 'LA', 'P') else 'RGB'
+            if img.mode == mode:
+                _save_variant(img, target, fmt)
+            else:
+                # A new image, which the with above does not close
+                converted = img.convert(mode)
+                try:
+                    _save_variant(converted, target, fmt)
+                finally:
+                    converted.close()
+        self._add(variant_name, os.path.getsize(target))
+        return target
+
+    def _download(self, url, name):
+        tmp_path = None
+        try:
+            # Plain session: this store is the cache for images, no copy in the HTTP cache
+            with OriginalSession() as session:
+                response = session.get(url, stream=True, timeout=IMAGE_FETCH_TIMEOUT)
+                if response.status_code != 200 or not response.headers.get('Content-Type', '').startswith('image/'):
+                    return
+                fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+                size = 0
+                with os.fdopen(fd, 'wb') as f:
+                    for chunk in response.iter_content(64 * 1024):
+                        size += len(chunk)
+                        if size > IMAGE_MAX_BYTES:
+                            raise ValueError(f"larger than {IMAGE_MAX_BYTES} bytes")
+                        f.write(chunk)
+            os.replace(tmp_path, os.path.join(self.directory, name))
+            tmp_path = None
+            self._add(name, size)
+        except Exception as e:
+            print(f"Image download failed for {url}: {e}")
+        finally:
+            if tmp_path:
+                self._remove(os.path.basename(tmp_path))
+            with self._lock:
+                self._downloading.discard(name)
+
+    def _add(self, name, size):
+        mtime = os.path.getmtime(os.path.join(self.directory, name))
+        with self._lock:
+            self._total += size - self._files.pop(name, (0, None))[0]
+            self._files[name] = (size, mtime)
+            self._evict()
+
+    def _evict(self):
+        while self._total > self.max_bytes and len(self._files) > 1:
+            name, (size, mtime) = self._files.popitem(last=False)
+            self._total -= size
+            self._remove(name, mtime)
+
+    def _remove(self, name, mtime=None):
+        """Deletes a file; with mtime, only if it is still the one indexed (not rewritten by another worker)."""
+        path = os.path.join(self.directory, name)
+        try:
+            if mtime is not None and os.stat(path).st_mtime != mtime:
+                return
+            os.remove(path)
+        except OSError:  # Already removed by another worker
+            pass
+
+    @property
+    def total_bytes(self):
+        with self._lock:
+            return self._total
+
+images = ImageStore(IMAGE_CACHE_DIR, IMAGE_CACHE_MAX_BYTES, IMAGE_CACHE_FALLBACK_DIR, IMAGE_FETCH_WORKERS)
+
+def cached_image_url(url, variant=None):
+    """Local URL of the image (or variant) if cached, else the origin URL (a download starts in the background)."""
+    return images.url_for(url, variant)
@@ -0,0 +1,48 @@
+"""
+Small thread-safe in-process LRU cache with an entry limit and optional TTL.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+class LRUCache:
+    def __init__(self, maxsize=1024, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._data = OrderedDict()  # key -> (value, expires_at or None)
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING:
+                return default
+            value, expires_at = item
+            if expires_at is not None and time.monotonic() >= expires_at:
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = ttl if ttl is not None else self.ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
@@ -0,0 +1,87 @@
+"""
+Title normalization: display names (clean_name) and dedup/match keys
+(normalize_title), Unicode-aware and memoized.
+
+Keys are case folded and keep letters and digits of every script. Accents
+are stripped from Latin and Greek letters only ("Café" == "Cafe"); in other
+scripts combining marks are part of the letter (Cyrillic й vs и, kana
+dakuten) and are kept. A title with no letters or digits at all ("!!!")
+falls back to its folded text, so such titles do not all share the key "".
+"""
+import os
+import re
+import unicodedata
+from functools import lru_cache
+
+NORMALIZE_CACHE_SIZE = int(os.getenv("NORMALIZE_CACHE_SIZE", 50000))
+
+# Bracketed parts (also fullwidth/CJK brackets) and technical " - ..." suffixes
+_BRACKETS_RE = re.compile(r'\s*[\(\[（【].*?[\)\]）】]')
+_TECH_SUFFIX_RE = re.compile(r'\s-\s.*(Remaster|Deluxe|Edition|Version|Remix).*', re.IGNORECASE)
+_NON_ALNUM_RE = re.compile(r'[^a-z0-9]')
+
+# Letters NFKD does not decompose into base + accent
+_LATIN_FOLDS = str.maketrans({'ø': 'o', 'ł': 'l', 'đ': 'd', 'ħ': 'h', 'ı': 'i', 'æ': 'ae', 'œ': 'oe', 'þ': 'th'})
+
+def _strips_accents(ch):
+    """Latin and Greek base letters lose their combining marks."""
+    return ch < '\u0250' or '\u0370' <= ch <= '\u03ff' or '\u1e00' <= ch <= '\u1fff'
+
+def fold(text):
+    """Case folded text without Latin/Greek accents ("Ægir Café" -> "aegir cafe")."""
+    if text.isascii():
+        return text.lower()
+    chars = []
+    strip = False
+    for ch in unicodedata.normalize('NFKD', text):
+        if unicodedata.combining(ch):
+            if not strip:
+                chars.append(ch)
+            continue
+        strip = _strips_accents(ch)
+        chars.append(ch)
+    return unicodedata.normalize('NFC', ''.join(chars)).casefold().translate(_LATIN_FOLDS)
+
+def _key(text):
+    folded = fold(text.strip())
+    if folded.isascii():
+        key = _NON_ALNUM_RE.sub('', folded)
+    else:
+        key = ''.join(ch for ch in folded if ch.isalnum() or unicodedata.category(ch)[0] == 'M')
+    return key or ' '.join(folded.split())
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def clean_and_normalize(title):
+    """(clean_name(title), normalize_title(title)) with the brackets removed only once."""
+    if not title: return "", ""
+    stripped = _BRACKETS_RE.sub('', title)
+    return _TECH_SUFFIX_RE.sub('', stripped).strip(), _key(stripped)
+
+def clean_name(name):
+    """
+    Transforms "In Rock (2018 Remastered Version)" -> "In Rock"
+    Removes junk in parentheses and after hyphens if it is technical info.
+    """
+    return clean_and_normalize(name)[0]
+
+def normalize_title(title):
+    """
+    For comparison (deduplication): "Let It Be (Remastered)" -> "letitbe",
+    "Café Tacvba" -> "cafetacvba", "Кино (Live)" -> "кино".
+    """
+    return clean_and_normalize(title)[1]
+
+def clean_and_normalize_many(titles):
+    """clean_and_normalize for a whole result list (each distinct title computed once)."""
+    done = {}
+    results = []
+    for title in titles:
+        pair = done.get(title)
+        if pair is None:
+            pair = done[title] = clean_and_normalize(title)
+        results.append(pair)
+    return results
+
+def normalize_titles(titles):
+    """normalize_title for a whole result list."""
+    return [norm for _, norm in clean_and_normalize_many(titles)]
@@ -0,0 +1,217 @@
+"""
+Rendered-page cache shared by the blueprints.
+
+Pages are stored in app.cache (Flask-Caching) together with the time they
+stop being fresh. Concurrent requests that miss the same key share one render.
+Within PAGE_CACHE_MAX_STALE seconds after that time a stale page is still
+served at once while a background thread renders a fresh copy
+(stale-while-revalidate). After that the entry has expired from the cache and
+the next request renders it again.
+
+Pages that look the same for every user cache only their view body
+(get_or_render_view): one entry per page shared by all users, with the
+header and the other per-user parts of index.html rendered around it on each
+request. Favorite states are filled in client-side (checkLikedStatus).
+
+Such a page that is not cached at all can be streamed instead
+(get_or_stream_view, with STREAM_UNCACHED_PAGES): the page up to the view body
+is sent as soon as the view has its first data, the rest of the body follows
+in chunks as its upstream calls complete, and the assembled body is cached
+afterwards. Parts that arrive out of order are sent as slot fills
+(fill_slot) that a small inline script moves into their placeholder. Only one
+request per key streams (the leader); concurrent misses wait for the leader to
+cache the body (up to STREAM_LEADER_WAIT seconds) and are served from it.
+"""
+import threading
+import time
+from flask import current_app, copy_current_request_context, render_template, make_response
+from flask.globals import request_ctx
+from flask_login import current_user
+from markupsafe import Markup
+from coalesce import SingleFlight
+from http_cache import make_etag, not_modified, shell_version
+from compression import cached_compressed
+
+_renders = SingleFlight()
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+# cache_key -> Event set when the request streaming that page is done
+_streaming = {}
+_streaming_lock = threading.Lock()
+
+def get_or_render(cache_key, render, timeout):
+    """
+    Returns the cached page for cache_key, or calls render() once for all
+    concurrent requests with that key. Falsy results (e.g. "not found") are
+    returned but not cached.
+    """
+    cache = current_app.cache
+    max_stale = current_app.config.get('PAGE_CACHE_MAX_STALE', 0)
+    entry = cache.get(cache_key)
+    if entry:
+        rendered, fresh_until = entry
+        if time.time() >= fresh_until:
+            _refresh_in_background(cache_key, render, timeout, max_stale)
+        return rendered
+
+    def _render():
+        # The previous leader may have filled the cache just before we got here
+        entry = cache.get(cache_key)
+        if entry:
+            return entry[0]
+        return _render_and_store(cache, cache_key, render, timeout, max_stale)
+
+    return _renders.do(cache_key, _render)
+
+def _render_and_store(cache, cache_key, render, timeout, max_stale):
+    rendered = render()
+    if rendered:
+        cache.set(cache_key, (rendered, time.time() + timeout), timeout=timeout + max_stale)
+    return rendered
+
+def store(cache_key, rendered, timeout):
+    """Caches a page rendered outside get_or_render (e.g. once it has been streamed)."""
+    _render_and_store(current_app.cache, cache_key, lambda: rendered, timeout, current_app.config.get('PAGE_CACHE_MAX_STALE', 0))
+
+def _refresh_in_background(cache_key, render, timeout, max_stale):
+    with _refreshing_lock:
+        if cache_key in _refreshing:
+            return
+        _refreshing.add(cache_key)
+
+    # The render needs the request context (url_for, current_user) after this request has returned
+    @copy_current_request_context
+    def refresh():
+        try:
+            _renders.do(cache_key, _render_and_store, current_app.cache, cache_key, render, timeout, max_stale)
+        except Exception as e:
+            print(f"Background page refresh failed for {cache_key}: {e}")
+        finally:
+            with _refreshing_lock:
+                _refreshing.discard(cache_key)
+
+    threading.Thread(target=refresh, daemon=True).start()
+
+def render_view(view, **context):
+    """Renders a view template alone (templates/views/<view>.html), without the page around it."""
+    return render_template(f'views/{view}.html', view=view, **context)
+
+def render_page(view, body, **context):
+    """Renders index.html around an already rendered view body."""
+    return render_template('index.html', view=view, body=Markup(body), **context)
+
+def get_or_render_view(cache_key, view, build, timeout, **page_context):
+    """
+    Page whose view body is cached once for all users: build() returns the
+    view's template context (None if not found) and is only called to render
+    the body. page_context is for the per-request parts (e.g. the query in
+    the header). Returns a response with an ETag (a 304, or the cached
+    compressed page, without rendering anything when possible), or None if
+    not found.
+    """
+    def render():
+        context = build()
+        return render_view(view, **context) if context else None
+
+    body = get_or_render(cache_key, render, timeout)
+    if not body:
+        return None
+    etag = make_etag(shell_version(), current_user.get_id() or '', sorted(page_context.items()), body)
+    # Revalidation, or a compressed copy of this exact page: nothing to render
+    response = not_modified(etag) or cached_compressed(etag)
+    if response is None:
+        response = make_response(render_page(view, body, **page_context))
+        response.set_etag(etag, weak=True)
+    return response
+
+# Where the view body goes in the streamed page
+_BODY_MARKER = '<!-- streamed body -->'
+
+def fill_slot(slot, html):
+    """Chunk moving late HTML into the element with id slot-<slot> of a streamed page."""
+    return render_template('components/stream_fill.html', slot=slot, content=Markup(html))
+
+def _in_request_context(chunks):
+    """
+    Steps a chunk generator inside a copy of the current request context,
+    pushed only while a chunk is being made (not between chunks, nor after a
+    response that is never read to the end).
+    """
+    ctx = request_ctx.copy()
+
+    def generate():
+        while True:
+            with ctx:
+                try:
+                    chunk = next(chunks)
+                except StopIteration:
+                    return
+            yield chunk
+
+    return generate()
+
+def stream_page(cache_key, view, chunks, timeout, on_done=None, **page_context):
+    """
+    Streams index.html around a view body sent in chunks. chunks is a
+    generator of HTML that returns the complete body (without slots) when it
+    is done, which is then cached under cache_key; None if something failed.
+    on_done is called once the body is cached or the response is closed.
+    """
+    head, tail = render_page(view, _BODY_MARKER, **page_context).split(_BODY_MARKER, 1)
+
+    def generate():
+        try:
+            yield head
+            body = yield from chunks
+            yield tail
+            if body:
+                store(cache_key, body, timeout)
+        finally:
+            if on_done:
+                on_done()
+
+    response = current_app.response_class(_in_request_context(generate()), mimetype='text/html')
+    if on_done:
+        # Also when the response is closed unread (HEAD, client gone)
+        response.call_on_close(on_done)
+    return response
+
+def _claim_stream(cache_key):
+    """Returns (leader, done): leader is True for the one request that streams cache_key."""
+    with _streaming_lock:
+        done = _streaming.get(cache_key)
+        if done is not None:
+            return False, done
+        done = _streaming[cache_key] = threading.Event()
+        return True, done
+
+def _release_stream(cache_key, done):
+    with _streaming_lock:
+        if _streaming.get(cache_key) is done:
+            del _streaming[cache_key]
+    done.set()
+
+def get_or_stream_view(cache_key, view, build, stream, timeout, **page_context):
+    """
+    get_or_render_view for pages that can stream. When the body is not in
+    the cache at all, stream() is called instead of build(): it returns a
+    chunk generator for stream_page, or None if not found (it should wait for
+    no more than the first upstream call before deciding). Concurrent misses
+    don't stream: they wait for the leader's body and render around it.
+    """
+    if not current_app.config.get('STREAM_UNCACHED_PAGES') or current_app.cache.get(cache_key):
+        return get_or_render_view(cache_key, view, build, timeout, **page_context)
+    leader, done = _claim_stream(cache_key)
+    if not leader:
+        # If the leader failed or is still going, get_or_render_view renders once for all followers
+        done.wait(current_app.config.get('STREAM_LEADER_WAIT', 30))
+        return get_or_render_view(cache_key, view, build, timeout, **page_context)
+    try:
+        chunks = stream()
+    except BaseException:
+        _release_stream(cache_key, done)
+        raise
+    if chunks is None:
+        _release_stream(cache_key, done)
+        return None
+    return stream_page(cache_key, view, chunks, timeout, on_done=lambda: _release_stream(cache_key, done), **page_context)
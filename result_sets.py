@@ -0,0 +1,79 @@
+"""
+Cached result sets for the /see-all pages.
+
+The filtered 200-item iTunes search for a (normalized query, type) is built
+once, projected to the fields the see-all views use, and kept for the iTunes
+search TTL together with its name/year sorted copies (an empty search for its
+negative TTL). Pages are slices of it,
+addressed by page number (HTML) or by an opaque cursor (JSON endpoint).
+"""
+import base64
+import os
+from api_clients import search_itunes
+from cache_policy import CACHE_POLICY
+from coalesce import SingleFlight
+from lru import LRUCache
+from utils import filter_and_process_artists, filter_and_process_albums, filter_and_process_songs
+
+SEE_ALL_ENTITIES = {'artists': 'musicArtist', 'albums': 'album', 'songs': 'song'}
+
+_FILTERS = {
+    'artists': filter_and_process_artists,
+    'albums': filter_and_process_albums,
+    'songs': filter_and_process_songs,
+}
+
+# Fields each see-all view renders
+PROJECTIONS = {
+    'artists': ('artistId', 'artistName', 'primaryGenreName'),
+    'albums': ('collectionId', 'collectionName', 'artistName', 'artworkUrl100', 'releaseDate', 'year'),
+    'songs': ('trackId', 'trackName', 'artistName', 'collectionId', 'artworkUrl100', 'releaseDate', 'spotify_link', 'youtube_link'),
+}
+
+# (type, sort) -> (key, reverse); 'relevance' keeps the iTunes order
+_NAME_FIELDS = {'artists': 'artistName', 'albums': 'collectionName', 'songs': 'trackName'}
+SORTS = {(type, 'name'): (lambda x, f=field: x.get(f, '').lower(), False) for type, field in _NAME_FIELDS.items()}
+SORTS[('albums', 'year')] = (lambda x: x.get('releaseDate', '')[:4], True)
+SORTS[('songs', 'year')] = (lambda x: x.get('releaseDate', '')[:4], True)
+
+RESULT_SET_CACHE_SIZE = int(os.getenv("RESULT_SET_CACHE_SIZE", 500))
+
+_result_sets = LRUCache(maxsize=RESULT_SET_CACHE_SIZE, ttl=CACHE_POLICY[('itunes', 'search')].ttl)
+_builds = SingleFlight()
+
+def normalize_query(query):
+    return ' '.join((query or '').lower().split())
+
+def _build(query, type):
+    results = search_itunes(query, SEE_ALL_ENTITIES[type], 200)
+    items = _FILTERS[type](results, query)
+    relevance = [{key: item[key] for key in PROJECTIONS[type] if key in item} for item in items]
+    sets = {'relevance': relevance}
+    for (sort_type, sort), (key, reverse) in SORTS.items():
+        if sort_type == type:
+            sets[sort] = sorted(relevance, key=key, reverse=reverse)
+    # No results (or a failed search, which looks the same): kept for the negative TTL only
+    policy = CACHE_POLICY[('itunes', 'search')]
+    _result_sets.set((query, type), sets, ttl=policy.ttl if results else policy.negative_ttl)
+    return sets
+
+def get_result_set(query, type, sort_by='relevance'):
+    """Filtered, sorted and projected see-all results (shared, do not modify)."""
+    query = normalize_query(query)
+    sets = _result_sets.get((query, type))
+    if sets is None:
+        sets = _builds.do((query, type), _build, query, type)
+    return sets.get(sort_by, sets['relevance'])
+
+def encode_cursor(offset):
+    return base64.urlsafe_b64encode(f"o{offset}".encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """Offset of a cursor from encode_cursor (0 for a missing or invalid cursor)."""
+    if not cursor:
+        return 0
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        return max(int(raw[1:]), 0) if raw.startswith('o') else 0
+    except (ValueError, UnicodeDecodeError):
+        return 0
@@ -161,9 +161,9 @@ function checkLikedStatus() {
     // Get favorites IDs from server
     fetch('/api/check_favorites')
         .then(res => res.json())
-        .then(ids => {
-            // ids = ['123', '456', ...]
-            const likedSet = new Set(ids);
+        .then(favs => {
+            // favs = [{type: 'artist', item_id: '123'}, ...]
+            const likedSet = new Set(favs.map(f => String(f.item_id)));
             document.querySelectorAll('.btn-like').forEach(btn => {
                 // Extract ID from onclick attribute: toggleLike(this, '...', '123', ...)
                 const match = btn.getAttribute('onclick').match(/toggleLike\(this, '[^']+', '([^']+)'/);
@@ -209,32 +209,61 @@ document.addEventListener('DOMContentLoaded', () => {
         img.classList.remove('lazy');
     };
 
-    // Artist image loading (special case)
-    const loadArtistImage = (wrapper) => {
-        const artistId = wrapper.getAttribute('data-artist-id');
-        const artistName = wrapper.getAttribute('data-artist-name');
+    // Artist image loading (special case): visible cards are collected and resolved in one batch request
+    const pendingArtistImages = [];
+    let artistImageTimer = null;
 
-        if ((!artistId && !artistName) || wrapper.querySelector('img')) return;
+    const showArtistImage = (wrapper, src) => {
+        if (!src) return;
+        const img = document.createElement('img');
+        img.src = src;
+        img.style.opacity = '0'; // Hidden
+        img.style.transition = 'opacity 0.5s'; // Smooth fade-in
+        img.onload = () => { img.style.opacity = '1'; };
 
-        const url = artistId
-            ? `/api/get-artist-image/${artistId}`
-            : `/api/get-artist-image-by-name?name=${encodeURIComponent(artistName)}`;
+        wrapper.innerHTML = ''; // Remove placeholder
+        wrapper.appendChild(img);
+    };
+
+    const flushArtistImages = () => {
+        artistImageTimer = null;
+        const batch = pendingArtistImages.splice(0, 50);
+        if (!batch.length) return;
 
-        fetch(url)
+        const ids = [], names = [];
+        batch.forEach(wrapper => {
+            const artistId = wrapper.getAttribute('data-artist-id');
+            if (artistId) ids.push(artistId);
+            else names.push(wrapper.getAttribute('data-artist-name'));
+        });
+
+        fetch('/api/artist-images', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ ids, names })
+        })
             .then(response => response.json())
             .then(data => {
-                if (data.image) {
-                    const img = document.createElement('img');
-                    img.src = data.image;
-                    img.style.opacity = '0'; // Hidden
-                    img.style.transition = 'opacity 0.5s'; // Smooth fade-in
-                    img.onload = () => { img.style.opacity = '1'; };
-
-                    wrapper.innerHTML = ''; // Remove placeholder
-                    wrapper.appendChild(img);
-                }
+                batch.forEach(wrapper => {
+                    const artistId = wrapper.getAttribute('data-artist-id');
+                    const src = artistId ? data.ids[artistId] : data.names[wrapper.getAttribute('data-artist-name')];
+                    showArtistImage(wrapper, src);
+                });
             })
-            .catch(err => console.log('No image for', artistId || artistName));
+            .catch(err => console.log('No artist images', err));
+
+        if (pendingArtistImages.length) flushArtistImages();
+    };
+
+    const loadArtistImage = (wrapper) => {
+        const artistId = wrapper.getAttribute('data-artist-id');
+        const artistName = wrapper.getAttribute('data-artist-name');
+
+        if ((!artistId && !artistName) || wrapper.querySelector('img')) return;
+
+        pendingArtistImages.push(wrapper);
+        // Wait a moment so all cards entering the viewport together share one request
+        if (!artistImageTimer) artistImageTimer = setTimeout(flushArtistImages, 50);
     };
 
     // Use Observer for all lazy images
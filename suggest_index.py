@@ -0,0 +1,161 @@
+"""
+Local search-suggestion index of the artists and albums seen in iTunes
+responses.
+
+Every search and lookup result goes through observe(), so the index fills up
+with what users actually browse. Names are folded (normalize.fold) and split
+into trigrams; a query is answered from the intersection of its trigrams'
+posting sets and checked as a substring, so "cafe" finds "Café Tacvba".
+Two-letter queries match word prefixes. Matches are ranked name prefix
+first, then word prefix, then anywhere; artists before albums, shorter names
+first.
+
+The index keeps at most SUGGEST_INDEX_SIZE entries (least recently seen are
+evicted) and is saved to SUGGEST_INDEX_PATH every SUGGEST_INDEX_SAVE_INTERVAL
+seconds while it changes, and at exit; it is reloaded on start.
+"""
+import atexit
+import heapq
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from normalize import fold
+
+SUGGEST_INDEX_SIZE = int(os.getenv("SUGGEST_INDEX_SIZE", 50000))
+SUGGEST_INDEX_PATH = os.getenv("SUGGEST_INDEX_PATH", os.path.join(tempfile.gettempdir(), "q-explorer-suggestions.json"))
+SUGGEST_INDEX_SAVE_INTERVAL = int(os.getenv("SUGGEST_INDEX_SAVE_INTERVAL", 300))
+
+_TYPE_ORDER = {'artist': 0, 'album': 1}
+
+def _folded(name):
+    return ' '.join(fold(name).split())
+
+def _grams(folded):
+    """Trigrams of ' ' + folded name (the leading space marks the first word start)."""
+    padded = ' ' + folded
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def _query_grams(folded_query):
+    if len(folded_query) < 3:
+        return {' ' + folded_query}  # Word prefix
+    return {folded_query[i:i + 3] for i in range(len(folded_query) - 2)}
+
+class SuggestionIndex:
+    def __init__(self, maxsize, path=None):
+        self.maxsize = maxsize
+        self.path = path
+        self._lock = threading.Lock()
+        # (type, id) -> (text, folded name), least recently seen first
+        self._entries = OrderedDict()
+        self._postings = {}  # trigram -> set of (type, id)
+        self._dirty = False
+        self._saved_at = time.monotonic()
+        if path:
+            self.load()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, type, id, name, text=None):
+        """Adds (or refreshes) one suggestion; text is what is shown, name what is matched."""
+        if not id or not name:
+            return
+        key = (type, str(id))
+        folded = _folded(name)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] == folded:
+                self._entries.move_to_end(key)
+                return
+            if entry is not None:
+                self._unindex(key, entry[1])
+            self._entries[key] = (text or name, folded)
+            for gram in _grams(folded):
+                self._postings.setdefault(gram, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                old_key, (_, old_folded) = self._entries.popitem(last=False)
+                self._unindex(old_key, old_folded)
+            self._dirty = True
+
+    def _unindex(self, key, folded):
+        for gram in _grams(folded):
+            keys = self._postings.get(gram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._postings[gram]
+
+    def observe(self, results):
+        """Indexes the artists and albums of iTunes search/lookup results."""
+        for item in results:
+            self.add('artist', item.get('artistId'), item.get('artistName'))
+            name = item.get('collectionName')
+            if name:
+                self.add('album', item.get('collectionId'), name, f"{name} - {item.get('artistName', '')}")
+        self._maybe_save()
+
+    def search(self, query, limit=8):
+        """Suggestions for a query: [{'text', 'type', 'id'}], best first."""
+        folded_query = _folded(query or '')
+        if len(folded_query) < 2:
+            return []
+        with self._lock:
+            postings = sorted((self._postings.get(gram, ()) for gram in _query_grams(folded_query)), key=len)
+            candidates = postings[0].intersection(*postings[1:]) if postings[0] else ()
+            entries = self._entries
+            matches = []
+            for key in candidates:
+                text, folded = entries[key]
+                pos = folded.find(folded_query)
+                if pos == 0:
+                    matches.append((0, _TYPE_ORDER.get(key[0], 2), len(folded), text, key))
+                elif pos > 0:
+                    matches.append((1 if folded[pos - 1] == ' ' else 2, _TYPE_ORDER.get(key[0], 2), len(folded), text, key))
+        return [{'text': text, 'type': type, 'id': int(id) if id.isdigit() else id}
+                for _, _, _, text, (type, id) in heapq.nsmallest(limit, matches)]
+
+    def _maybe_save(self):
+        if not self.path or not self._dirty or time.monotonic() - self._saved_at < SUGGEST_INDEX_SAVE_INTERVAL:
+            return
+        self._saved_at = time.monotonic()
+        threading.Thread(target=self.save, daemon=True).start()
+
+    def save(self):
+        """Writes the index to its path (atomically: temp file + rename)."""
+        if not self.path:
+            return
+        with self._lock:
+            entries = [[type, id, text, folded] for (type, id), (text, folded) in self._entries.items()]
+            self._dirty = False
+        tmp = None
+        try:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'version': 1, 'entries': entries}, f)
+            os.replace(tmp, self.path)
+        except Exception as e:
+            print(f"Suggestion index save error: {e}")
+            if tmp and os.path.exists(tmp):
+                os.remove(tmp)
+
+    def load(self):
+        """Reloads a saved index (least recently seen entries first)."""
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            print(f"Suggestion index load error: {e}")
+            return
+        for type, id, text, folded in data.get('entries', [])[-self.maxsize:]:
+            self.add(type, id, folded, text)
+        self._dirty = False
+
+suggestions = SuggestionIndex(SUGGEST_INDEX_SIZE, SUGGEST_INDEX_PATH)
+atexit.register(suggestions.save)
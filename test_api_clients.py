@@ -1,25 +1,26 @@
 import unittest
 from unittest.mock import patch, MagicMock
-from api_clients import search_itunes, search_deezer_artists, get_lastfm_artist_data
+from api_clients import search_itunes, search_deezer_artists, get_lastfm_artist_data, get_session, index_lookup_results, UPSTREAM_POOL_SIZE
 
 class TestApiClients(unittest.TestCase):
-    @patch('api_clients.requests.get')
-    def test_search_itunes(self, mock_get):
+    @patch('api_clients.get_session')
+    def test_search_itunes(self, mock_session):
         # Mocking iTunes response
         mock_response = MagicMock()
         mock_response.json.return_value = {
             'results': [{'artistName': 'Queen', 'artistId': 123}]
         }
         mock_response.status_code = 200
-        mock_get.return_value = mock_response
+        mock_session.return_value.get.return_value = mock_response
         
         results = search_itunes('Queen', 'musicArtist', 1)
         self.assertEqual(len(results), 1)
         self.assertEqual(results[0]['artistName'], 'Queen')
-        mock_get.assert_called_once()
+        mock_session.assert_called_once_with('itunes')
+        mock_session.return_value.get.assert_called_once()
 
-    @patch('api_clients.requests.get')
-    def test_search_deezer_artists(self, mock_get):
+    @patch('api_clients.get_session')
+    def test_search_deezer_artists(self, mock_session):
         # Mocking Deezer response
         mock_response = MagicMock()
         mock_response.json.return_value = {
@@ -28,7 +29,7 @@ class TestApiClients(unittest.TestCase):
             ]
         }
         mock_response.status_code = 200
-        mock_get.return_value = mock_response
+        mock_session.return_value.get.return_value = mock_response
         
         results = search_deezer_artists('Queen', 1)
         self.assertEqual(len(results), 1)
@@ -36,8 +37,8 @@ class TestApiClients(unittest.TestCase):
         self.assertIn('1.5M', results[0]['stats'])
         self.assertEqual(results[0]['image'], 'http://image.jpg')
 
-    @patch('api_clients.requests.get')
-    def test_get_lastfm_artist_data(self, mock_get):
+    @patch('api_clients.get_session')
+    def test_get_lastfm_artist_data(self, mock_session):
         # Mocking Last.fm response
         mock_response = MagicMock()
         mock_response.json.return_value = {
@@ -48,7 +49,7 @@ class TestApiClients(unittest.TestCase):
             }
         }
         mock_response.status_code = 200
-        mock_get.return_value = mock_response
+        mock_session.return_value.get.return_value = mock_response
         
         data = get_lastfm_artist_data('Queen')
         self.assertIsNotNone(data)
@@ -56,5 +57,22 @@ class TestApiClients(unittest.TestCase):
         self.assertEqual(data['bio'], 'Bio text')
         self.assertEqual(data['tags'], ['Rock'])
 
+    def test_get_session_is_shared_per_upstream(self):
+        session = get_session('itunes')
+        self.assertIs(get_session('itunes'), session)
+        self.assertIsNot(get_session('deezer'), session)
+        adapter = session.get_adapter('https://itunes.apple.com/search')
+        self.assertEqual(adapter._pool_maxsize, UPSTREAM_POOL_SIZE)
+
+    def test_index_lookup_results_uses_wrapper_type(self):
+        results = [
+            {'wrapperType': 'track', 'trackId': 7, 'collectionId': 5, 'artistId': 1},
+            {'wrapperType': 'collection', 'collectionId': 5, 'artistId': 1},
+        ]
+        by_id = index_lookup_results(results, [1, 5, 7])
+        self.assertEqual(by_id['7']['wrapperType'], 'track')
+        self.assertEqual(by_id['5']['wrapperType'], 'collection')
+        self.assertNotIn('1', by_id)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,116 @@
+import time
+import unittest
+from unittest.mock import patch
+import artist_store
+from artist_store import get_artist, find_artist_id, FIELD_TTL
+
+class TestArtistStore(unittest.TestCase):
+    def setUp(self):
+        artist_store._records.clear()
+        artist_store._names.clear()
+        self.calls = []
+
+        async def lookup(artist_id, entity=None, limit=None):
+            if entity == 'album':
+                self.calls.append('artwork')
+                return [{'artistName': 'Queen', 'artistId': int(artist_id)},
+                        {'collectionType': 'Album', 'collectionName': 'Jazz', 'artworkUrl100': 'https://itunes/100x100bb.jpg'}]
+            self.calls.append('itunes')
+            return [{'artistName': 'Queen', 'artistId': int(artist_id)}]
+
+        async def deezer(name, limit=5):
+            self.calls.append('deezer')
+            return [{'artistId': 'dz1', 'image': 'https://dz/queen.jpg', 'stats': '👥 1M fans'}]
+
+        async def lastfm(name):
+            self.calls.append('lastfm')
+            return {'bio': 'Band', 'stats': '👥 5M Last.fm listeners', 'tags': ['rock']}
+
+        patchers = [
+            patch('artist_store.async_lookup_itunes', lookup),
+            patch('artist_store.async_search_deezer_artists', deezer),
+            patch('artist_store.async_get_lastfm_artist_data', lastfm),
+        ]
+        for p in patchers:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def test_merges_sources(self):
+        record = get_artist(1, 'Queen', want=('artwork', 'image', 'stats', 'bio', 'tags'))
+        self.assertEqual(record['image'], 'https://dz/queen.jpg')
+        self.assertEqual(record['artwork'], 'https://itunes/400x400bb.jpg')
+        self.assertEqual(record['stats'], '👥 5M Last.fm listeners')
+        self.assertEqual(record['tags'], ['rock'])
+        self.assertEqual(sorted(self.calls), ['artwork', 'deezer', 'lastfm'])
+
+    def test_fresh_fields_are_not_refetched(self):
+        get_artist(1, 'Queen')
+        get_artist(1, 'Queen')
+        self.assertEqual(sorted(self.calls), ['deezer', 'lastfm'])
+        # The image API reuses the record filled by search, without knowing the name
+        record = get_artist('1', want=('image',))
+        self.assertEqual(record['image'], 'https://dz/queen.jpg')
+        self.assertEqual(len(self.calls), 2)
+        self.assertEqual(find_artist_id('queen'), '1')
+
+    def test_peek_does_not_fetch(self):
+        self.assertIsNone(artist_store.peek_artist(1))
+        get_artist(1, 'Queen')
+        self.calls.clear()
+        self.assertEqual(artist_store.peek_artist(1)['image'], 'https://dz/queen.jpg')
+        self.assertEqual(self.calls, [])
+
+    def test_only_stale_sources_are_refreshed(self):
+        get_artist(1, 'Queen')
+        record = artist_store._records.get('1')
+        record['stamps']['lastfm_stats'] = time.time() - FIELD_TTL['lastfm_stats'] - 1
+        self.calls.clear()
+        get_artist(1, 'Queen')
+        self.assertEqual(self.calls, ['lastfm'])
+
+    def test_name_is_looked_up_when_missing(self):
+        record = get_artist(1, want=('image',))
+        self.assertEqual(record['name'], 'Queen')
+        self.assertEqual(self.calls, ['itunes', 'deezer'])
+
+    def test_artwork_fallback_when_no_deezer_photo(self):
+        async def no_deezer(name, limit=5):
+            self.calls.append('deezer')
+            return []
+
+        with patch('artist_store.async_search_deezer_artists', no_deezer):
+            record = get_artist(1, 'Queen', want=('image',))
+        self.assertEqual(record['image'], 'https://itunes/400x400bb.jpg')
+        self.assertEqual(self.calls, ['deezer', 'artwork'])
+
+    def test_deezer_error_is_not_stamped(self):
+        async def deezer_down(name, limit=5):
+            self.calls.append('deezer')
+            return None
+
+        with patch('artist_store.async_search_deezer_artists', deezer_down):
+            record = get_artist(1, 'Queen', want=('image',))
+        self.assertEqual(record['image'], 'https://itunes/400x400bb.jpg')
+        self.assertNotIn('deezer_image', artist_store._records.get('1')['stamps'])
+        # Deezer back: asked again at once
+        self.calls.clear()
+        self.assertEqual(get_artist(1, 'Queen', want=('image',))['image'], 'https://dz/queen.jpg')
+        self.assertEqual(self.calls, ['deezer'])
+
+    def test_no_match_kept_for_negative_ttl_only(self):
+        async def no_deezer(name, limit=5):
+            self.calls.append('deezer')
+            return []
+
+        with patch('artist_store.async_search_deezer_artists', no_deezer):
+            get_artist(1, 'Queen', want=('image',))
+            self.calls.clear()
+            get_artist(1, 'Queen', want=('image',))
+            self.assertEqual(self.calls, [])
+        later = time.time() + artist_store.NEGATIVE_TTL['deezer'] + 1
+        with patch('artist_store.time.time', return_value=later):
+            self.assertEqual(get_artist(1, 'Queen', want=('image',))['image'], 'https://dz/queen.jpg')
+        self.assertEqual(self.calls, ['deezer'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import os
+import shutil
+import tempfile
+import unittest
+from flask import Flask, render_template_string
+from assets import init_assets, build, minify_css, minify_js, IMMUTABLE_MAX_AGE
+
+class TestMinify(unittest.TestCase):
+    def test_css(self):
+        css = "/* theme */\na > b , .c {\n    color : red ;\n    margin: 0 auto;\n}\n.q::before { content: ' ; } ' ; }\n"
+        self.assertEqual(minify_css(css), "a>b,.c{color :red;margin:0 auto}.q::before{content:' ; } '}")
+
+    def test_js_keeps_strings_regexes_and_line_breaks(self):
+        js = ("// Helpers\nconst half = total / 2; /* block */\n\n    if (ok) {\n"
+              "        s.match(/a\\/\\/b[/]/g); // trailing\n        el.innerHTML = `\n  <div>  ${x}</div>`;\n    }\n"
+              "const url = 'http://example.com'\n")
+        self.assertEqual(minify_js(js), "const half = total / 2;\nif (ok) {\ns.match(/a\\/\\/b[/]/g);\n"
+                                        "el.innerHTML = `\n  <div>  ${x}</div>`;\n}\nconst url = 'http://example.com'\n")
+
+class TestAssets(unittest.TestCase):
+    def setUp(self):
+        self.static = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.static, True)
+        with open(os.path.join(self.static, 'style.css'), 'w') as f:
+            f.write("body {\n    margin: 0;\n}\n")
+        with open(os.path.join(self.static, 'script.js'), 'w') as f:
+            f.write("// App\nlet x = 1;\n")
+
+    def make_app(self):
+        app = Flask(__name__, static_folder=self.static, static_url_path='/static')
+        init_assets(app)
+        return app
+
+    def test_build_writes_hashed_minified_files(self):
+        manifest = build(self.static)
+        self.assertRegex(manifest['style.css'], r'^dist/style\.[0-9a-f]{10}\.css$')
+        with open(os.path.join(self.static, manifest['style.css'])) as f:
+            self.assertEqual(f.read(), 'body{margin:0}')
+        self.assertEqual(build(self.static), manifest)  # Same content, same names
+
+        with open(os.path.join(self.static, 'style.css'), 'w') as f:
+            f.write("body { margin: 1px; }")
+        rebuilt = build(self.static)
+        self.assertNotEqual(rebuilt['style.css'], manifest['style.css'])
+        self.assertTrue(os.path.exists(os.path.join(self.static, manifest['style.css'])))  # Old build kept
+
+    def test_asset_url_and_immutable_headers(self):
+        manifest = build(self.static)
+        app = self.make_app()
+        with app.test_request_context():
+            url = render_template_string("{{ asset_url('script.js') }}")
+        self.assertEqual(url, '/static/' + manifest['script.js'])
+
+        client = app.test_client()
+        response = client.get(url)
+        self.assertEqual(response.data, b'let x = 1;\n')
+        cache_control = response.cache_control
+        self.assertTrue(cache_control.immutable)
+        self.assertTrue(cache_control.public)
+        self.assertEqual(cache_control.max_age, IMMUTABLE_MAX_AGE)
+        self.assertFalse(cache_control.no_cache)
+        response.close()
+
+        plain = client.get('/static/script.js')
+        self.assertFalse(plain.cache_control.immutable)
+        plain.close()
+
+    def test_asset_url_without_manifest(self):
+        app = self.make_app()
+        with app.test_request_context():
+            url = render_template_string("{{ asset_url('style.css') }}")
+        self.assertRegex(url, r'^/static/style\.css\?v=\d+$')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import threading
+import unittest
+from unittest.mock import patch
+import httpx
+import requests_cache
+import async_clients
+from async_clients import gather, async_search_itunes, async_get_lastfm_artist_data, lookup_itunes_many
+
+class TestAsyncClients(unittest.TestCase):
+    def setUp(self):
+        self.calls = []
+
+        def handler(request):
+            self.calls.append(str(request.url))
+            if 'itunes' in request.url.host:
+                return httpx.Response(200, json={'results': [{'artistName': 'Queen', 'artistId': 123}]})
+            return httpx.Response(200, json={'artist': {'stats': {'listeners': '5000'}}})
+
+        self.session = requests_cache.CachedSession(backend='memory', expire_after=60)
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        patchers = [
+            patch('async_clients.get_session', return_value=self.session),
+            patch('async_clients._get_client', return_value=client),
+        ]
+        for p in patchers:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def test_gather_returns_results_in_order(self):
+        itunes, lastfm = gather(async_search_itunes('Queen', 'musicArtist', 1), async_get_lastfm_artist_data('Queen'))
+        self.assertEqual(itunes[0]['artistName'], 'Queen')
+        self.assertEqual(lastfm['stats'], '👥 5K Last.fm listeners')
+
+    def test_responses_are_shared_with_sync_cache(self):
+        gather(async_search_itunes('Queen', 'musicArtist', 1))
+        gather(async_search_itunes('Queen', 'musicArtist', 1))
+        self.assertEqual(len(self.calls), 1)
+        # The sync session sees the response cached by the async client
+        response = self.session.get(self.calls[0])
+        self.assertTrue(response.from_cache)
+
+    def test_cache_io_runs_off_the_loop_thread(self):
+        threads = []
+        get_response, save_response = self.session.cache.get_response, self.session.cache.save_response
+
+        def record(method):
+            def wrapper(*args, **kwargs):
+                threads.append(threading.current_thread().name)
+                return method(*args, **kwargs)
+            return wrapper
+
+        with patch.object(self.session.cache, 'get_response', record(get_response)), \
+                patch.object(self.session.cache, 'save_response', record(save_response)):
+            gather(async_search_itunes('Queen', 'musicArtist', 1))
+        self.assertEqual(len(threads), 2)
+        self.assertNotIn('upstream-loop', threads)
+
+class TestLookupMany(unittest.TestCase):
+    def setUp(self):
+        self.requested = []
+        async_clients._lookup_entities.clear()
+
+        def handler(request):
+            ids = request.url.params['id'].split(',')
+            self.requested.append(ids)
+            if '503' in ids:
+                return httpx.Response(503, json={})
+            results = [{'wrapperType': 'collection', 'collectionId': int(i), 'artistId': 1} for i in ids if i != '404']
+            return httpx.Response(200, json={'results': results})
+
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        patchers = [
+            patch('async_clients.get_session', return_value=requests_cache.CachedSession(backend='memory')),
+            patch('async_clients._get_client', return_value=client),
+            patch('async_clients.ITUNES_LOOKUP_CHUNK', 2),
+        ]
+        for p in patchers:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def test_chunks_and_keys_by_id(self):
+        results = lookup_itunes_many([10, 11, 12, '404', 10])
+        self.assertEqual(sorted(results), ['10', '11', '12', '404'])
+        self.assertEqual(results['11']['collectionId'], 11)
+        self.assertIsNone(results['404'])
+        self.assertEqual(sorted(map(len, self.requested)), [2, 2])
+
+    def test_ids_are_cached_separately(self):
+        lookup_itunes_many([10, 11])
+        lookup_itunes_many([11, 12])
+        self.assertEqual(self.requested, [['10', '11'], ['12']])
+
+    def test_failed_chunk_is_not_cached(self):
+        self.assertEqual(lookup_itunes_many([20, '503']), {'20': None, '503': None})
+        lookup_itunes_many([20, '503'])
+        self.assertEqual(len(self.requested), 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+import asyncio
+import sqlite3
+import unittest
+from unittest.mock import patch, MagicMock
+import time
+import httpx
+import requests_cache
+from breakers import CircuitBreaker
+from api_clients import get_lastfm_artist_data, get_similar_artists
+from async_clients import run, async_search_itunes
+
+class TestCircuitBreaker(unittest.TestCase):
+    def test_opens_after_threshold(self):
+        breaker = CircuitBreaker('lastfm', failure_threshold=3, reset_timeout=60)
+        for _ in range(3):
+            self.assertTrue(breaker.allow())
+            breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(breaker.allow())
+
+    def test_success_resets_failure_count(self):
+        breaker = CircuitBreaker('lastfm', failure_threshold=2)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_half_open_allows_single_probe(self):
+        breaker = CircuitBreaker('deezer', failure_threshold=1, reset_timeout=0.01)
+        breaker.record_failure()
+        time.sleep(0.02)
+        self.assertTrue(breaker.allow())
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertFalse(breaker.allow())  # Probe already in flight
+
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_failed_probe_reopens(self):
+        breaker = CircuitBreaker('itunes', failure_threshold=1, reset_timeout=0.01)
+        breaker.record_failure()
+        time.sleep(0.02)
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+    def test_async_calls_share_the_sync_slots(self):
+        breaker = CircuitBreaker('itunes', max_concurrent=1, queue_timeout=0.05)
+        self.assertTrue(breaker.acquire_slot())
+        self.assertFalse(asyncio.run(breaker.acquire_slot_async()))
+        breaker.release_slot()
+        self.assertTrue(asyncio.run(breaker.acquire_slot_async()))
+        self.assertFalse(breaker.acquire_slot())
+
+class TestBreakerFallbacks(unittest.TestCase):
+    @patch('api_clients.get_breaker')
+    @patch('api_clients.get_session')
+    def test_open_breaker_returns_fallbacks_without_calling_upstream(self, mock_session, mock_breaker):
+        mock_breaker.return_value = CircuitBreaker('lastfm', failure_threshold=1, reset_timeout=60)
+        mock_breaker.return_value.record_failure()
+        mock_session.return_value.cache.get_response.return_value = None
+
+        self.assertIsNone(get_lastfm_artist_data('Queen'))
+        self.assertEqual(get_similar_artists('Queen'), [])
+        mock_session.return_value.get.assert_not_called()
+
+    @patch('api_clients.get_breaker')
+    @patch('api_clients.get_session')
+    def test_open_breaker_serves_expired_cache(self, mock_session, mock_breaker):
+        mock_breaker.return_value = CircuitBreaker('lastfm', failure_threshold=1, reset_timeout=60)
+        mock_breaker.return_value.record_failure()
+        cached = MagicMock()
+        cached.json.return_value = {'similarartists': {'artist': [{'name': 'David Bowie'}]}}
+        mock_session.return_value.cache.get_response.return_value = cached
+
+        self.assertEqual(get_similar_artists('Queen'), [{'name': 'David Bowie'}])
+        mock_session.return_value.get.assert_not_called()
+
+    @patch('api_clients.get_breaker')
+    @patch('api_clients.get_session')
+    def test_unexpected_sync_error_frees_probe_and_slot(self, mock_session, mock_breaker):
+        breaker = mock_breaker.return_value = CircuitBreaker('lastfm', failure_threshold=1, reset_timeout=0.01, max_concurrent=1, queue_timeout=0.05)
+        breaker.record_failure()
+        time.sleep(0.02)
+        mock_session.return_value.cache.get_response.return_value = None
+        mock_session.return_value.get.side_effect = sqlite3.OperationalError('database is locked')
+
+        self.assertIsNone(get_lastfm_artist_data('Queen'))
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertTrue(breaker.allow())  # Probe given back
+        self.assertTrue(breaker.acquire_slot())  # Slot given back
+
+    def test_unexpected_async_error_frees_probe_and_slot(self):
+        breaker = CircuitBreaker('itunes', failure_threshold=1, reset_timeout=0.01, max_concurrent=1, queue_timeout=0.05)
+        breaker.record_failure()
+        time.sleep(0.02)
+
+        def handler(request):
+            raise RuntimeError('unexpected')
+
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        with patch('async_clients.get_breaker', return_value=breaker), \
+                patch('async_clients.get_session', return_value=requests_cache.CachedSession(backend='memory')), \
+                patch('async_clients._get_client', return_value=client):
+            self.assertEqual(run(async_search_itunes('Queen', 'musicArtist', 1)), [])
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertTrue(breaker.allow())  # Probe given back
+        self.assertTrue(breaker.acquire_slot())  # Slot given back
+
+if __name__ == '__main__':
+    unittest.main()
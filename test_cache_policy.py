@@ -0,0 +1,35 @@
+import unittest
+from unittest.mock import MagicMock
+from requests_cache.policy.expiration import get_url_expiration
+from cache_policy import CACHE_POLICY, DEFAULT_POLICY, policy_for_url, urls_expire_after, is_negative
+from api_clients import itunes_search_url, itunes_lookup_url, deezer_artist_search_url, lastfm_album_info_url
+
+def make_response(status_code=200, payload=None, content_type='application/json'):
+    response = MagicMock()
+    response.status_code = status_code
+    response.headers = {'Content-Type': content_type}
+    response.json.return_value = payload
+    return response
+
+class TestCachePolicy(unittest.TestCase):
+    def test_policy_per_endpoint(self):
+        self.assertEqual(policy_for_url(itunes_lookup_url(909253, 'album', 200)), CACHE_POLICY[('itunes', 'lookup')])
+        self.assertEqual(policy_for_url(itunes_search_url('queen', 'album', 15)), CACHE_POLICY[('itunes', 'search')])
+        self.assertEqual(policy_for_url(deezer_artist_search_url('queen', 1)), CACHE_POLICY[('deezer', 'search/artist')])
+        self.assertEqual(policy_for_url(lastfm_album_info_url('Queen', 'Innuendo')), CACHE_POLICY[('lastfm', 'album.getinfo')])
+        self.assertEqual(policy_for_url('https://example.com/other'), DEFAULT_POLICY)
+
+    def test_requests_cache_uses_same_ttls(self):
+        url = 'http://ws.audioscrobbler.com/2.0/?method=tag.getinfo&tag=rock&api_key=x&format=json'
+        self.assertEqual(get_url_expiration(url, urls_expire_after()), CACHE_POLICY[('lastfm', 'tag.getinfo')].ttl)
+
+    def test_is_negative(self):
+        self.assertTrue(is_negative(make_response(404)))
+        self.assertTrue(is_negative(make_response(payload={'error': 6, 'message': 'Album not found'})))
+        self.assertTrue(is_negative(make_response(payload={'data': [], 'total': 0})))
+        self.assertTrue(is_negative(make_response(payload={'resultCount': 0, 'results': []})))
+        self.assertFalse(is_negative(make_response(payload={'resultCount': 1, 'results': [{'artistId': 1}]})))
+        self.assertFalse(is_negative(make_response(content_type='image/jpeg')))
+
+if __name__ == '__main__':
+    unittest.main()
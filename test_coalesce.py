@@ -0,0 +1,54 @@
+import asyncio
+import threading
+import time
+import unittest
+from coalesce import SingleFlight, AsyncSingleFlight
+from async_clients import run
+
+class TestSingleFlight(unittest.TestCase):
+    def test_concurrent_calls_share_one_execution(self):
+        flight = SingleFlight()
+        calls = []
+
+        def slow_fetch():
+            calls.append(1)
+            time.sleep(0.1)
+            return {'results': []}
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(flight.do('key', slow_fetch))) for _ in range(5)]
+        for t in threads: t.start()
+        for t in threads: t.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(results), 5)
+
+    def test_errors_are_raised_and_not_kept(self):
+        flight = SingleFlight()
+
+        def failing():
+            raise ValueError('upstream down')
+
+        with self.assertRaises(ValueError):
+            flight.do('key', failing)
+        # Next call runs again
+        self.assertEqual(flight.do('key', lambda: 'ok'), 'ok')
+
+class TestAsyncSingleFlight(unittest.TestCase):
+    def test_concurrent_coroutines_share_one_execution(self):
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return 'data'
+
+        async def scenario():
+            flight = AsyncSingleFlight()
+            return await asyncio.gather(*(flight.do('key', fetch) for _ in range(4)))
+
+        self.assertEqual(run(scenario()), ['data'] * 4)
+        self.assertEqual(len(calls), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+import gzip
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from flask import Flask
+from flask_caching import Cache
+from compression import init_compression, cached_compressed, COMPRESS_MIN_BYTES
+import build_static
+
+class TestCompression(unittest.TestCase):
+    def setUp(self):
+        self.static = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.static, True)
+        self.app = Flask(__name__, static_folder=self.static, static_url_path='/static')
+        self.app.cache = Cache(self.app, config={'CACHE_TYPE': 'SimpleCache'})
+        init_compression(self.app)
+        self.page = '<p>album</p>' * 200
+        self.renders = []
+
+        @self.app.route('/page')
+        def page():
+            response = cached_compressed('v1')
+            if response is None:
+                self.renders.append(1)
+                response = self.app.make_response(self.page)
+                response.set_etag('v1', weak=True)
+            response.cache_control.public = True
+            return response
+
+        @self.app.route('/private')
+        def private():
+            response = self.app.make_response(self.page)
+            response.set_etag('user-1', weak=True)
+            response.cache_control.private = True
+            return response
+
+        @self.app.route('/small')
+        def small():
+            return 'ok'
+
+        self.client = self.app.test_client()
+
+    def test_gzip_above_min_size(self):
+        response = self.client.get('/page', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+        self.assertEqual(gzip.decompress(response.data).decode(), self.page)
+        self.assertEqual(response.headers['ETag'], 'W/"v1"')
+
+        small = self.client.get('/small', headers={'Accept-Encoding': 'gzip'})
+        self.assertLess(len('ok'), COMPRESS_MIN_BYTES)
+        self.assertNotIn('Content-Encoding', small.headers)
+        self.assertIn('Accept-Encoding', small.headers['Vary'])
+
+    def test_identity_without_accept_encoding(self):
+        response = self.client.get('/page', headers={'Accept-Encoding': 'identity'})
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertEqual(response.get_data(as_text=True), self.page)
+
+    def test_compressed_page_cached_by_etag(self):
+        first = self.client.get('/page', headers={'Accept-Encoding': 'gzip'})
+        second = self.client.get('/page', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(len(self.renders), 1)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(second.headers['ETag'], 'W/"v1"')
+        # Clients without gzip still get the page rendered
+        self.client.get('/page')
+        self.assertEqual(len(self.renders), 2)
+
+    def test_private_page_compressed_but_not_cached(self):
+        response = self.client.get('/private', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(gzip.decompress(response.data).decode(), self.page)
+        self.assertIsNone(self.app.cache.get('compressed_gzip_user-1'))
+
+    def write_static(self, name, data, mtime):
+        path = os.path.join(self.static, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        os.utime(path, (mtime, mtime))
+
+    def test_precompressed_static(self):
+        now = time.time()
+        self.write_static('style.css', b'body { color: red; }', now - 10)
+        self.write_static('style.css.gz', b'precompressed', now)
+        response = self.client.get('/static/style.css', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.data, b'precompressed')
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(response.mimetype, 'text/css')
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+        response.close()
+
+        plain = self.client.get('/static/style.css')
+        self.assertEqual(plain.data, b'body { color: red; }')
+        self.assertNotIn('Content-Encoding', plain.headers)
+        plain.close()
+
+    def test_stale_precompressed_static_ignored(self):
+        now = time.time()
+        self.write_static('script.js', b'let x = 1;', now)
+        self.write_static('script.js.gz', b'old build', now - 10)
+        response = self.client.get('/static/script.js', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.data, b'let x = 1;')
+        response.close()
+
+    def test_build_static(self):
+        os.makedirs(os.path.join(self.static, 'cache'))
+        self.write_static('style.css', b'body { margin: 0; }' * 50, time.time() - 10)
+        self.write_static(os.path.join('cache', 'cover.svg'), b'<svg/>', time.time() - 10)
+        written = build_static.build(self.static)
+        self.assertIn(os.path.join(self.static, 'style.css.gz'), [path for path, *_ in written])
+        self.assertFalse(os.path.exists(os.path.join(self.static, 'cache', 'cover.svg.gz')))
+        with open(os.path.join(self.static, 'style.css.gz'), 'rb') as f:
+            self.assertEqual(gzip.decompress(f.read()), b'body { margin: 0; }' * 50)
+        self.assertEqual(build_static.build(self.static), [])  # Up to date
+        self.assertTrue(build_static.build(self.static, force=True))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import discography
+from discography import get_discography, discography_page
+
+ALBUMS = [
+    {'wrapperType': 'artist', 'artistName': 'Queen'},
+    {'collectionType': 'Album', 'collectionName': 'Sheer Heart Attack', 'trackCount': 13, 'releaseDate': '1974-11-08'},
+    {'collectionType': 'Album', 'collectionName': 'Jazz', 'trackCount': 13, 'releaseDate': '1978-11-10'},
+    {'collectionType': 'Album', 'collectionName': 'Innuendo', 'trackCount': 12, 'releaseDate': '1991-02-04'},
+]
+
+class TestDiscography(unittest.TestCase):
+    def setUp(self):
+        discography._discographies.clear()
+        self.cached = MagicMock(is_expired=False, created_at=1)
+        patchers = [
+            patch('discography.get_cached_response', side_effect=lambda upstream, url: self.cached),
+            patch('discography.lookup_itunes', side_effect=lambda *a: [dict(x) for x in ALBUMS]),
+        ]
+        self.lookup = patchers[1].start()
+        patchers[0].start()
+        for p in patchers:
+            self.addCleanup(p.stop)
+
+    def test_all_sorts_precomputed(self):
+        disc = get_discography(1)
+        names = [a['collectionName'] for a in disc['categories']['albums']['name']]
+        years = [a['year'] for a in disc['categories']['albums']['year']]
+        self.assertEqual(names, ['Innuendo', 'Jazz', 'Sheer Heart Attack'])
+        self.assertEqual(years, ['1991', '1978', '1974'])
+
+    def test_pages_reuse_processed_entry(self):
+        get_discography(1)
+        get_discography(1)
+        self.assertEqual(self.lookup.call_count, 1)
+        page, total = discography_page(get_discography(1), 'albums', 'year', 2, 2)
+        self.assertEqual(total, 3)
+        self.assertEqual([a['year'] for a in page], ['1974'])
+
+    def test_rebuilt_when_lookup_refreshed(self):
+        get_discography(1)
+        self.cached = MagicMock(is_expired=False, created_at=2)
+        get_discography(1)
+        self.assertEqual(self.lookup.call_count, 2)
+
+    def test_expired_lookup_is_refreshed_first(self):
+        get_discography(1)
+        self.cached = MagicMock(is_expired=True, created_at=1)
+        get_discography(1)
+        # The client is asked to refresh, the unchanged response reuses the entry
+        self.assertEqual(self.lookup.call_count, 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+from unittest.mock import patch
+from flask import Flask
+from flask_login import LoginManager
+from http_cache import conditional, make_etag, PUBLIC_MAX_AGE
+
+class TestConditional(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        LoginManager(self.app).user_loader(lambda user_id: None)
+        self.calls = []
+
+        @self.app.route('/public')
+        @conditional('public')
+        def public():
+            self.calls.append(1)
+            return 'catalogue page'
+
+        @self.app.route('/private')
+        @conditional('private')
+        def private():
+            return {'ids': [1, 2]}
+
+        @self.app.route('/missing')
+        @conditional('public')
+        def missing():
+            return 'Not found', 404
+
+        self.client = self.app.test_client()
+
+    def test_etag_and_304(self):
+        first = self.client.get('/public')
+        etag = first.headers['ETag']
+        self.assertEqual(etag, f'W/"{make_etag(b"catalogue page")}"')
+        second = self.client.get('/public', headers={'If-None-Match': etag})
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second.data, b'')
+        self.assertEqual(second.headers['ETag'], etag)
+        self.assertIn('public', second.headers['Cache-Control'])
+        self.assertEqual(self.client.get('/public', headers={'If-None-Match': 'W/"other"'}).status_code, 200)
+
+    def test_public_policy_for_anonymous_users(self):
+        response = self.client.get('/public')
+        self.assertIn('public', response.headers['Cache-Control'])
+        self.assertIn(f'max-age={PUBLIC_MAX_AGE}', response.headers['Cache-Control'])
+        self.assertIn('Cookie', response.headers['Vary'])
+
+    def test_public_policy_is_private_with_a_session(self):
+        with patch('http_cache.current_user') as user:
+            user.is_authenticated = True
+            response = self.client.get('/public')
+        self.assertIn('private', response.headers['Cache-Control'])
+        self.assertNotIn('public', response.headers['Cache-Control'])
+
+    def test_private_policy(self):
+        response = self.client.get('/private')
+        self.assertIn('private', response.headers['Cache-Control'])
+        self.assertIn('no-cache', response.headers['Cache-Control'])
+        self.assertEqual(self.client.get('/private', headers={'If-None-Match': response.headers['ETag']}).status_code, 304)
+
+    def test_errors_left_alone(self):
+        response = self.client.get('/missing')
+        self.assertEqual(response.status_code, 404)
+        self.assertNotIn('ETag', response.headers)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,185 @@
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+import image_store
+from image_store import ImageStore, image_name, IMAGE_CACHE_URL, IMAGE_VARIANTS
+
+class FakeResponse:
+    def __init__(self, body, content_type='image/jpeg'):
+        self.status_code = 200
+        self.headers = {'Content-Type': content_type}
+        self.body = body
+
+    def iter_content(self, chunk_size):
+        for i in range(0, len(self.body), chunk_size):
+            yield self.body[i:i + chunk_size]
+
+class TestImageStore(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir, True)
+        self.downloads = []
+        self.release = threading.Event()
+        self.release.set()
+        test = self
+
+        class FakeSession:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                return False
+
+            def get(self, url, stream=False, timeout=None):
+                test.downloads.append(url)
+                test.release.wait(5)
+                return FakeResponse(b'x' * 100)
+
+        patcher = patch('image_store.OriginalSession', FakeSession)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def wait_for_downloads(self, store):
+        store._get_executor().submit(lambda: None).result(5)
+        store._executor.shutdown(wait=True)
+        store._executor = None
+
+    def test_returns_origin_until_downloaded(self):
+        store = ImageStore(self.dir, 1000, workers=1)
+        url = 'https://cdn/a.jpg'
+        self.assertEqual(store.url_for(url), url)
+        self.wait_for_downloads(store)
+        self.assertEqual(store.url_for(url), f"{IMAGE_CACHE_URL}/{image_name(url)}")
+        with open(store.path_for(image_name(url)), 'rb') as f:
+            self.assertEqual(f.read(), b'x' * 100)
+        self.assertFalse([n for n in os.listdir(self.dir) if n.endswith('.tmp')])
+
+    def test_concurrent_requests_share_one_download(self):
+        store = ImageStore(self.dir, 1000, workers=2)
+        self.release.clear()
+        store.url_for('https://cdn/a.jpg')
+        store.url_for('https://cdn/a.jpg')
+        self.release.set()
+        self.wait_for_downloads(store)
+        self.assertEqual(self.downloads, ['https://cdn/a.jpg'])
+
+    def test_evicts_least_recently_used_over_budget(self):
+        store = ImageStore(self.dir, 250, workers=1)
+        for name in ('a', 'b'):
+            store.url_for(f'https://cdn/{name}.jpg')
+            self.wait_for_downloads(store)
+        store.url_for('https://cdn/a.jpg')  # a is now the most recently used
+        store.url_for('https://cdn/c.jpg')
+        self.wait_for_downloads(store)
+        self.assertLessEqual(store.total_bytes, 250)
+        self.assertIsNone(store.path_for(image_name('https://cdn/b.jpg')))
+        self.assertFalse(os.path.exists(os.path.join(self.dir, image_name('https://cdn/b.jpg'))))
+        self.assertIsNotNone(store.path_for(image_name('https://cdn/a.jpg')))
+
+    def test_file_of_another_worker_is_not_fetched_again(self):
+        store = ImageStore(self.dir, 1000, workers=1)
+        url = 'https://cdn/a.jpg'
+        with open(os.path.join(self.dir, image_name(url)), 'wb') as f:  # Downloaded by another worker
+            f.write(b'z' * 50)
+        self.assertEqual(store.url_for(url), f"{IMAGE_CACHE_URL}/{image_name(url)}")
+        self.assertEqual(self.downloads, [])
+        self.assertEqual(store.total_bytes, 50)
+        self.assertIsNone(store.path_for('missing.jpg'))
+
+    def test_only_stale_temp_files_are_removed(self):
+        for name in ('fresh.tmp', 'stale.tmp'):
+            with open(os.path.join(self.dir, name), 'wb') as f:
+                f.write(b'x')
+        old = time.time() - image_store.IMAGE_TMP_MAX_AGE - 10
+        os.utime(os.path.join(self.dir, 'stale.tmp'), (old, old))
+        ImageStore(self.dir, 1000, workers=1)
+        # Another worker may still be writing the fresh one
+        self.assertEqual(sorted(os.listdir(self.dir)), ['fresh.tmp'])
+
+    def test_eviction_tolerates_other_workers(self):
+        store = ImageStore(self.dir, 250, workers=1)
+        for name in ('a', 'b'):
+            store.url_for(f'https://cdn/{name}.jpg')
+            self.wait_for_downloads(store)
+        a, b = (os.path.join(self.dir, image_name(f'https://cdn/{name}.jpg')) for name in ('a', 'b'))
+        os.remove(a)  # Evicted by another worker
+        with open(b, 'wb') as f:  # Downloaded again by another worker
+            f.write(b'y' * 100)
+        os.utime(b, (time.time() + 5, time.time() + 5))
+        for name in ('c', 'd'):
+            store.url_for(f'https://cdn/{name}.jpg')
+            self.wait_for_downloads(store)
+        self.assertNotIn(image_name('https://cdn/b.jpg'), store._files)  # Dropped from this worker's index
+        self.assertTrue(os.path.exists(b))  # but left on the disk for the other one
+        self.assertLessEqual(store.total_bytes, 250)
+
+    def test_index_survives_restart(self):
+        store = ImageStore(self.dir, 1000, workers=1)
+        store.url_for('https://cdn/a.jpg')
+        self.wait_for_downloads(store)
+        store = ImageStore(self.dir, 1000, workers=1)
+        self.assertEqual(store.total_bytes, 100)
+
+    def test_variant_url_only_once_cached(self):
+        store = ImageStore(self.dir, 10000, workers=1)
+        url = 'https://cdn/a.jpg'
+        self.assertEqual(store.url_for(url, 'card'), url)
+        self.wait_for_downloads(store)
+        self.assertEqual(store.url_for(url, 'card'), f"{IMAGE_CACHE_URL}/card/{image_name(url)}")
+
+    @unittest.skipUnless(image_store.Image, "Pillow not installed")
+    def test_variant_is_resized_once(self):
+        store = ImageStore(self.dir, 10 ** 7, workers=1)
+        name = image_name('https://cdn/big.jpg')
+        buf = io.BytesIO()
+        image_store.Image.new('RGB', (1000, 800), 'red').save(buf, 'JPEG')
+        with open(os.path.join(self.dir, name), 'wb') as f:
+            f.write(buf.getvalue())
+        store._add(name, len(buf.getvalue()))
+
+        path = store.variant_path(name, 'card', 'webp')
+        with image_store.Image.open(path) as img:
+            self.assertEqual(img.format, 'WEBP')
+            self.assertEqual(max(img.size), IMAGE_VARIANTS['card'])
+        with patch.object(store, '_make_variant') as make:
+            self.assertEqual(store.variant_path(name, 'card', 'webp'), path)
+            make.assert_not_called()
+
+    @unittest.skipUnless(image_store.Image, "Pillow not installed")
+    def test_converted_variant_is_closed(self):
+        store = ImageStore(self.dir, 10 ** 7, workers=1)
+        name = image_name('https://cdn/alpha.png')
+        image_store.Image.new('RGBA', (800, 800), (255, 0, 0, 128)).save(os.path.join(self.dir, name), 'PNG')
+        store._add(name, os.path.getsize(os.path.join(self.dir, name)))
+        closed = []
+        close = image_store.Image.Image.close
+
+        def record_close(img):
+            closed.append(img.mode)
+            close(img)
+
+        with patch.object(image_store.Image.Image, 'close', record_close):
+            path = store.variant_path(name, 'card', 'jpeg')
+        with image_store.Image.open(path) as img:
+            self.assertEqual((img.format, img.mode), ('JPEG', 'RGB'))
+        self.assertIn('RGB', closed)  # The converted copy
+
+    def test_no_variant_without_original(self):
+        store = ImageStore(self.dir, 1000, workers=1)
+        self.assertIsNone(store.variant_path('missing.jpg', 'card', 'jpeg'))
+        self.assertIsNone(store.variant_path('missing.jpg', 'huge', 'jpeg'))
+
+    def test_falls_back_when_not_writable(self):
+        blocker = os.path.join(self.dir, 'file')
+        open(blocker, 'w').close()
+        fallback = os.path.join(self.dir, 'fallback')
+        store = ImageStore(os.path.join(blocker, 'cache'), 1000, fallback_directory=fallback)
+        self.assertEqual(store.directory, fallback)
+
+if __name__ == '__main__':
+    unittest.main()
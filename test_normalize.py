@@ -0,0 +1,40 @@
+import unittest
+from normalize import fold, clean_name, normalize_title, clean_and_normalize, clean_and_normalize_many, normalize_titles
+
+class TestNormalize(unittest.TestCase):
+    def test_accents_and_case_fold(self):
+        self.assertEqual(fold("Ægir Straße"), "aegir strasse")
+        self.assertEqual(normalize_title("Café Tacvba"), normalize_title("CAFE TACVBA"))
+        self.assertEqual(normalize_title("Sigur Rós - Ágætis byrjun"), "sigurrosagaetisbyrjun")
+        self.assertEqual(normalize_title("ＡＢＣ １２３"), "abc123")
+
+    def test_non_latin_titles_keep_their_letters(self):
+        self.assertEqual(normalize_title("Кино (Live)"), "кино")
+        self.assertEqual(normalize_title("東京事変【初回限定盤】"), "東京事変")
+        self.assertEqual(normalize_title("नमस्ते"), "नमस्ते")
+        # Marks that make a different letter outside Latin/Greek are kept
+        self.assertNotEqual(normalize_title("Мой"), normalize_title("Мои"))
+        self.assertNotEqual(normalize_title("が"), normalize_title("か"))
+
+    def test_symbol_only_titles_do_not_collide(self):
+        self.assertEqual(normalize_title("!!!"), "!!!")
+        self.assertNotEqual(normalize_title("!!!"), normalize_title("???"))
+        self.assertEqual(normalize_title("   "), "")
+
+    def test_clean_name_cjk_brackets(self):
+        self.assertEqual(clean_name("東京事変（Remastered）"), "東京事変")
+        self.assertEqual(clean_name("Кино (Live)"), "Кино")
+
+    def test_memoized(self):
+        clean_and_normalize.cache_clear()
+        normalize_title("Let It Be (Remastered)")
+        clean_name("Let It Be (Remastered)")
+        self.assertEqual(clean_and_normalize.cache_info().hits, 1)
+
+    def test_batch(self):
+        titles = ["Let It Be (Remastered)", "Кино", "Let It Be (Remastered)", None]
+        self.assertEqual(clean_and_normalize_many(titles), [clean_and_normalize(t) for t in titles])
+        self.assertEqual(normalize_titles(titles), ["letitbe", "кино", "letitbe", ""])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,147 @@
+import threading
+import time
+import unittest
+from unittest.mock import patch
+from flask import Flask
+from flask_caching import Cache
+from flask_login import LoginManager
+from assets import init_assets
+from page_cache import get_or_render, get_or_render_view, get_or_stream_view, fill_slot
+
+class TestPageCache(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['PAGE_CACHE_MAX_STALE'] = 60
+        self.app.cache = Cache(self.app, config={'CACHE_TYPE': 'simple'})
+        self.renders = []
+
+    def render(self):
+        self.renders.append(1)
+        return f"page v{len(self.renders)}"
+
+    def test_renders_once_then_serves_cache(self):
+        with self.app.test_request_context('/'):
+            self.assertEqual(get_or_render('k', self.render, timeout=30), 'page v1')
+            self.assertEqual(get_or_render('k', self.render, timeout=30), 'page v1')
+        self.assertEqual(len(self.renders), 1)
+
+    def test_not_found_is_not_cached(self):
+        with self.app.test_request_context('/'):
+            self.assertIsNone(get_or_render('missing', lambda: None, timeout=30))
+            self.assertEqual(get_or_render('missing', self.render, timeout=30), 'page v1')
+
+    def test_stale_page_is_served_and_refreshed_in_background(self):
+        with self.app.test_request_context('/'):
+            get_or_render('k', self.render, timeout=30)
+
+            with patch('page_cache.time.time', return_value=time.time() + 31):
+                self.assertEqual(get_or_render('k', self.render, timeout=30), 'page v1')
+
+            for _ in range(50):
+                if self.app.cache.get('k')[0] == 'page v2':
+                    break
+                time.sleep(0.01)
+            self.assertEqual(get_or_render('k', self.render, timeout=30), 'page v2')
+
+    def test_view_body_cached_and_page_rendered_per_request(self):
+        LoginManager(self.app).user_loader(lambda user_id: None)  # The header needs current_user
+        init_assets(self.app)  # and the shell asset_url()
+        builds = []
+
+        def build():
+            builds.append(1)
+            return {'album': {'collectionName': 'Shared Album', 'releaseDate': '2001-01-01', 'year': '2001'}, 'songs': []}
+
+        with self.app.test_request_context('/'):
+            first = get_or_render_view('album_body_1', 'album_detail', build, timeout=30, query='first')
+            second = get_or_render_view('album_body_1', 'album_detail', build, timeout=30, query='second')
+            self.assertIsNone(get_or_render_view('album_body_2', 'album_detail', lambda: None, timeout=30))
+        self.assertEqual(len(builds), 1)
+        self.assertNotEqual(first.get_etag(), second.get_etag())
+        first, second = first.get_data(as_text=True), second.get_data(as_text=True)
+        self.assertIn('Shared Album', second)
+        self.assertIn('value="first"', first)
+        self.assertIn('value="second"', second)
+        self.assertIn('<body>', second)
+        self.assertNotIn('<body>', self.app.cache.get('album_body_1')[0])
+
+    def test_view_not_modified(self):
+        LoginManager(self.app).user_loader(lambda user_id: None)
+        init_assets(self.app)
+        build = lambda: {'album': {'collectionName': 'Shared Album', 'releaseDate': '2001-01-01', 'year': '2001'}, 'songs': []}
+        with self.app.test_request_context('/'):
+            etag = get_or_render_view('album_body_1', 'album_detail', build, timeout=30).headers['ETag']
+        with self.app.test_request_context('/', headers={'If-None-Match': etag}):
+            with patch('page_cache.render_page') as render_page:
+                self.assertEqual(get_or_render_view('album_body_1', 'album_detail', build, timeout=30).status_code, 304)
+            render_page.assert_not_called()
+
+    def test_uncached_view_streamed_then_cached(self):
+        LoginManager(self.app).user_loader(lambda user_id: None)
+        init_assets(self.app)
+        self.app.config['STREAM_UNCACHED_PAGES'] = True
+        build = lambda: {'album': {'collectionName': 'Built', 'releaseDate': '2001-01-01', 'year': '2001'}, 'songs': []}
+
+        def chunks():
+            yield '<p>part one</p>'
+            yield fill_slot('late', '<p>late part</p>')
+            return '<p>part one</p><p>late part</p>'
+
+        with self.app.test_request_context('/'):
+            response = get_or_stream_view('album_body_1', 'album_detail', build, chunks, timeout=30)
+            self.assertTrue(response.is_streamed)
+        parts = list(response.response)  # Read outside the request, like a WSGI server
+        self.assertIn('<body>', parts[0])
+        self.assertNotIn('part one', parts[0])
+        self.assertEqual(parts[1], '<p>part one</p>')
+        self.assertIn('<template id="fill-late"><p>late part</p></template>', parts[2])
+        self.assertIn('</html>', parts[3])
+        self.assertEqual(self.app.cache.get('album_body_1')[0], '<p>part one</p><p>late part</p>')
+
+        with self.app.test_request_context('/'):
+            cached = get_or_stream_view('album_body_1', 'album_detail', build, chunks, timeout=30)
+            self.assertFalse(cached.is_streamed)
+            self.assertIn('late part', cached.get_data(as_text=True))
+            self.assertIsNone(get_or_stream_view('album_body_2', 'album_detail', build, lambda: None, timeout=30))
+
+    def test_concurrent_misses_wait_for_the_streaming_leader(self):
+        LoginManager(self.app).user_loader(lambda user_id: None)
+        init_assets(self.app)
+        self.app.config['STREAM_UNCACHED_PAGES'] = True
+        streams, builds, followers = [], [], []
+
+        def build():
+            builds.append(1)
+            return {'album': {'collectionName': 'Built', 'releaseDate': '2001-01-01', 'year': '2001'}, 'songs': []}
+
+        def stream():
+            streams.append(1)
+
+            def chunks():
+                yield '<p>streamed</p>'
+                return '<p>streamed</p>'
+            return chunks()
+
+        def follower():
+            with self.app.test_request_context('/'):
+                response = get_or_stream_view('album_body_1', 'album_detail', build, stream, timeout=30)
+                followers.append(response.get_data(as_text=True))
+
+        with self.app.test_request_context('/'):
+            leader = get_or_stream_view('album_body_1', 'album_detail', build, stream, timeout=30)
+        threads = [threading.Thread(target=follower) for _ in range(3)]
+        for t in threads:
+            t.start()
+        time.sleep(0.05)
+        self.assertEqual(followers, [])  # Waiting for the leader
+        parts = list(leader.response)
+        for t in threads:
+            t.join(5)
+        self.assertIn('<p>streamed</p>', ''.join(parts))
+        self.assertEqual(len(streams), 1)
+        self.assertEqual(builds, [])
+        self.assertEqual(len(followers), 3)
+        self.assertTrue(all('<p>streamed</p>' in html for html in followers))
+
+if __name__ == '__main__':
+    unittest.main()
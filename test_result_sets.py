@@ -0,0 +1,64 @@
+import time
+import unittest
+from unittest.mock import patch
+import result_sets
+from result_sets import get_result_set, encode_cursor, decode_cursor
+from app import app
+from cache_policy import CACHE_POLICY
+
+ALBUMS = [
+    {'collectionId': 1, 'collectionName': 'Zeta Album', 'artistName': 'A', 'releaseDate': '1990-01-01', 'artworkUrl100': 'x/100x100bb.jpg', 'copyright': 'c'},
+    {'collectionId': 2, 'collectionName': 'Alpha Album', 'artistName': 'B', 'releaseDate': '2010-01-01', 'artworkUrl100': 'y/100x100bb.jpg'},
+    {'collectionId': 3, 'collectionName': 'Other', 'artistName': 'C', 'releaseDate': '2000-01-01'},
+]
+
+class TestResultSets(unittest.TestCase):
+    def setUp(self):
+        result_sets._result_sets.clear()
+        patcher = patch('result_sets.search_itunes', side_effect=lambda q, entity, limit: [dict(a) for a in ALBUMS])
+        self.search = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_built_once_per_normalized_query(self):
+        relevance = get_result_set('Album', 'albums')
+        by_name = get_result_set('  album ', 'albums', 'name')
+        by_year = get_result_set('ALBUM', 'albums', 'year')
+        self.assertEqual(self.search.call_count, 1)
+        self.assertEqual([a['collectionId'] for a in relevance], [1, 2])
+        self.assertEqual([a['collectionId'] for a in by_name], [2, 1])
+        self.assertEqual([a['collectionId'] for a in by_year], [2, 1])
+
+    def test_projection(self):
+        item = get_result_set('album', 'albums')[0]
+        self.assertNotIn('copyright', item)
+        self.assertEqual(item['year'], '1990')
+        self.assertIn('300x300bb', item['artworkUrl100'])
+
+    def test_empty_search_kept_for_negative_ttl_only(self):
+        self.search.side_effect = lambda q, entity, limit: []  # Failed search
+        self.assertEqual(get_result_set('album', 'albums'), [])
+        self.search.side_effect = lambda q, entity, limit: [dict(a) for a in ALBUMS]
+        later = time.monotonic() + CACHE_POLICY[('itunes', 'search')].negative_ttl + 1
+        with patch('lru.time.monotonic', return_value=later):
+            self.assertEqual(len(get_result_set('album', 'albums')), 2)
+
+    def test_cursor_round_trip(self):
+        self.assertEqual(decode_cursor(encode_cursor(40)), 40)
+        self.assertEqual(decode_cursor('not a cursor!'), 0)
+        self.assertEqual(decode_cursor(None), 0)
+
+    def test_json_endpoint_pages_with_cursor(self):
+        client = app.test_client()
+        first = client.get('/api/see-all/albums?q=album&limit=1').json
+        self.assertEqual(first['total'], 2)
+        self.assertEqual(first['results'][0]['collectionId'], 1)
+        second = client.get(f"/api/see-all/albums?q=album&limit=1&cursor={first['next_cursor']}").json
+        self.assertEqual(second['results'][0]['collectionId'], 2)
+        self.assertIsNone(second['next_cursor'])
+
+    def test_json_endpoint_unknown_type(self):
+        response = app.test_client().get('/api/see-all/playlists?q=album')
+        self.assertEqual(response.status_code, 404)
+
+if __name__ == '__main__':
+    unittest.main()
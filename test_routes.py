@@ -1,6 +1,16 @@
+import asyncio
+import os
+import tempfile
+import threading
 import unittest
+from unittest.mock import patch
 from app import app, db
 from models import User, Playlist
+from lru import LRUCache
+from suggest_index import SuggestionIndex
+
+# Mocked pages stay in this process: never in a persistent L2 another app (a dev server) reads
+app.cache.init_app(app, config={'CACHE_L2_URL': ''})
 
 class TestRoutes(unittest.TestCase):
     def setUp(self):
@@ -50,6 +60,27 @@ class TestRoutes(unittest.TestCase):
         # Should redirect to login
         self.assertNotEqual(response.status_code, 500)
 
+    def test_search_body_shared_between_users(self):
+        loads = []
+
+        async def load(query):
+            loads.append(query)
+            return {'artists': [], 'albums': [], 'songs': []}
+
+        app.cache.delete('search_body_shared query')
+        pages = {}
+        with patch('blueprints.search._load_search_results', load):
+            for name in ('alice', 'bob'):
+                self.client.post('/register', data={'username': name, 'email': f'{name}@example.com', 'password': 'password123'})
+                self.client.post('/login', data={'email': f'{name}@example.com', 'password': 'password123'})
+                pages[name] = self.client.get('/?q=Shared++Query').get_data(as_text=True)
+                self.client.get('/logout')
+        self.assertEqual(loads, ['shared query'])
+        self.assertIn('alice', pages['alice'])
+        self.assertNotIn('alice', pages['bob'])
+        self.assertIn('bob', pages['bob'])
+        self.assertIn('value="Shared  Query"', pages['bob'])
+
 
 class TestSearchRoutes(unittest.TestCase):
     """Tests for /see-all/<type> search routes."""
@@ -201,6 +232,67 @@ class TestArtistRoutes(unittest.TestCase):
         self.assertIn(response.status_code, [200, 404])
 
 
+class TestArtistPageLoader(unittest.TestCase):
+    """The artist page loads everything in one wave from shared responses."""
+
+    def setUp(self):
+        self.calls = []
+        test = self
+
+        async def lookup(artist_id, entity=None, limit=None):
+            test.calls.append(('lookup', entity))
+            if entity == 'album':
+                await asyncio.sleep(0.05)
+                test.calls.append(('albums returned',))
+                return [{'wrapperType': 'artist', 'artistId': 1, 'artistName': 'Queen'},
+                        {'collectionType': 'Album', 'collectionName': 'A', 'artworkUrl100': 'https://a/100x100bb.jpg'}]
+            return []
+
+        async def get_artist(artist_id, name=None, want=()):
+            test.calls.append(('store', name, tuple(want)))
+            return {'image': 'https://dz/queen.jpg', 'stats': None, 'bio': '', 'tags': []}
+
+        async def similar(name):
+            test.calls.append(('similar', name))
+            return []
+
+        async def top_songs(artist_id, artist_name=None):
+            test.calls.append(('top songs',))
+            return ('Queen', [])
+
+        patchers = [
+            patch('blueprints.artist.async_lookup_itunes', lookup),
+            patch('blueprints.artist.async_get_artist', get_artist),
+            patch('blueprints.artist.async_get_similar_artists', similar),
+            patch('blueprints.artist.async_get_top_songs', top_songs),
+            patch('blueprints.artist.remember_artist'),
+        ]
+        for p in patchers:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def test_no_base_lookup_and_artwork_from_albums(self):
+        from async_clients import run
+        from blueprints.artist import _load_artist_page
+        with patch('blueprints.artist.peek_artist', return_value=None):
+            albums, songs, record, similar = run(_load_artist_page('1'))
+        self.assertEqual(albums[0]['artistName'], 'Queen')
+        self.assertNotIn(('lookup', None), self.calls)
+        self.assertIn(('similar', 'Queen'), self.calls)
+        # The store is not asked for artwork: it comes from the album lookup
+        self.assertEqual([c for c in self.calls if c[0] == 'store'], [('store', 'Queen', ('image', 'stats', 'bio', 'tags'))])
+
+    def test_known_name_starts_details_at_once(self):
+        from async_clients import run
+        from blueprints.artist import _load_artist_page
+        with patch('blueprints.artist.peek_artist', return_value={'name': 'Queen'}):
+            run(_load_artist_page('1'))
+        # Name-based calls issued before the album lookup returned, and only once
+        returned = self.calls.index(('albums returned',))
+        self.assertLess(self.calls.index(('similar', 'Queen')), returned)
+        self.assertEqual(len([c for c in self.calls if c[0] == 'store']), 1)
+
+
 class TestAlbumRoutes(unittest.TestCase):
     """Tests for /album/<collection_id> routes."""
     
@@ -275,6 +367,19 @@ class TestTemplateElements(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertNotIn(b'Traceback', response.data)
 
+    def test_search_results_keep_server_images(self):
+        """Only artists without a server-side image are left to the JS lazy loader."""
+        from flask import render_template
+        data = {'artists': [
+            {'artistId': 1, 'artistName': 'Queen', 'image': 'https://img/queen.jpg'},
+            {'artistId': 2, 'artistName': 'Quiet Riot', 'image': None},
+        ], 'albums': [], 'songs': []}
+        with app.test_request_context('/?q=q'):
+            html = render_template('index.html', view='results', data=data, query='q')
+        self.assertIn('src="https://img/queen.jpg"', html)
+        self.assertNotIn('data-artist-id="1"', html)
+        self.assertIn('data-artist-id="2"', html)
+
 
 class TestErrorHandling(unittest.TestCase):
     """Tests for error handling and edge cases."""
@@ -308,5 +413,234 @@ class TestErrorHandling(unittest.TestCase):
         response = self.client.get('/album/invalid_id')
         self.assertIn(response.status_code, [200, 400, 404])
 
+class TestArtistImagesBatch(unittest.TestCase):
+    """Tests for the batch /api/artist-images endpoint."""
+
+    def setUp(self):
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+        self.resolved = []
+
+        async def image_for_id(artist_id):
+            self.resolved.append(artist_id)
+            return f"/img/{artist_id}.jpg" if artist_id != '404' else None
+
+        async def image_for_name(name):
+            self.resolved.append(name)
+            return f"/img/{name}.jpg"
+
+        patchers = [
+            patch('blueprints.api._image_for_id', image_for_id),
+            patch('blueprints.api._image_for_name', image_for_name),
+        ]
+        for p in patchers:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def test_returns_map_for_ids_and_names(self):
+        response = self.client.post('/api/artist-images', json={'ids': ['1', 2, '404'], 'names': ['Queen']})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json, {
+            'ids': {'1': '/img/1.jpg', '2': '/img/2.jpg', '404': None},
+            'names': {'Queen': '/img/Queen.jpg'},
+        })
+
+    def test_duplicates_resolved_once(self):
+        self.client.post('/api/artist-images', json={'ids': ['1', '1'], 'names': ['Queen', 'Queen']})
+        self.assertEqual(sorted(self.resolved), ['1', 'Queen'])
+
+    def test_empty_body(self):
+        response = self.client.post('/api/artist-images')
+        self.assertEqual(response.json, {'ids': {}, 'names': {}})
+
+    def test_malformed_body(self):
+        for body in (['1', '2'], 'Queen', {'ids': '1'}, {'names': {'Queen': 1}}):
+            response = self.client.post('/api/artist-images', json=body)
+            self.assertEqual(response.status_code, 400, body)
+        response = self.client.post('/api/artist-images', json={'names': ['Queen', {'x': 1}, 5]})
+        self.assertEqual(response.json['names'], {'Queen': '/img/Queen.jpg'})
+
+class TestCachedImages(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+        fd, self.path = tempfile.mkstemp(suffix='.jpg')
+        os.close(fd)
+        self.addCleanup(os.remove, self.path)
+
+    def test_variant_is_immutable(self):
+        with patch('blueprints.api.images.variant_path', return_value=self.path):
+            response = self.client.get('/image-cache/card/a.jpg')
+        self.assertTrue(response.cache_control.immutable)
+        self.assertEqual(response.cache_control.max_age, 365 * 24 * 3600)
+        response.close()
+
+    def test_original_fallback_is_short_lived(self):
+        with patch('blueprints.api.images.variant_path', return_value=None), \
+                patch('blueprints.api.images.path_for', return_value=self.path):
+            response = self.client.get('/image-cache/card/a.jpg')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.cache_control.immutable)
+        self.assertEqual(response.cache_control.max_age, 600)
+        response.close()
+
+class TestConditionalRequests(unittest.TestCase):
+    """ETags and 304s on cached pages."""
+
+    def setUp(self):
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+        app.cache.delete('album_body_55')
+        self.addCleanup(app.cache.delete, 'album_body_55')
+        songs = [{'collectionId': 55, 'collectionName': 'Jazz', 'artistName': 'Queen', 'releaseDate': '1978-11-10T08:00:00Z', 'trackName': 'Mustapha'}]
+        patchers = [
+            patch('blueprints.album.lookup_itunes', side_effect=lambda *a: [dict(x) for x in songs]),
+            patch('blueprints.album.get_lastfm_album_stats', return_value=None),
+        ]
+        for p in patchers:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def test_revalidation_skips_the_render(self):
+        self.client.get('/album/55').get_data()  # Uncached: streamed, then cached
+        first = self.client.get('/album/55')
+        self.assertEqual(first.status_code, 200)
+        etag = first.headers['ETag']
+        with patch('page_cache.render_page') as render_page:
+            second = self.client.get('/album/55', headers={'If-None-Match': etag})
+            render_page.assert_not_called()
+        self.assertEqual(second.status_code, 304)
+        self.assertIn('public', second.headers['Cache-Control'])
+
+class TestStreamedPages(unittest.TestCase):
+    """Uncached artist and album pages are streamed, then cached whole."""
+
+    def setUp(self):
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+        for key in ('artist_body_1', 'album_body_55'):
+            app.cache.delete(key)
+            self.addCleanup(app.cache.delete, key)
+        self.released = threading.Event()
+        released = self.released
+
+        async def lookup(artist_id, entity=None, limit=None):
+            return [{'wrapperType': 'artist', 'artistId': 1, 'artistName': 'Queen', 'primaryGenreName': 'Rock'},
+                    {'collectionType': 'Album', 'collectionId': 7, 'collectionName': 'Jazz', 'artistName': 'Queen',
+                     'releaseDate': '1978-11-10T08:00:00Z', 'artworkUrl100': 'https://a/100x100bb.jpg'}]
+
+        async def get_artist(artist_id, name=None, want=()):
+            return {'image': None, 'stats': '1M listeners', 'bio': 'Band from London', 'tags': ['rock']}
+
+        async def similar(name):
+            while not released.is_set():
+                await asyncio.sleep(0.01)
+            return [{'name': 'Freddie Mercury'}]
+
+        async def top_songs(artist_id, artist_name=None):
+            return ('Queen', [{'trackName': 'Mustapha', 'artistName': 'Queen', 'collectionName': 'Jazz'}])
+
+        songs = [{'collectionId': 55, 'collectionName': 'Jazz', 'artistName': 'Queen', 'releaseDate': '1978-11-10T08:00:00Z', 'trackName': 'Mustapha'}]
+        patchers = [
+            patch('blueprints.artist.async_lookup_itunes', lookup),
+            patch('blueprints.artist.async_get_artist', get_artist),
+            patch('blueprints.artist.async_get_similar_artists', similar),
+            patch('blueprints.artist.async_get_top_songs', top_songs),
+            patch('blueprints.artist.remember_artist'),
+            patch('blueprints.artist.peek_artist', return_value=None),
+            patch('blueprints.album.lookup_itunes', side_effect=lambda *a: [dict(x) for x in songs]),
+            patch('blueprints.album.get_lastfm_album_stats', return_value='2M plays'),
+        ]
+        for p in patchers:
+            p.start()
+            self.addCleanup(p.stop)
+        self.addCleanup(self.released.set)
+
+    def test_artist_hero_before_slow_sections(self):
+        response = self.client.get('/artist/1', buffered=False)
+        self.assertTrue(response.is_streamed)
+        self.assertNotIn('ETag', response.headers)
+        chunks = iter(response.response)
+        self.assertIn(b'<body>', next(chunks))
+        hero = next(chunks)  # Similar artists still pending
+        self.assertIn(b'Queen', hero)
+        self.assertIn(b'Jazz', hero)
+        self.assertIn(b'id="slot-similar"', hero)
+        self.assertNotIn(b'Freddie Mercury', hero)
+        self.released.set()
+        rest = b''.join(chunks)
+        response.close()
+        for slot in (b'top-songs', b'meta', b'bio', b'similar'):
+            self.assertIn(b'<template id="fill-' + slot + b'">', rest)
+        self.assertIn(b'Freddie Mercury', rest)
+        self.assertIn(b'</html>', rest)
+
+        body = app.cache.get('artist_body_1')[0]
+        self.assertNotIn('slot-', body)
+        self.assertIn('Band from London', body)
+        self.assertIn('Mustapha', body)
+        cached = self.client.get('/artist/1')
+        self.assertIn('ETag', cached.headers)
+        self.assertIn(b'Freddie Mercury', cached.data)
+
+    def test_album_stats_filled_in(self):
+        response = self.client.get('/album/55')
+        self.assertTrue(response.is_streamed)
+        data = response.get_data(as_text=True)
+        self.assertIn('id="slot-album-stats"', data)
+        self.assertIn('<template id="fill-album-stats"><div class="stats-badge" style="margin: 0;">2M plays</div>', data)
+        self.assertIn('2M plays', app.cache.get('album_body_55')[0])
+        self.assertNotIn('slot-', app.cache.get('album_body_55')[0])
+
+class TestSearchSuggestions(unittest.TestCase):
+    """Tests for /api/search-suggestions served from the local index."""
+
+    def setUp(self):
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+        self.index = SuggestionIndex(100)
+        self.fills = []
+
+        async def fill(query):
+            self.fills.append(query)
+            if query == 'unreachable':
+                return False  # iTunes down
+            self.index.observe([{'artistId': 2, 'artistName': 'Blur'}])
+            return True
+
+        patchers = [
+            patch('blueprints.api.suggestions', self.index),
+            patch('blueprints.api._fill_suggestions', fill),
+            patch('blueprints.api._filled', LRUCache(100)),
+        ]
+        for p in patchers:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def test_known_query_served_locally(self):
+        self.index.observe([{'artistId': 1, 'artistName': 'Queen'}, {'collectionId': 10, 'collectionName': 'Queen II', 'artistId': 1, 'artistName': 'Queen'},
+                            {'artistId': 3, 'artistName': 'Queens of the Stone Age'}])
+        response = self.client.get('/api/search-suggestions?q=quee')
+        self.assertEqual([s['text'] for s in response.json], ['Queen', 'Queens of the Stone Age', 'Queen II - Queen'])
+        self.assertEqual(self.fills, [])
+
+    def test_unknown_query_filled_once(self):
+        response = self.client.get('/api/search-suggestions?q=blur')
+        self.assertEqual(response.json, [{'text': 'Blur', 'type': 'artist', 'id': 2}])
+        self.client.get('/api/search-suggestions?q=Blur ')
+        self.client.get('/api/search-suggestions?q=nothing')
+        self.client.get('/api/search-suggestions?q=nothing')
+        self.assertEqual(self.fills, ['blur', 'nothing'])
+
+    def test_fill_uses_normalized_query_and_failed_fill_is_retried(self):
+        self.client.get('/api/search-suggestions?q=  BLUR')
+        self.client.get('/api/search-suggestions?q=unreachable')
+        self.client.get('/api/search-suggestions?q=unreachable')
+        self.assertEqual(self.fills, ['blur', 'unreachable', 'unreachable'])
+
+    def test_short_query(self):
+        self.assertEqual(self.client.get('/api/search-suggestions?q=b').json, [])
+        self.assertEqual(self.fills, [])
+
 if __name__ == '__main__':
     unittest.main()
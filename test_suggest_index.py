@@ -0,0 +1,66 @@
+import os
+import shutil
+import tempfile
+import unittest
+from suggest_index import SuggestionIndex
+
+RESULTS = [
+    {'wrapperType': 'artist', 'artistId': 1, 'artistName': 'Queen'},
+    {'wrapperType': 'collection', 'collectionId': 10, 'collectionName': 'A Kind of Magic', 'artistId': 1, 'artistName': 'Queen'},
+    {'wrapperType': 'artist', 'artistId': 2, 'artistName': 'Queens of the Stone Age'},
+    {'wrapperType': 'artist', 'artistId': 3, 'artistName': 'Café Tacvba'},
+    {'wrapperType': 'artist', 'artistId': 4, 'artistName': 'Dairy Queen Band'},
+]
+
+class TestSuggestionIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = SuggestionIndex(100)
+        self.index.observe(RESULTS)
+
+    def test_prefix_matches_rank_first(self):
+        texts = [s['text'] for s in self.index.search('queen')]
+        self.assertEqual(texts, ['Queen', 'Queens of the Stone Age', 'Dairy Queen Band'])
+        self.assertEqual(self.index.search('queen')[0], {'text': 'Queen', 'type': 'artist', 'id': 1})
+
+    def test_albums_show_their_artist(self):
+        self.assertEqual(self.index.search('magic'), [{'text': 'A Kind of Magic - Queen', 'type': 'album', 'id': 10}])
+
+    def test_accents_and_substrings(self):
+        self.assertEqual([s['id'] for s in self.index.search('cafe')], [3])
+        self.assertEqual([s['id'] for s in self.index.search('tacv')], [3])
+        self.assertEqual(self.index.search('zzz'), [])
+
+    def test_two_letters_match_word_prefixes(self):
+        self.assertEqual([s['id'] for s in self.index.search('ta')], [3])
+        self.assertEqual(self.index.search('q'), [])
+
+    def test_evicts_least_recently_seen(self):
+        index = SuggestionIndex(2)
+        index.observe([{'artistId': 1, 'artistName': 'Queen'}, {'artistId': 2, 'artistName': 'Blur'}])
+        index.observe([{'artistId': 1, 'artistName': 'Queen'}, {'artistId': 3, 'artistName': 'Oasis'}])
+        self.assertEqual(len(index), 2)
+        self.assertEqual(index.search('blur'), [])
+        self.assertEqual(len(index.search('queen')), 1)
+        self.assertNotIn('blu', index._postings)
+
+    def test_save_and_reload(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        path = os.path.join(directory, 'index.json')
+        self.index.path = path
+        self.index.save()
+        reloaded = SuggestionIndex(100, path)
+        self.assertEqual(len(reloaded), len(self.index))
+        self.assertEqual(reloaded.search('queen'), self.index.search('queen'))
+
+    def test_missing_or_broken_file(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        path = os.path.join(directory, 'index.json')
+        self.assertEqual(len(SuggestionIndex(100, path)), 0)
+        with open(path, 'w') as f:
+            f.write('{broken')
+        self.assertEqual(len(SuggestionIndex(100, path)), 0)
+
+if __name__ == '__main__':
+    unittest.main()
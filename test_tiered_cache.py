@@ -0,0 +1,205 @@
+import os
+import shutil
+import socketserver
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+from flask import Flask
+from flask_caching import Cache
+from page_cache import get_or_render
+from tiered_cache import TieredCache, SQLiteStore, RedisStore, ByteLRU, make_store, encode, decode
+
+class FakeRedisHandler(socketserver.StreamRequestHandler):
+    """Local stand-in for Redis: GET, SET [PX], DEL, SCAN, SELECT, AUTH over RESP."""
+
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        args = []
+        for _ in range(int(line[1:])):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def bulk(self, value):
+        return b'$-1\r\n' if value is None else b'$%d\r\n%s\r\n' % (len(value), value)
+
+    def handle(self):
+        data = self.server.data
+        while True:
+            args = self.read_command()
+            if args is None:
+                return
+            name = args[0].upper()
+            self.server.commands.append(name)
+            if name == b'GET':
+                value, expires = data.get(args[1], (None, None))
+                if expires and time.time() >= expires:
+                    value = None
+                reply = self.bulk(value)
+            elif name == b'SET':
+                expires = time.time() + int(args[4]) / 1000 if len(args) > 4 else None
+                data[args[1]] = (args[2], expires)
+                reply = b'+OK\r\n'
+            elif name == b'DEL':
+                reply = b':%d\r\n' % sum(data.pop(key, None) is not None for key in args[1:])
+            elif name == b'SCAN':
+                keys = [key for key in data if key.startswith(args[3].rstrip(b'*'))]
+                reply = b'*2\r\n' + self.bulk(b'0') + b'*%d\r\n' % len(keys) + b''.join(self.bulk(k) for k in keys)
+            elif name in (b'SELECT', b'AUTH'):
+                reply = b'+OK\r\n'
+            else:
+                reply = b'-ERR unknown command\r\n'
+            self.wfile.write(reply)
+
+class FakeRedis(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), FakeRedisHandler)
+        self.data = {}
+        self.commands = []
+
+class TestByteLRU(unittest.TestCase):
+    def test_evicts_least_recently_used_over_budget(self):
+        lru = ByteLRU(10)
+        lru.set('a', b'aaaa', None)
+        lru.set('b', b'bbbb', None)
+        lru.get('a')
+        lru.set('c', b'cccc', None)
+        self.assertIsNone(lru.get('b'))
+        self.assertEqual(lru.get('a'), b'aaaa')
+        self.assertEqual(lru.total_bytes, 8)
+        lru.set('big', b'x' * 11, None)  # Larger than the whole budget: not kept
+        self.assertIsNone(lru.get('big'))
+
+class TestBlobs(unittest.TestCase):
+    def test_compressed_above_threshold(self):
+        small, large = b'x' * 10, b'x' * 5000
+        self.assertEqual(decode(encode(small, 123.0, 1024)), (123.0, small))
+        blob = encode(large, 0, 1024)
+        self.assertLess(len(blob), len(large))
+        self.assertEqual(decode(blob), (0, large))
+
+class TieredCacheTests:
+    """Shared tests, run against each L2 store."""
+
+    def make_store(self):
+        raise NotImplementedError
+
+    def test_processes_share_l2(self):
+        store = self.make_store()
+        first, second = TieredCache(store), TieredCache(store)
+        first.set('page', ('<html>' * 1000, 1.5), timeout=60)
+        self.assertEqual(second.get('page'), ('<html>' * 1000, 1.5))
+        self.assertTrue(second.delete('page'))
+        self.assertIsNone(TieredCache(store).get('page'))
+
+    def test_l1_serves_until_l1_ttl(self):
+        store = self.make_store()
+        first, second = TieredCache(store, l1_ttl=30), TieredCache(store, l1_ttl=30)
+        first.set('k', 'v1')
+        self.assertEqual(second.get('k'), 'v1')
+        first.set('k', 'v2')
+        self.assertEqual(second.get('k'), 'v1')
+        with patch('tiered_cache.time.time', return_value=time.time() + 31):
+            self.assertEqual(second.get('k'), 'v2')
+
+    def test_expired_entries_are_misses(self):
+        cache = TieredCache(self.make_store())
+        cache.set('k', 'v', timeout=10)
+        with patch('tiered_cache.time.time', return_value=time.time() + 11):
+            self.assertIsNone(cache.get('k'))
+            self.assertIsNone(TieredCache(cache.l2).get('k'))
+
+    def test_clear(self):
+        cache = TieredCache(self.make_store())
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.clear()
+        self.assertIsNone(cache.get('a'))
+        self.assertIsNone(TieredCache(cache.l2).get('b'))
+
+class TestSQLiteTier(TieredCacheTests, unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir, True)
+
+    def make_store(self):
+        return SQLiteStore(os.path.join(self.dir, 'cache.sqlite'))
+
+class TestRedisTier(TieredCacheTests, unittest.TestCase):
+    def setUp(self):
+        self.server = FakeRedis()
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+    def make_store(self):
+        host, port = self.server.server_address
+        return make_store(f'redis://{host}:{port}/2', prefix='qx:')
+
+    def test_keys_prefixed_and_expiring(self):
+        cache = TieredCache(self.make_store())
+        cache.set('k', 'v', timeout=60)
+        self.assertEqual(list(self.server.data), [b'qx:k'])
+        self.assertIsNotNone(self.server.data[b'qx:k'][1])
+        self.assertIn(b'SELECT', self.server.commands)
+
+class TestTieredCacheFallback(unittest.TestCase):
+    def test_l2_errors_fall_back_to_l1(self):
+        cache = TieredCache(RedisStore('redis://127.0.0.1:1/0', timeout=0.2))
+        self.assertTrue(cache.set('k', 'v'))
+        self.assertEqual(cache.get('k'), 'v')
+        self.assertIsNone(cache.get('missing'))
+
+    def test_l2_skipped_after_an_error(self):
+        store = RedisStore('redis://127.0.0.1:1/0', timeout=0.2)
+        cache = TieredCache(store, l2_retry_after=30)
+        with patch.object(store, 'command', wraps=store.command) as command:
+            cache.get('a')
+            cache.set('b', 1)
+            cache.get('c')
+            self.assertEqual(command.call_count, 1)
+            with patch('breakers.time.monotonic', return_value=time.monotonic() + 31):
+                cache.get('d')  # Probe
+            self.assertEqual(command.call_count, 2)
+
+    def test_corrupt_l2_entry_is_a_miss(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        store = SQLiteStore(os.path.join(directory, 'cache.sqlite'))
+        store.set('k', encode(b'not a pickle', 0, 1024), 0)
+        cache = TieredCache(store)
+        self.assertIsNone(cache.get('k'))
+        self.assertIsNone(store.get('k'))
+        store.set('k', b'x', 0)  # Shorter than the header
+        self.assertIsNone(cache.get('k'))
+
+    def test_l1_only(self):
+        cache = TieredCache(make_store(''))
+        cache.set('k', 'v', timeout=0)
+        with patch('tiered_cache.time.time', return_value=time.time() + 10 ** 6):
+            self.assertEqual(cache.get('k'), 'v')
+
+    def test_flask_caching_backend(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        app = Flask(__name__)
+        app.cache = Cache(app, config={
+            'CACHE_TYPE': 'tiered_cache.TieredCache',
+            'CACHE_L2_URL': 'sqlite:///' + os.path.join(directory, 'cache.sqlite'),
+            'CACHE_L1_MAX_BYTES': 1000,
+        })
+        self.assertIsInstance(app.cache.cache, TieredCache)
+        self.assertEqual(app.cache.cache.l1.max_bytes, 1000)
+        with app.test_request_context('/'):
+            self.assertEqual(get_or_render('page', lambda: 'rendered', timeout=30), 'rendered')
+            self.assertEqual(get_or_render('page', lambda: 'again', timeout=30), 'rendered')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import asyncio
+import time
+import unittest
+from unittest.mock import patch
+import top_songs
+from top_songs import build_top_songs, get_top_songs
+from api_clients import parse_lastfm_top_tracks
+from normalize import normalize_title
+
+SONGS = [
+    {'wrapperType': 'artist', 'artistId': 1, 'artistName': 'Queen'},
+    {'artistId': 1, 'artistName': 'Queen', 'trackId': 10, 'trackName': 'Bohemian Rhapsody', 'collectionId': 5, 'kind': 'song'},
+    {'artistId': 1, 'artistName': 'Queen', 'trackId': 11, 'trackName': 'Bohemian Rhapsody', 'collectionId': 6},
+    {'artistId': 2, 'artistName': 'David Bowie', 'trackId': 12, 'trackName': 'Under Pressure'},
+    {'artistId': 1, 'artistName': 'Queen', 'trackId': 13, 'trackName': "Don't Stop Me Now (Remastered 2011)"},
+]
+
+class TestTopSongs(unittest.TestCase):
+    def test_filters_dedupes_and_links(self):
+        songs = build_top_songs(SONGS, '1', 'Queen')
+        self.assertEqual([s['trackId'] for s in songs], [10, 13])
+        self.assertNotIn('kind', songs[0])
+        self.assertEqual(songs[0]['spotify_link'], 'https://open.spotify.com/search/Queen%20Bohemian%20Rhapsody')
+
+    def test_lastfm_playcounts_order(self):
+        playcounts = parse_lastfm_top_tracks({'toptracks': {'track': [
+            {'name': "Don't Stop Me Now", 'playcount': '900'},
+            {'name': 'Bohemian Rhapsody', 'playcount': '500'},
+        ]}})
+        songs = build_top_songs(SONGS, '1', 'Queen', playcounts)
+        self.assertEqual([s['trackId'] for s in songs], [13, 10])
+        self.assertEqual(songs[0]['playcount'], 900)
+
+    def test_index_built_once(self):
+        top_songs._indexes.clear()
+        calls = []
+
+        async def lookup(artist_id, entity=None, limit=None):
+            calls.append(entity)
+            return SONGS
+
+        async def toptracks(name):
+            return {}
+
+        with patch('top_songs.async_lookup_itunes', lookup), patch('top_songs.async_get_lastfm_top_tracks', toptracks):
+            name, songs = get_top_songs('1')
+            get_top_songs('1')
+        self.assertEqual(name, 'Queen')
+        self.assertEqual(len(songs), 2)
+        self.assertEqual(calls, ['song'])
+
+    def test_lastfm_starts_with_lookup_when_name_known(self):
+        top_songs._indexes.clear()
+        calls = []
+
+        async def lookup(artist_id, entity=None, limit=None):
+            calls.append('lookup start')
+            await asyncio.sleep(0.01)
+            calls.append('lookup end')
+            return SONGS
+
+        async def toptracks(name):
+            calls.append(('lastfm', name))
+            return {normalize_title('Bohemian Rhapsody'): 500}
+
+        with patch('top_songs.async_lookup_itunes', lookup), patch('top_songs.async_get_lastfm_top_tracks', toptracks), \
+                patch('top_songs.TOP_SONGS_LASTFM', True):
+            name, songs = get_top_songs('1', 'Queen')
+        self.assertEqual(calls, ['lookup start', ('lastfm', 'Queen'), 'lookup end'])
+        self.assertEqual(songs[0]['playcount'], 500)
+
+        # Name unknown: Last.fm waits for the name from the lookup
+        top_songs._indexes.clear()
+        calls.clear()
+        with patch('top_songs.async_lookup_itunes', lookup), patch('top_songs.async_get_lastfm_top_tracks', toptracks), \
+                patch('top_songs.TOP_SONGS_LASTFM', True), patch('top_songs.peek_artist', return_value=None):
+            get_top_songs('1')
+        self.assertEqual(calls, ['lookup start', 'lookup end', ('lastfm', 'Queen')])
+
+    def test_index_without_playcounts_is_kept_briefly(self):
+        top_songs._indexes.clear()
+        counts = [None]  # Last.fm down
+
+        async def lookup(artist_id, entity=None, limit=None):
+            return SONGS
+
+        async def toptracks(name):
+            return counts[0]
+
+        with patch('top_songs.async_lookup_itunes', lookup), patch('top_songs.async_get_lastfm_top_tracks', toptracks), \
+                patch('top_songs.TOP_SONGS_LASTFM', True), patch('top_songs.peek_artist', return_value=None):
+            self.assertNotIn('playcount', get_top_songs('1')[1][0])
+            counts[0] = {normalize_title("Don't Stop Me Now"): 900}
+            self.assertNotIn('playcount', get_top_songs('1')[1][0])  # Still the cached index
+            later = time.monotonic() + top_songs.NO_PLAYCOUNTS_TTL + 1
+            with patch('lru.time.monotonic', return_value=later):
+                self.assertEqual(get_top_songs('1')[1][0]['playcount'], 900)
+
+if __name__ == '__main__':
+    unittest.main()
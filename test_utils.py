@@ -1,5 +1,5 @@
 import unittest
-from utils import clean_name, normalize_title, sort_albums
+from utils import clean_name, normalize_title, clean_and_normalize, sort_albums, AlbumClassifier, ALBUM_CATEGORY_PATTERNS
 
 class TestUtils(unittest.TestCase):
     def test_clean_name(self):
@@ -41,5 +41,34 @@ class TestUtils(unittest.TestCase):
         self.assertEqual(len(sorted_cats['compilations']), 1)
         self.assertEqual(sorted_cats['compilations'][0]['collectionName'], 'Greatest Hits')
 
+    def test_clean_and_normalize_matches_both(self):
+        for title in ["In Rock (2018 Remastered Version)", "Album Name - Deluxe Edition", "Hello-World! 123", "", None]:
+            self.assertEqual(clean_and_normalize(title), (clean_name(title), normalize_title(title)))
+
+    def test_classifier_priority(self):
+        classifier = AlbumClassifier()
+        self.assertEqual(classifier.classify('greatest hits live - single', 12), 'singles')
+        self.assertEqual(classifier.classify('greatest hits live', 12), 'live')
+        self.assertEqual(classifier.classify('greatest hits', 12), 'compilations')
+        self.assertEqual(classifier.classify('deep cuts', 3), 'singles')
+        self.assertEqual(classifier.classify('steps', 12), 'albums')  # 'ep' only as a word
+
+    def test_sort_albums_with_custom_classifier(self):
+        patterns = ALBUM_CATEGORY_PATTERNS + (('soundtracks', (r'soundtrack',)),)
+        albums = [{'collectionName': 'Flash Gordon (Original Soundtrack)', 'releaseDate': '1980', 'trackCount': 18}]
+        cats = sort_albums(albums, classifier=AlbumClassifier(patterns))
+        self.assertEqual(len(cats['soundtracks']), 1)
+        self.assertEqual(len(cats['albums']), 0)
+
+    def test_sort_albums_keeps_non_latin_titles_apart(self):
+        albums = [
+            {'collectionName': 'Кино', 'releaseDate': '1988', 'trackCount': 10},
+            {'collectionName': 'Группа крови', 'releaseDate': '1988', 'trackCount': 10},
+            {'collectionName': 'Café', 'releaseDate': '1990', 'trackCount': 10},
+            {'collectionName': 'Cafe (Remastered)', 'releaseDate': '2010', 'trackCount': 10},
+        ]
+        cats = sort_albums(albums)
+        self.assertEqual(sorted(a['collectionName'] for a in cats['albums']), ['Café', 'Группа крови', 'Кино'])
+
 if __name__ == '__main__':
     unittest.main()
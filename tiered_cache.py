@@ -0,0 +1,313 @@
+"""
+Two-tier cache backend for Flask-Caching (CACHE_TYPE = 'tiered_cache.TieredCache').
+
+L1 is a byte-budgeted LRU inside each process. L2 is a store shared by all
+worker processes (and nodes): a SQLite file (sqlite:///path) for single-box
+deploys, or Redis (redis://[:password@]host:port/db), spoken to directly over
+its protocol. A page rendered by one worker is then served by every other
+one instead of being rendered once per worker.
+
+Values are pickled; above CACHE_COMPRESS_MIN_BYTES they are zlib-compressed
+before going to L2. L1 keeps the uncompressed pickles and its budget counts
+their bytes. An L1 entry is checked against L2 again after CACHE_L1_TTL
+seconds, so values written by other processes show up within that time. L2
+errors are printed and the cache keeps working from L1 alone: after an error
+L2 is left alone for CACHE_L2_RETRY_AFTER seconds (a circuit breaker, see
+breakers.py), so a dead Redis costs one timeout, not one per cache call. A
+corrupt L2 entry is a miss.
+"""
+import os
+import pickle
+import socket
+import sqlite3
+import struct
+import threading
+import time
+import urllib.parse
+import zlib
+from collections import OrderedDict
+from flask_caching.backends.base import BaseCache
+from breakers import CircuitBreaker
+
+COMPRESS_LEVEL = 6
+
+# Blob header: expiry (epoch seconds, 0 = never) and whether the pickle is compressed
+_HEADER = struct.Struct('>d?')
+
+def encode(data, expires_at, compress_min_bytes):
+    """L2 blob of a pickled value: header + pickle (zlib-compressed from compress_min_bytes)."""
+    compressed = len(data) >= compress_min_bytes
+    if compressed:
+        data = zlib.compress(data, COMPRESS_LEVEL)
+    return _HEADER.pack(expires_at, compressed) + data
+
+def decode(blob):
+    """(expires_at, pickle) of an L2 blob."""
+    expires_at, compressed = _HEADER.unpack_from(blob)
+    data = blob[_HEADER.size:]
+    return expires_at, zlib.decompress(data) if compressed else data
+
+class ByteLRU:
+    """Thread-safe LRU of pickles, evicting least recently used entries over max_bytes."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._lock = threading.Lock()
+        self._data = OrderedDict()  # key -> (pickle, valid_until or None)
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            data, valid_until = item
+            if valid_until is not None and time.time() >= valid_until:
+                self._pop(key)
+                return None
+            self._data.move_to_end(key)
+            return data
+
+    def set(self, key, data, valid_until):
+        if len(data) > self.max_bytes:
+            self.delete(key)
+            return
+        with self._lock:
+            self._pop(key)
+            self._data[key] = (data, valid_until)
+            self.total_bytes += len(data)
+            while self.total_bytes > self.max_bytes:
+                self._pop(next(iter(self._data)))
+
+    def delete(self, key):
+        with self._lock:
+            return self._pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.total_bytes = 0
+
+    def _pop(self, key):
+        item = self._data.pop(key, None)
+        if item is None:
+            return False
+        self.total_bytes -= len(item[0])
+        return True
+
+class SQLiteStore:
+    """L2 in a SQLite file (WAL mode, one connection per thread and process)."""
+
+    # Expired rows are deleted every this many writes
+    PURGE_EVERY = 1000
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn().execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL NOT NULL)")
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def get(self, key):
+        row = self._conn().execute("SELECT value FROM cache WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set(self, key, blob, expires_at):
+        self._conn().execute("INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)", (key, blob, expires_at))
+        self._writes += 1
+        if self._writes % self.PURGE_EVERY == 0:
+            self._conn().execute("DELETE FROM cache WHERE expires > 0 AND expires < ?", (time.time(),))
+
+    def delete(self, key):
+        return self._conn().execute("DELETE FROM cache WHERE key = ?", (key,)).rowcount > 0
+
+    def clear(self):
+        self._conn().execute("DELETE FROM cache")
+
+class RedisError(Exception):
+    pass
+
+class RedisStore:
+    """L2 in Redis (or anything speaking its protocol), keys under a prefix."""
+
+    def __init__(self, url, prefix='', timeout=2):
+        parts = urllib.parse.urlsplit(url)
+        self.address = (parts.hostname or 'localhost', parts.port or 6379)
+        self.password = parts.password
+        self.db = int(parts.path.strip('/') or 0)
+        self.prefix = prefix
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connect(self):
+        sock = socket.create_connection(self.address, timeout=self.timeout)
+        self._local.sock, self._local.file, self._local.pid = sock, sock.makefile('rb'), os.getpid()
+        if self.password:
+            self._call('AUTH', self.password)
+        if self.db:
+            self._call('SELECT', self.db)
+
+    def command(self, *args):
+        """Sends one command and returns its reply (reconnects after errors and forks)."""
+        if getattr(self._local, 'sock', None) is None or self._local.pid != os.getpid():
+            self._connect()
+        try:
+            return self._call(*args)
+        except OSError:
+            self._local.sock.close()
+            self._local.sock = None
+            raise
+
+    def _call(self, *args):
+        parts = [b'*%d\r\n' % len(args)]
+        for arg in args:
+            arg = arg if isinstance(arg, bytes) else str(arg).encode()
+            parts.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+        self._local.sock.sendall(b''.join(parts))
+        return self._reply()
+
+    def _reply(self):
+        line = self._local.file.readline()
+        if not line:
+            raise ConnectionError("Redis connection closed")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b'+':
+            return rest.decode()
+        if kind == b'-':
+            raise RedisError(rest.decode())
+        if kind == b':':
+            return int(rest)
+        if kind == b'$':
+            length = int(rest)
+            return None if length < 0 else self._local.file.read(length + 2)[:-2]
+        if kind == b'*':
+            length = int(rest)
+            return None if length < 0 else [self._reply() for _ in range(length)]
+        raise RedisError(f"Unexpected reply: {line!r}")
+
+    def get(self, key):
+        return self.command('GET', self.prefix + key)
+
+    def set(self, key, blob, expires_at):
+        if expires_at:
+            ms = max(int((expires_at - time.time()) * 1000), 1)
+            self.command('SET', self.prefix + key, blob, 'PX', ms)
+        else:
+            self.command('SET', self.prefix + key, blob)
+
+    def delete(self, key):
+        return self.command('DEL', self.prefix + key) > 0
+
+    def clear(self):
+        cursor = '0'
+        while True:
+            cursor, keys = self.command('SCAN', cursor, 'MATCH', self.prefix + '*', 'COUNT', 1000)
+            if keys:
+                self.command('DEL', *keys)
+            cursor = cursor.decode() if isinstance(cursor, bytes) else cursor
+            if cursor == '0':
+                return
+
+def make_store(url, prefix=''):
+    """L2 store for a URL: sqlite:///path, redis://host:port/db, or None for '' (L1 only)."""
+    if not url:
+        return None
+    if url.startswith('sqlite:///'):
+        return SQLiteStore(url[len('sqlite:///'):])
+    if url.startswith('redis://'):
+        return RedisStore(url, prefix)
+    raise ValueError(f"Unknown cache store URL: {url}")
+
+class TieredCache(BaseCache):
+    def __init__(self, l2=None, l1_max_bytes=32 * 1024 * 1024, l1_ttl=60, compress_min_bytes=1024, default_timeout=300, l2_retry_after=10):
+        BaseCache.__init__(self, default_timeout=default_timeout)
+        self.l1 = ByteLRU(l1_max_bytes)
+        self.l2 = l2
+        # Opens on the first L2 error, one probe call after l2_retry_after seconds
+        self.l2_breaker = CircuitBreaker('cache-l2', failure_threshold=1, reset_timeout=l2_retry_after)
+        self.l1_ttl = l1_ttl
+        self.compress_min_bytes = compress_min_bytes
+
+    @classmethod
+    def factory(cls, app, config, args, kwargs):
+        kwargs.update(
+            l2=make_store(config.get('CACHE_L2_URL'), config.get('CACHE_KEY_PREFIX') or ''),
+            l1_max_bytes=config.get('CACHE_L1_MAX_BYTES', 32 * 1024 * 1024),
+            l1_ttl=config.get('CACHE_L1_TTL', 60),
+            compress_min_bytes=config.get('CACHE_COMPRESS_MIN_BYTES', 1024),
+            l2_retry_after=config.get('CACHE_L2_RETRY_AFTER', 10),
+        )
+        return cls(*args, **kwargs)
+
+    def _l1_set(self, key, data, expires_at):
+        valid_until = time.time() + self.l1_ttl if self.l2 is not None else None
+        if expires_at and (valid_until is None or expires_at < valid_until):
+            valid_until = expires_at
+        self.l1.set(key, data, valid_until)
+
+    def _l2(self, method, *args):
+        if self.l2 is None or not self.l2_breaker.allow():
+            return None
+        try:
+            result = getattr(self.l2, method)(*args)
+        except Exception as e:
+            self.l2_breaker.record_failure()
+            print(f"Cache L2 {method} error: {e}")
+            return None
+        self.l2_breaker.record_success()
+        return result
+
+    def get(self, key):
+        data = self.l1.get(key)
+        try:
+            if data is None:
+                blob = self._l2('get', key)
+                if blob is None:
+                    return None
+                expires_at, data = decode(blob)
+                if expires_at and time.time() >= expires_at:
+                    return None
+                self._l1_set(key, data, expires_at)
+            return pickle.loads(data)
+        except Exception as e:
+            print(f"Cache entry {key} unreadable: {e}")
+            self.delete(key)
+            return None
+
+    def set(self, key, value, timeout=None):
+        timeout = self._normalize_timeout(timeout)
+        expires_at = time.time() + timeout if timeout > 0 else 0
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        self._l1_set(key, data, expires_at)
+        if self.l2 is not None:
+            self._l2('set', key, encode(data, expires_at, self.compress_min_bytes), expires_at)
+        return True
+
+    def add(self, key, value, timeout=None):
+        if self.has(key):
+            return False
+        return self.set(key, value, timeout)
+
+    def has(self, key):
+        return self.get(key) is not None
+
+    def delete(self, key):
+        deleted = self.l1.delete(key)
+        return bool(self._l2('delete', key)) or deleted
+
+    def clear(self):
+        self.l1.clear()
+        self._l2('clear')
+        return True
@@ -0,0 +1,90 @@
+"""
+Per-artist top-songs index shared by the artist page (first 10 entries) and
+the top-songs page (all of them, paginated).
+
+Built once from the iTunes song lookup: only the artist's own songs, deduped
+by title, with the fields the templates use and the Spotify/YouTube links.
+With TOP_SONGS_LASTFM on, Last.fm artist.gettoptracks play counts are merged
+in and the index is ordered by them (songs Last.fm does not know keep the
+iTunes order, after the others). The Last.fm call starts together with the
+song lookup when the artist name is already known (passed by the caller or in
+the artist store); otherwise it waits for the name from the lookup. An index
+without play counts (Last.fm down, or no data for the artist) is only kept for
+the Last.fm negative TTL, so the popularity order shows up again soon.
+"""
+import asyncio
+import os
+from artist_store import peek_artist
+from async_clients import run, async_lookup_itunes, async_get_lastfm_top_tracks
+from cache_policy import CACHE_POLICY
+from coalesce import AsyncSingleFlight
+from lru import LRUCache
+from normalize import normalize_title
+
+TOP_SONGS_LASTFM = os.getenv("TOP_SONGS_LASTFM", "1") == "1"
+TOP_SONGS_CACHE_SIZE = int(os.getenv("TOP_SONGS_CACHE_SIZE", 1000))
+
+# Fields kept per song (what the song rows and their buttons need)
+SONG_FIELDS = ('trackId', 'trackName', 'artistName', 'collectionId', 'collectionName', 'artworkUrl100', 'previewUrl')
+
+# Same lifetime as the song lookup it is built from
+_indexes = LRUCache(maxsize=TOP_SONGS_CACHE_SIZE, ttl=CACHE_POLICY[('itunes', 'lookup')].ttl)
+NO_PLAYCOUNTS_TTL = CACHE_POLICY[('lastfm', 'artist.gettoptracks')].negative_ttl
+_builds = AsyncSingleFlight()
+
+def build_top_songs(songs_data, artist_id, artist_name, playcounts=None):
+    """Top-songs index from a song lookup (see module docstring)."""
+    songs = []
+    seen_titles = set()
+    target_id = int(artist_id)
+    target_name_lower = artist_name.lower()
+
+    for item in songs_data:
+        if item.get('artistId') == target_id or item.get('artistName', '').lower() == target_name_lower:
+            title = item.get('trackName', '')
+            if title and title not in seen_titles:
+                seen_titles.add(title)
+                song = {key: item[key] for key in SONG_FIELDS if key in item}
+                song['spotify_link'] = f"https://open.spotify.com/search/{artist_name} {title}".replace(' ', '%20')
+                song['youtube_link'] = f"https://www.youtube.com/results?search_query={artist_name} {title}".replace(' ', '+')
+                if playcounts:
+                    song['playcount'] = playcounts.get(normalize_title(title))
+                songs.append(song)
+
+    if playcounts:
+        # Stable sort: iTunes order among equal (and unknown) play counts
+        songs.sort(key=lambda s: s.get('playcount') or 0, reverse=True)
+    return songs
+
+async def _build(artist_id, known_name=None):
+    if known_name is None:
+        known = peek_artist(artist_id)
+        known_name = known['name'] if known else None
+    early_name = known_name if TOP_SONGS_LASTFM else None
+    playcounts = None
+    if early_name:
+        songs_data, playcounts = await asyncio.gather(
+            async_lookup_itunes(artist_id, 'song', 200), async_get_lastfm_top_tracks(early_name))
+    else:
+        songs_data = await async_lookup_itunes(artist_id, 'song', 200)
+    if not songs_data:
+        return None
+    # The first row of a lookup is the artist itself
+    artist_name = songs_data[0].get('artistName', '')
+    if TOP_SONGS_LASTFM and (not early_name or early_name.lower() != artist_name.lower()):
+        playcounts = await async_get_lastfm_top_tracks(artist_name)
+    index = (artist_name, build_top_songs(songs_data, artist_id, artist_name, playcounts))
+    _indexes.set(str(artist_id), index, ttl=None if playcounts or not TOP_SONGS_LASTFM else NO_PLAYCOUNTS_TTL)
+    return index
+
+async def async_get_top_songs(artist_id, artist_name=None):
+    """Returns (artist_name, songs) for an iTunes artistId, or None if not found.
+    artist_name, when the caller knows it, lets the Last.fm call start early."""
+    index = _indexes.get(str(artist_id))
+    if index is not None:
+        return index
+    return await _builds.do(str(artist_id), _build, artist_id, artist_name)
+
+def get_top_songs(artist_id, artist_name=None):
+    """Sync wrapper around async_get_top_songs."""
+    return run(async_get_top_songs(artist_id, artist_name))
@@ -1,34 +1,7 @@
 import re
 import urllib.parse
 
-def clean_name(name):
-    """
-    Transforms "In Rock (2018 Remastered Version)" -> "In Rock"
-    Removes junk in parentheses and after hyphens if it is technical info.
-    """
-    if not name: return ""
-    
-    # 1. Remove contents of () and []
-    # Example: "Deep Purple In Rock (2018 Remastered Version)" -> "Deep Purple In Rock"
-    clean = re.sub(r'\s*[\(\[].*?[\)\]]', '', name)
-    
-    # 2. Remove " - Remastered" etc. if they are without parentheses (rare but happens)
-    # Example: "Album Name - Deluxe Edition" -> "Album Name"
-    clean = re.sub(r'\s-\s.*(Remaster|Deluxe|Edition|Version|Remix).*', '', clean, flags=re.IGNORECASE)
-    
-    return clean.strip()
-
-def normalize_title(title):
-    """
-    For comparison (deduplication).
-    Remove everything, leave only letters/numbers to find duplicates.
-    """
-    if not title: return ""
-    clean = re.sub(r'\s*[\(\[].*?[\)\]]', '', title)
-    clean = clean.lower().strip()
-    # Leave only a-z and 0-9
-    clean = re.sub(r'[^a-z0-9]', '', clean)
-    return clean
+from normalize import clean_name, normalize_title, clean_and_normalize, clean_and_normalize_many
 
 def generate_spotify_link(query):
     if not query: return "#"
@@ -54,7 +27,7 @@ def filter_and_process_artists(items, query_lower, limit=None):
         
         seen_names.add(name.lower())
         seen_ids.add(aid)
-        item['image'] = None  # Will load via JS
+        item.setdefault('image', None)  # Filled from the artist store when known, else loaded via JS
         results.append(item)
         
         if limit and len(results) >= limit:
@@ -94,7 +67,41 @@ def filter_and_process_songs(items, query_lower, limit=None):
     
     return results
 
-def sort_albums(albums, sort_by='date', category_filter=None):
+# Album categories and their title patterns (regexes on the lowercased title),
+# in priority order. Pass another table to AlbumClassifier to change them.
+ALBUM_CATEGORY_PATTERNS = (
+    # Singles & EPs (explicit EP/Single label; short releases are singles too)
+    ('singles', (re.escape(' - single'), r'\bep\b')),
+    # Live Albums (concert/tour keywords)
+    ('live', tuple(map(re.escape, ['live', 'concert', 'tour', 'wembley', 'bowl', 'montreal', 'budokan', 'at the', 'bbc']))),
+    # Compilations (best of, greatest hits, etc.)
+    ('compilations', tuple(map(re.escape, ['greatest hits', 'best of', 'anthology', 'collection', 'essential', 'platinum', 'gold', 'years', 'hits', 'box set', 'decade', 'definitive', 'ultimate', 'rarities', 'retrospective', 'archive', 'sessions', 'very best']))),
+)
+
+class AlbumClassifier:
+    """
+    Classifies album titles with precompiled patterns: one alternation per
+    category, searched in priority order (the first category that matches wins).
+    """
+
+    def __init__(self, patterns=ALBUM_CATEGORY_PATTERNS, default='albums', short_category='singles', short_max_tracks=5):
+        self.default = default
+        self.short_category = short_category
+        self.short_max_tracks = short_max_tracks
+        self.categories = [default] + [category for category, _ in patterns]
+        self._patterns = [(category, re.compile('|'.join(regexes))) for category, regexes in patterns]
+
+    def classify(self, lower_title, track_count):
+        if track_count < self.short_max_tracks:
+            return self.short_category
+        for category, pattern in self._patterns:
+            if pattern.search(lower_title):
+                return category
+        return self.default
+
+default_album_classifier = AlbumClassifier()
+
+def sort_albums(albums, sort_by='date', category_filter=None, classifier=None):
     """
     Sort and categorize albums by type (studio, singles, live, compilations).
     
@@ -102,17 +109,16 @@ def sort_albums(albums, sort_by='date', category_filter=None):
         albums: List of album items
         sort_by: 'date' (default), 'name', 'year'
         category_filter: None (all), or specific category like 'albums', 'singles'
+        classifier: AlbumClassifier to use (default_album_classifier if None)
     
     Returns:
         dict with 'albums', 'singles', 'live', 'compilations' categories
     """
-    unique_studio = {}
-    unique_singles = {}
-    unique_live = {}
-    unique_compilations = {}
+    classifier = classifier or default_album_classifier
+    unique = {category: {} for category in classifier.categories}
 
-    for alb in albums:
-        original_title = alb.get('collectionName', '').strip()
+    titles = [alb.get('collectionName', '').strip() for alb in albums]
+    for alb, original_title, (clean, norm_key) in zip(albums, titles, clean_and_normalize_many(titles)):
         if not original_title: continue
         
         # Improve artwork quality
@@ -122,27 +128,11 @@ def sort_albums(albums, sort_by='date', category_filter=None):
         date_str = alb.get('releaseDate', '')
         alb['year'] = date_str[:4] if date_str else ''
         
-        lower_title = original_title.lower()
-        track_count = alb.get('trackCount', 0)
+        # Clean title and key for deduplication
+        alb['collectionName'] = clean
         
-        # Generate key for deduplication
-        norm_key = normalize_title(original_title)
-        
-        # Clean title
-        alb['collectionName'] = clean_name(original_title)
-        
-        # --- CLASSIFICATION LOGIC ---
-        target_dict = unique_studio  # Default
-        
-        # Singles & EPs (< 5 tracks or explicit EP/Single label)
-        if track_count < 5 or ' - single' in lower_title or re.search(r'\bep\b', lower_title):
-            target_dict = unique_singles
-        # Live Albums (concert/tour keywords)
-        elif any(x in lower_title for x in ['live', 'concert', 'tour', 'wembley', 'bowl', 'montreal', 'budokan', 'at the', 'bbc']):
-            target_dict = unique_live
-        # Compilations (best of, greatest hits, etc.)
-        elif any(x in lower_title for x in ['greatest hits', 'best of', 'anthology', 'collection', 'essential', 'platinum', 'gold', 'years', 'hits', 'box set', 'decade', 'definitive', 'ultimate', 'rarities', 'retrospective', 'archive', 'sessions', 'very best']):
-            target_dict = unique_compilations
+        # --- CLASSIFICATION ---
+        target_dict = unique[classifier.classify(original_title.lower(), alb.get('trackCount', 0))]
 
         # --- DEDUPLICATION (keep earliest release) ---
         if norm_key in target_dict:
@@ -154,13 +144,7 @@ def sort_albums(albums, sort_by='date', category_filter=None):
             target_dict[norm_key] = alb
 
     # Export lists
-    categories = {
-        'albums': list(unique_studio.values()),
-        'singles': list(unique_singles.values()),
-        'live': list(unique_live.values()),
-        'compilations': list(unique_compilations.values())
-    }
-
+    categories = {category: list(items.values()) for category, items in unique.items()}
     # Apply sorting
     sort_key_map = {
         'date': lambda x: x.get('releaseDate', ''),